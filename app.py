@@ -1,26 +1,32 @@
 import os
+import click
+from datetime import datetime, timezone
 import time
-import json
-import numpy as np
-import pandas as pd
-from datetime import datetime
-from flask import Flask, render_template, request, send_file, jsonify
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER
-import jwt
+from flask import Flask, Response, render_template, request, send_file, jsonify, g
 from functools import wraps
-
-# --- FIREBASE IMPORTS (Restored) ---
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
-# --- END FIREBASE IMPORTS ---
+from session_store import SessionRegistry, frames_from_records
+from token_auth import TokenVerifier
+from pose_wire import POSE_BATCH_MIMETYPE, decode_pose_batch
+from request_encoding import DecompressRequestMiddleware
+from live_stream import register_live_stream
+from werkzeug.exceptions import HTTPException
+from reports import generate_pdf_report, report_filename
+from report_cache import ReportCache
+from report_index import ReportIndex
+from report_jobs import ReportJobQueue, QueueFullError
+from firebase_client import FirebaseClient
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as metrics
+from tracing import span, trace_flask
+from profiler import ProfilerBusyError, SamplingProfiler, finish_request_profile, profile_flask
+from firestore_writer import FirestoreWriteQueue
+from session_chunks import chunk_collection_path, encode_session_chunks
+from leaderboard import LEADERBOARD_WINDOWS, Leaderboard
+from user_stats import applied_session_path, longest_holds, rebuild_user_stats, session_stats_update, stats_view, user_stats_path
 
 # Initialize Flask app
 app = Flask(__name__)
+# gzip/deflate (and zstd when installed) request bodies on the ingest and session routes
+app.wsgi_app = DecompressRequestMiddleware(app.wsgi_app, ['/log_pose', '/start_session', '/end_session'])
 
 # Directories (for report storage)
 # FIX 1: Use the Vercel-writable /tmp directory for temporary reports.
@@ -29,60 +35,113 @@ os.makedirs(REPORTS_DIR, exist_ok=True)
 
 # FIX 2: REMOVED os.makedirs("live_json", exist_ok=True) which caused the crash.
 
-# --- FIREBASE SETUP (Restored Logic) ---
-try:
-    # Looks for Environment Variable (Render, DigitalOcean) first, then local file
-    CREDENTIALS_PATH = os.environ.get('FIREBASE_CREDENTIALS', 'firebase_service_account.json')
-    
-    if os.path.exists(CREDENTIALS_PATH) or os.environ.get('FIREBASE_CREDENTIALS'):
-        # Check if the environment variable contains the JSON content directly
-        if CREDENTIALS_PATH and CREDENTIALS_PATH.startswith('{'):
-            import json as json_lib
-            cred = credentials.Certificate(json_lib.loads(CREDENTIALS_PATH))
-        else:
-            # Use local file path or default
-            cred = credentials.Certificate(CREDENTIALS_PATH)
-            
-        if not firebase_admin._apps: # Prevent re-initialization error
-            firebase_admin.initialize_app(cred)
-        db = firestore.client()
-        print("✅ Firebase initialized successfully.")
-    else:
-        print("⚠️ Firebase credentials not found. DB functions disabled.")
-        db = None
-
-except Exception as e:
-    print(f"❌ Error initializing Firebase: {e}")
-    db = None
-
-# Global state
-session_active = False
-pose_log = []
-current_user_uid = None
-current_user_display_name = "User"
-last_report_path = None
-
-# --- JWT DECORATOR (UNCHANGED) ---
+# --- FIREBASE SETUP ---
+# One lazily initialized Firebase app / Firestore client per process; nothing
+# is imported or connected until a request needs it (FIRESTORE_BACKEND=memory
+# swaps in an in-process stand-in).
+firebase = FirebaseClient.from_env()
+# ID tokens are verified locally when the project id is known (from the env or the credentials).
+FIREBASE_PROJECT_ID = firebase.project_id
+# Session documents are written behind the request, in batched commits; writes
+# still queued at exit are journaled and replayed by the next process.
+firestore_writes = FirestoreWriteQueue(firebase.firestore)
+if firebase.configured:
+    firestore_writes.replay_journal()
+
+# Today / this week / all-time points rankings, reloaded from Firestore in the background
+leaderboard = Leaderboard(firebase.firestore if firebase.configured else None)
+
+# Per-user session state (one registry per worker process)
+sessions = SessionRegistry()
+
+# Background PDF generation (bounded worker pool) and content-addressed PDF cache
+report_jobs = ReportJobQueue()
+report_cache = ReportCache(REPORTS_DIR)
+# Per-user report index (uid, session id) -> PDF, persisted next to the reports
+report_index = ReportIndex(os.environ.get('REPORT_INDEX_PATH', os.path.join(REPORTS_DIR, 'report_index.sqlite3')))
+
+# Verified-token cache; signatures are checked against Google's cached public keys
+token_verifier = TokenVerifier(FIREBASE_PROJECT_ID, fallback=firebase.verify_id_token)
+
+# --- METRICS ---
+# Exposed at /metrics; with METRICS_DIR set, every worker's values are aggregated.
+metrics.start()
+REQUEST_SECONDS = metrics.histogram('yoga_request_duration_seconds', 'Request latency of the session and report routes.', ('endpoint',))
+_request_timers = {endpoint: REQUEST_SECONDS.labels(f'/{endpoint}')
+                   for endpoint in ('log_pose', 'start_session', 'end_session', 'download_report')}
+metrics.gauge('yoga_live_sessions', 'Active sessions held by this worker.').set_function(sessions.live_count)
+
+
+@app.before_request
+def _start_request_timer():
+    if request.endpoint in _request_timers:
+        g.request_started = time.perf_counter()
+
+
+@app.teardown_request
+def _observe_request_time(exc):
+    started = g.pop('request_started', None)
+    if started is not None:
+        _request_timers[request.endpoint].observe(time.perf_counter() - started)
+# --- END METRICS ---
+
+# Sampled request tracing (TRACE_SAMPLE_RATE; a sampled traceparent only while tracing is on): spans go
+# to TRACE_FILE as OTLP JSON and traced responses get a Server-Timing header.
+trace_flask(app)
+
+# Firebase uids allowed to use the /admin routes and the X-Profile header
+ADMIN_UIDS = frozenset(uid.strip() for uid in os.environ.get('ADMIN_UIDS', '').split(',') if uid.strip())
+
+
+def _is_admin_request(headers):
+    """True if the request carries a valid ID token of a uid in ADMIN_UIDS."""
+    auth_header = headers.get('Authorization') or ''
+    if not ADMIN_UIDS or not auth_header.startswith('Bearer '):
+        return False
+    try:
+        return token_verifier.verify(auth_header.split(' ')[1])['uid'] in ADMIN_UIDS
+    except Exception:
+        return False
+
+
+# Opt-in per-request cProfile (PROFILE_REQUESTS=header|all) and the /admin/profile sampler
+profile_flask(app, is_admin=_is_admin_request)
+sampling_profiler = SamplingProfiler()
+
+# Persistent /ws/session channel for live frames (when flask-sock is installed)
+register_live_stream(app, sessions, token_verifier.verify)
+
+# --- JWT DECORATOR ---
+def _bearer_token():
+    """Returns the Bearer token from the Authorization header, or None."""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
+
+
 def jwt_required(f):
-    """Decorator to protect routes, requiring a valid Firebase ID Token (JWT)."""
+    """Decorator to protect routes, requiring a valid Firebase ID Token (JWT).
+
+    The caller's identity is stored on `flask.g` as `uid` and `display_name`
+    for the duration of the request.
+    """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        global current_user_uid, current_user_display_name
-        
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
+        id_token = _bearer_token()
+        if not id_token:
             return jsonify({"status": "error", "message": "Authorization token missing or invalid"}), 401
         
-        id_token = auth_header.split(' ')[1]
-        
         try:
-            # Verifies the token using Firebase Admin SDK
-            decoded_token = auth.verify_id_token(id_token)
-            current_user_uid = decoded_token['uid']
-            request_data = request.get_json() if request.is_json else {}
-            user_name_from_request = request_data.get('user_name', f"User_{current_user_uid[-4:]}")
-            current_user_display_name = user_name_from_request
+            # Verifies the token locally (or via the Firebase Admin SDK) with caching
+            with span('auth.verify_token'):
+                decoded_token = token_verifier.verify(id_token)
+            g.uid = decoded_token['uid']
+            request_data = request.get_json(silent=True) if request.is_json else None
+            g.display_name = (request_data or {}).get('user_name', f"User_{g.uid[-4:]}")
             
+        except HTTPException:
+            raise  # e.g. 413 for an oversized compressed body
         except Exception as e:
             print(f"JWT Verification Failed: {e}")
             return jsonify({"status": "error", "message": "Invalid or expired authentication token"}), 401
@@ -92,112 +151,25 @@ def jwt_required(f):
 # --- END JWT DECORATOR ---
 
 
-# --- PDF GENERATION (UNCHANGED) ---
-def generate_pdf_report(user_name, end_time):
-    """Generate professional AyurSutra PDF report with dynamic recommendations."""
-    global last_report_path
-    
-    timestamp = end_time.strftime("%Y%m%d_%H%M%S")
-    # Reports are saved to the /tmp folder path defined in REPORTS_DIR
-    report_path = os.path.join(REPORTS_DIR, f"{user_name}_AyurSutra_Report_{timestamp}.pdf")
-    
-    doc = SimpleDocTemplate(report_path, pagesize=letter)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    AS_BLUE = colors.HexColor('#2E86AB')
-    AS_PINK = colors.HexColor('#A23B72')
-    
-    title_style = ParagraphStyle('AyurSutraTitle', parent=styles['Heading1'], fontSize=28, textColor=AS_BLUE, spaceAfter=15, alignment=TA_CENTER)
-    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Heading2'], fontSize=18, textColor=AS_PINK, spaceAfter=25, alignment=TA_CENTER)
-    heading_style = ParagraphStyle('ReportHeading', parent=styles['Heading2'], fontSize=16, textColor=AS_PINK, spaceAfter=10, spaceBefore=15)
-    
-    story.append(Paragraph("A Y U R S U T R A", title_style))
-    story.append(Paragraph("Yoga Pose Monitoring & Diagnostic Report", subtitle_style))
-    
-    story.append(Paragraph("I. Session Metrics", heading_style))
-    
-    if pose_log:
-        df = pd.DataFrame(pose_log)
-        
-        if len(pose_log) > 1:
-            duration_seconds = pose_log[-1]['timestamp'] - pose_log[0]['timestamp']
-            duration_min = duration_seconds / 60
-        else:
-            duration_min = 0.0
-        
-        avg_conf = df['confidence'].mean() if not df.empty else 0.0
-        
-        summary_data = [
-            ['Participant ID', user_name, 'Date', end_time.strftime('%B %d, %Y')],
-            ['Total Duration', f"{duration_min:.2f} Minutes", 'Time', end_time.strftime('%I:%M %p')],
-            ['Analyzed Frames', str(len(df)), 'Avg Confidence', f"{avg_conf:.2%}"]
-        ]
-        
-        summary_table = Table(summary_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-        summary_table.setStyle(TableStyle([('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F5F5F5')), ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#F5F5F5')), ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey), ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')]))
-        story.append(summary_table)
-        
-        story.append(Paragraph("II. Pose Duration Analysis", heading_style))
-        pose_counts = df['pose'].value_counts()
-        
-        data = [['Pose Name', 'Frames Detected', 'Total Time (Seconds)']]
-        for pose_name, count in pose_counts.items():
-            duration_sec = count * 0.5  
-            data.append([pose_name, str(count), f"{duration_sec:.1f} s"])
-        
-        table = Table(data, colWidths=[3.5*inch, 1.5*inch, 1.5*inch])
-        table.setStyle(TableStyle([('BACKGROUND', (0, 0), (-1, 0), AS_BLUE), ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke), ('ALIGN', (0, 0), (-1, -1), 'CENTER'), ('ALIGN', (0, 1), (0, -1), 'LEFT'), ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'), ('BOTTOMPADDING', (0, 0), (-1, 0), 10), ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#EBF4FA')), ('GRID', (0, 0), (-1, -1), 0.5, colors.black)]))
-        story.append(table)
-        
-        story.append(Paragraph("III. Personalized Improvement Plan", heading_style))
-        
-        recommendations = []
-        if avg_conf < 0.80:
-            recommendations.append("• Aim for brighter lighting and confirm your entire body is visible to improve tracking accuracy.")
-        elif avg_conf < 0.90:
-            recommendations.append("• Focus on fine-tuning your body's lines and alignment to achieve more precise posture confirmation.")
-        
-        if not df[df['pose'] != 'Unknown'].empty:
-            pose_durations = df[df['pose'] != 'Unknown'].groupby('pose').size() * 0.5
-            longest_pose = pose_durations.idxmax()
-            longest_duration = pose_durations.max()
-            recommendations.append(f"• **Successfully held {longest_pose}** for {longest_duration:.1f} seconds. Maintain this dedication to duration.")
-            brief_poses = pose_durations[(pose_durations > 0) & (pose_durations < 5)]
-            if not brief_poses.empty:
-                brief_pose_name = brief_poses.idxmin()
-                recommendations.append(f"• **{brief_pose_name}** was held briefly ({brief_poses.min():.1f} seconds). Practice holding fundamental poses for **15 to 30 seconds** to maximize physical benefit.")
-        
-        recommendations.append("• Progression Goal: Concentrate on gaining more flexibility or depth in the postures where you spent the least amount of time.")
-
-        if recommendations:
-            list_data = [[Paragraph(rec, styles['Normal'])] for rec in recommendations]
-            list_table = Table(list_data, colWidths=[6.5*inch])
-            list_table.setStyle(TableStyle([('LEFTPADDING', (0, 0), (-1, -1), 0), ('VALIGN', (0, 0), (-1, -1), 'TOP'), ('LINEABOVE', (0, 0), (-1, 0), 1, colors.lightgrey)]))
-            story.append(list_table)
-            
-    else:
-        story.append(Paragraph("⚠️ No pose data recorded during this session.", styles['Normal']))
-    
-    doc.build(story)
-    print(f"✅ Report generated: {report_path}")
-    last_report_path = report_path
-    return report_path
-# --- END PDF GENERATION ---
-
+# --- FIREBASE STORAGE FUNCTION ---
+def save_session_to_firestore(uid, session_data, chunks=()):
+    """Queues the session document (with its frame chunks and the user's totals) for Firestore.
 
-# --- FIREBASE STORAGE FUNCTION (UNCHANGED) ---
-def save_session_to_firestore(uid, session_data):
-    """Saves the session data to the Firestore database."""
-    if db is None: return False
-    try:
-        # Uses Firestore client
-        session_ref = db.collection('users').document(uid).collection('yoga_sessions').document()
-        session_ref.set(session_data)
-        return True
-    except Exception as e:
-        print(f"❌ Failed to write to Firestore: {e}")
+    Returns False if it cannot be stored.
+    """
+    if not firebase.configured: return False
+    # Keyed by session id, so a retried or replayed write overwrites instead of duplicating.
+    session_path = f"users/{uid}/yoga_sessions/{session_data['session_id']}"
+    # Chunks are queued first, so a stored session document implies its chunks are stored too.
+    chunk_path = chunk_collection_path(uid, session_data['session_id'])
+    for chunk in chunks:
+        if not firestore_writes.set(f"{chunk_path}/{chunk['index']:04d}", chunk):
+            return False
+    if not firestore_writes.set(session_path, session_data):
         return False
+    # Lifetime totals in one document per user, updated with increments at most once per session (see user_stats.py)
+    return firestore_writes.set(user_stats_path(uid), session_stats_update(session_data), merge=True,
+                                once=applied_session_path(uid, session_data['session_id']))
 # --- END FIREBASE STORAGE FUNCTION ---
 
 # Flask Routes
@@ -211,19 +183,32 @@ def index():
 @app.route('/log_pose', methods=['POST'])
 @jwt_required  
 def log_pose():
-    """Receives pose data from frontend and appends to pose_log if session is active."""
-    global pose_log, session_active
-    
-    if not session_active:
+    """Receives pose data from frontend and appends it to the caller's session if it is active."""
+    session = sessions.get(g.uid)
+    if session is None or not session.active:
         return jsonify({'status': 'info', 'message': 'Session is not active.'}), 200
 
     try:
-        data = request.get_json()
-        if data and 'pose_data' in data:
-            pose_log.extend(data['pose_data'])
-            return jsonify({'status': 'success', 'message': f'Logged {len(data["pose_data"])} poses.'}), 200
+        try:
+            with span('log_pose.decode', mimetype=request.mimetype):
+                if request.mimetype == POSE_BATCH_MIMETYPE:
+                    # Compact binary batch, decoded straight into column arrays
+                    columns = decode_pose_batch(request.get_data())
+                else:
+                    data = request.get_json()
+                    if not data or 'pose_data' not in data:
+                        return jsonify({'status': 'error', 'message': 'Invalid pose data format.'}), 400
+                    columns = frames_from_records(data['pose_data'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'Invalid pose data format.'}), 400
         
-        return jsonify({'status': 'error', 'message': 'Invalid pose data format.'}), 400
+        with span('log_pose.append', frames=len(columns[0])):
+            logged = session.log_frames(*columns)
+        if logged is None:
+            return jsonify({'status': 'info', 'message': 'Session is not active.'}), 200
+        return jsonify({'status': 'success', 'message': f'Logged {logged} poses.'}), 200
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error logging pose data: {e}")
         return jsonify({'status': 'error', 'message': 'Failed to process pose data.'}), 500
@@ -233,42 +218,33 @@ def log_pose():
 @jwt_required  
 def start_session():
     """Start yoga session (protected route)"""
-    global session_active, pose_log
-    
-    session_active = True
-    pose_log = [] # Clear previous log
+    session = sessions.start(g.uid, g.display_name)
     
-    return jsonify({'status': 'success', 'message': f'Session started for {current_user_display_name}'})
+    return jsonify({'status': 'success', 'message': f'Session started for {session.display_name}', 'session_id': session.session_id})
 
 
 @app.route('/end_session', methods=['POST'])
 @jwt_required  
 def end_session():
     """End session, calculate points, generate report, and store in Firestore (protected route)"""
-    global session_active, current_user_uid, current_user_display_name
-    
-    if not session_active or not current_user_uid:
+    session = sessions.get(g.uid)
+    if session is None or not session.end():
         return jsonify({'status': 'error', 'message': 'No active session or user logged in.'}), 400
     
-    session_active = False
-    time.sleep(1)  
-    session_end_time = datetime.now()
+    session.display_name = g.display_name
+    with span('end_session.summary', frames=len(session.frames)):
+        summary = session.aggregates.summary()
+    session_end_time = datetime.now(timezone.utc)
     
     points_awarded = 0
     limit_message = None
     duration_seconds = 0
     avg_conf = 0
     
-    if pose_log:
-        df = pd.DataFrame(pose_log)
-        
-        if len(pose_log) > 1:
-            duration_seconds = pose_log[-1]['timestamp'] - pose_log[0]['timestamp']
-            duration_min = duration_seconds / 60
-        else:
-            duration_min = 0.0
-        
-        avg_conf = df['confidence'].mean()
+    if summary['frame_count']:
+        duration_seconds = summary['duration_seconds']
+        duration_min = duration_seconds / 60
+        avg_conf = summary['average_confidence']
         
         duration_min = max(0, duration_min)  
         base_factor = 10  
@@ -278,55 +254,211 @@ def end_session():
             points_awarded = 99
             limit_message = "Points capped at 99 to comply with limit."
     
+    # Frame-level history as a few compressed chunk documents (see session_chunks.py)
+    with span('end_session.encode_chunks'):
+        chunks = encode_session_chunks(session.frames, session.landmarks) if firebase.configured else []
+    frames_stored = len(session.frames)
+    # The summary and chunks are built; the ended session keeps only its aggregates.
+    session.release_buffers()
+    
     # Data structure for Firestore
     firestore_data = {
-        'uid': current_user_uid,
-        'display_name': current_user_display_name,
+        'uid': session.uid,
+        'session_id': session.session_id,
+        'display_name': session.display_name,
         'points_awarded': points_awarded,
         'session_end_time': session_end_time,
         'duration_seconds': duration_seconds,
         'average_confidence': float(avg_conf),
-        'report_summary': df['pose'].value_counts().to_dict() if pose_log else {},
+        'report_summary': summary['pose_counts'],
+        'pose_time_seconds': summary['pose_seconds'],
+        'longest_holds': longest_holds(summary['holds']),
+        'frames_stored': frames_stored,
+        'frame_chunks': len(chunks),
         'report_generated': True
     }
     
-    storage_success = save_session_to_firestore(current_user_uid, firestore_data)
-    report_path = generate_pdf_report(current_user_display_name, session_end_time)
+    with span('firestore.enqueue', writes=len(chunks) + 2):
+        storage_queued = save_session_to_firestore(session.uid, firestore_data, chunks)
+    with span('leaderboard.record'):
+        leaderboard.record(session.uid, session.display_name, points_awarded, session_end_time)
+    
+    def on_report_done(job):
+        report_index.add(session.uid, session.session_id, job.result,
+                         report_filename(session.display_name, session_end_time))
+    
+    # A profiled request stops here, so the job's profiled('report.render') can take the profiler.
+    finish_request_profile()
+    try:
+        # The report.* spans of the job are recorded under this one, after the response.
+        with span('report.submit'):
+            job = report_jobs.submit(session.uid, session.session_id, generate_pdf_report,
+                                     session.display_name, session_end_time, summary,
+                                     report_cache, report_jobs.run_cpu,
+                                     on_done=on_report_done)
+        report_job_id, report_status = job.job_id, job.status
+    except QueueFullError as e:
+        print(f"⚠️ Report not queued for session {session.session_id}: {e}")
+        report_job_id, report_status = None, 'rejected'
     
     return jsonify({
         'status': 'success',
         'message': f'Session ended, {points_awarded} points awarded.',
-        'report_path': report_path,
+        'session_id': session.session_id,
+        'report_job_id': report_job_id,
+        'report_status': report_status,
         'points_awarded': points_awarded,
-        'storage_status': 'success' if storage_success else 'failure',
+        'storage_status': 'queued' if storage_queued else 'failure',
         'limit_message': limit_message
     })
 
+@app.route('/report_status/<job_id>')
+@jwt_required
+def report_status(job_id):
+    """Poll a report job started by end_session (protected route)"""
+    job = report_jobs.get(job_id)
+    if job is None or job.uid != g.uid:
+        return jsonify({'status': 'error', 'message': 'Unknown report job.'}), 404
+    
+    return jsonify({'status': 'success', 'report_ready': job.status == 'done', 'job': job.to_dict()})
+
+@app.route('/report_queue')
+def report_queue():
+    """Report worker pool depth, latency and failure counts, plus PDF cache hit/miss counters"""
+    return jsonify({**report_jobs.stats(), 'cache': report_cache.stats()})
+
 @app.route('/download_report')
+@jwt_required
 def download_report():
-    """Download latest report"""
-    global last_report_path
+    """Download the caller's latest report, or the one for ?session_id= (protected route)"""
+    session_id = request.args.get('session_id')
+    record = report_index.get(g.uid, session_id) if session_id else report_index.latest(g.uid)
     
-    if last_report_path and os.path.exists(last_report_path):
-        return send_file(last_report_path, as_attachment=True)
+    if record:
+        return send_file(record.path, as_attachment=True, download_name=record.download_name)
     
-    reports = sorted([f for f in os.listdir(REPORTS_DIR) if f.endswith('.pdf')])
-    if reports:
-        latest_report = os.path.join(REPORTS_DIR, reports[-1])
-        last_report_path = latest_report
-        return send_file(latest_report, as_attachment=True)
+    return jsonify({'status': 'error', 'message': 'No reports available'}), 404
+
+@app.route('/reports')
+@jwt_required
+def list_reports():
+    """Paginated history of the caller's reports, newest first (protected route)"""
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(100, max(1, int(request.args.get('per_page', 20))))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'page and per_page must be integers.'}), 400
+    
+    records, total = report_index.history(g.uid, page, per_page)
+    return jsonify({
+        'status': 'success',
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'reports': [{'session_id': r.session_id, 'size': r.size, 'created_at': r.created_at,
+                     'file_name': r.download_name} for r in records]
+    })
+
+@app.route('/leaderboard')
+@jwt_required
+def get_leaderboard():
+    """Paginated points ranking for ?window=daily|weekly|all, plus the caller's standing (protected route)"""
+    window = request.args.get('window', 'weekly')
+    if window not in LEADERBOARD_WINDOWS:
+        return jsonify({'status': 'error', 'message': f"window must be one of {', '.join(LEADERBOARD_WINDOWS)}."}), 400
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(100, max(1, int(request.args.get('per_page', 20))))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'page and per_page must be integers.'}), 400
     
-    return jsonify({'status': 'error', 'message': 'No reports available'})
+    entries, total = leaderboard.page(window, (page - 1) * per_page, per_page)
+    return jsonify({
+        'status': 'success',
+        'window': window,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'entries': entries,
+        'me': leaderboard.standing(window, g.uid)
+    })
+
+@app.route('/user_stats')
+@jwt_required
+def user_stats():
+    """Lifetime totals for the caller, read from their one stats document (protected route)"""
+    db = firebase.firestore()
+    if db is None:
+        return jsonify({'status': 'error', 'message': 'Storage is unavailable.'}), 503
+    snapshot = db.document(user_stats_path(g.uid)).get()
+    return jsonify({'status': 'success', 'stats': stats_view(snapshot.to_dict() if snapshot.exists else {'uid': g.uid})})
 
 @app.route('/session_status')
 def session_status():
-    """Get current session status"""
-    return jsonify({
-        'session_active': session_active,
-        'poses_logged': len(pose_log),
-        'current_user_uid': current_user_uid,
-        'current_user_display_name': current_user_display_name
-    })
+    """Get session status for the caller identified by the optional Bearer token"""
+    session = None
+    id_token = _bearer_token()
+    if id_token:
+        try:
+            session = sessions.get(token_verifier.verify(id_token)['uid'])
+        except Exception as e:
+            print(f"JWT Verification Failed: {e}")
+    
+    status = session.status() if session else {
+        'session_id': None,
+        'session_active': False,
+        'poses_logged': 0,
+        'current_user_uid': None,
+        'current_user_display_name': None
+    }
+    status['live_sessions'] = sessions.live_count()
+    return jsonify(status)
+
+@app.route('/health')
+def health():
+    """Liveness plus Firebase client, write queue and leaderboard state; does not initialize Firebase."""
+    return jsonify({'status': 'ok', 'firebase': firebase.health(), 'firestore_writes': firestore_writes.stats(),
+                    'leaderboard': leaderboard.stats()})
+
+@app.route('/admin/profile')
+@jwt_required
+def admin_profile():
+    """Sampled CPU profile of this worker as flamegraph-ready collapsed stacks (admin only)"""
+    if g.uid not in ADMIN_UIDS:
+        return jsonify({'status': 'error', 'message': 'Admin access required.'}), 403
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval = float(request.args.get('interval_ms', 5)) / 1000
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'seconds and interval_ms must be numbers.'}), 400
+    if not (seconds > 0 and interval >= 0.001):
+        return jsonify({'status': 'error', 'message': 'seconds must be positive and interval_ms at least 1.'}), 400
+    
+    try:
+        stacks, stats = sampling_profiler.capture(seconds, interval, include_idle=request.args.get('idle') == '1')
+    except ProfilerBusyError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+    
+    response = Response(stacks, mimetype='text/plain')
+    response.headers['Content-Disposition'] = f"attachment; filename=profile-{os.getpid()}-{int(time.time())}.folded"
+    response.headers['X-Profile-Pid'] = str(os.getpid())
+    response.headers['X-Profile-Samples'] = str(stats['samples'])
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.cli.command('rebuild-user-stats')
+@click.argument('uids', nargs=-1)
+def rebuild_user_stats_command(uids):
+    """Recompute user_stats documents from stored sessions (all users, or the given UIDs)."""
+    db = firebase.firestore()
+    if db is None:
+        raise click.ClickException("Firestore is not configured.")
+    firestore_writes.flush()
+    click.echo(f"✅ Rebuilt stats for {rebuild_user_stats(db, uids)} users.")
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,88 @@
+"""Time the vectorized pose classifier and check it against the browser's labels.
+
+    python benchmarks/bench_classifier.py [--frames 1000 100000] [--json]
+
+Exits 1 if any fixture in fixtures/pose_fixtures.json is labelled differently
+from classifyPose in templates/index.html.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from yoga_app_core import NUM_LANDMARKS, calculate_angles, classify_angles, label_names  # noqa: E402
+
+FIXTURES_PATH = os.path.join(ROOT, 'fixtures', 'pose_fixtures.json')
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def check_parity(path=FIXTURES_PATH):
+    """Returns (fixture count, list of mismatch descriptions)."""
+    with open(path) as f:
+        fixtures = json.load(f)['fixtures']
+    landmarks = np.array([fx['landmarks'] for fx in fixtures], dtype=np.float64)
+    label_index, confidences = classify_angles(calculate_angles(landmarks))
+    names = label_names(label_index)
+
+    mismatches = []
+    for i, fx in enumerate(fixtures):
+        if names[i] != fx['pose'] or abs(float(confidences[i]) - fx['confidence']) > 1e-6:
+            mismatches.append(f"fixture {i}: expected {fx['pose']} ({fx['confidence']}), "
+                              f"got {names[i]} ({float(confidences[i]):.2f})")
+    return len(fixtures), mismatches
+
+
+def run(n_frames, repeat):
+    # MediaPipe-shaped input: x, y, z, visibility per landmark.
+    landmarks = np.random.default_rng(0).random((n_frames, NUM_LANDMARKS, 4)).astype(np.float32)
+    angles = calculate_angles(landmarks)
+    angle_time = best_of(lambda: calculate_angles(landmarks), repeat)
+    rule_time = best_of(lambda: classify_angles(angles), repeat)
+    return {
+        'frames': n_frames,
+        'angles_ms': angle_time * 1e3,
+        'rules_ms': rule_time * 1e3,
+        'total_ms': (angle_time + rule_time) * 1e3,
+        'ns_per_frame': (angle_time + rule_time) * 1e9 / n_frames,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    checked, mismatches = check_parity()
+    results = [run(n, args.repeat) for n in args.frames]
+    if args.json:
+        print(json.dumps({'parity': {'fixtures': checked, 'mismatches': len(mismatches)},
+                          'timings': results}, indent=2))
+    else:
+        print(f"parity: {checked - len(mismatches)}/{checked} fixtures match classifyPose")
+        for line in mismatches[:10]:
+            print(f"  {line}")
+        print(f"{'frames':>8} {'angles ms':>10} {'rules ms':>10} {'total ms':>10} {'ns/frame':>9}")
+        for r in results:
+            print(f"{r['frames']:>8} {r['angles_ms']:>10.2f} {r['rules_ms']:>10.2f} "
+                  f"{r['total_ms']:>10.2f} {r['ns_per_frame']:>9.1f}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Measure the cold-start import cost of app.py, per dependency, and fail on regressions.
+
+    python benchmarks/bench_cold_start.py [--runs 5] [--budget-ms 400] [--json]
+
+Each run imports app in a fresh interpreter with `-X importtime`. Self time
+is summed per top-level package, so a dependency is charged for its own
+modules no matter which import pulled it in. Exits 1 when the median
+import of app exceeds --budget-ms, or when a dependency that should load
+lazily (report rendering, Firestore, token verification) is imported at
+startup.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the code paths that need these may import them.
+LAZY_MODULES = ('reportlab', 'firebase_admin', 'google.cloud.firestore', 'jwt', 'cryptography', 'pandas')
+
+_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+_PROBE = (
+    "import sys, app; "
+    f"print('LOADED', ' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+)
+
+
+def import_profile():
+    """One cold import of app. Returns (app_ms, {package: self_ms}, [eager lazy modules])."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    packages = {}
+    app_ms = None
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        root = name.split('.')[0]
+        packages[root] = packages.get(root, 0.0) + int(self_us) / 1000
+        if name == 'app' and not indent:
+            app_ms = int(cumulative_us) / 1000
+    loaded = result.stdout.rsplit('LOADED', 1)[-1].split()
+    return app_ms, packages, loaded
+
+
+def run(runs):
+    app_times, per_package, eager = [], {}, set()
+    for _ in range(runs):
+        app_ms, packages, loaded = import_profile()
+        app_times.append(app_ms)
+        eager.update(loaded)
+        for name, ms in packages.items():
+            per_package.setdefault(name, []).append(ms)
+    medians = {name: statistics.median(times) for name, times in per_package.items()}
+    return {
+        'runs': runs,
+        'app_import_ms': statistics.median(app_times),
+        'app_import_ms_min': min(app_times),
+        'packages_ms': dict(sorted(medians.items(), key=lambda item: -item[1])),
+        'eager_lazy_modules': sorted(eager),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('COLD_START_BUDGET_MS', '400')),
+                        help='fail when the median import of app takes longer')
+    parser.add_argument('--top', type=int, default=15, help='packages to list')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    result = run(args.runs)
+    failures = []
+    if result['app_import_ms'] > args.budget_ms:
+        failures.append(f"import app took {result['app_import_ms']:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if result['eager_lazy_modules']:
+        failures.append(f"imported at startup: {', '.join(result['eager_lazy_modules'])}")
+    result['budget_ms'] = args.budget_ms
+    result['failures'] = failures
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import app: median {result['app_import_ms']:.1f} ms, min {result['app_import_ms_min']:.1f} ms "
+              f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+        print(f"{'package':<28} {'self ms':>8}")
+        for name, ms in list(result['packages_ms'].items())[:args.top]:
+            print(f"{name:<28} {ms:>8.1f}")
+        for failure in failures:
+            print(f"❌ {failure}")
+        if not failures:
+            print("✅ cold start within budget")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Time leaderboard updates, rank lookups and page reads at up to a million users.
+
+    python benchmarks/bench_leaderboard.py [--users 10000 1000000] [--json]
+
+Each size builds a board from synthetic totals (as a rebuild does), then
+times `record` for random users, `standing` for random users, and reading a
+page of 20 at the top, middle and bottom of the ranking.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Leaderboard, RankedBoard  # noqa: E402
+
+PAGE_SIZE = 20
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(n_users, ops, repeat):
+    rng = np.random.default_rng(0)
+    uids = [f"user-{i:07d}" for i in range(n_users)]
+    points = rng.integers(1, 5000, n_users).tolist()
+
+    start = time.perf_counter()
+    board = RankedBoard(None, dict(zip(uids, points)))
+    build_s = time.perf_counter() - start
+
+    leaderboard = Leaderboard()
+    leaderboard._boards['all'] = board
+    now = datetime.now(timezone.utc)
+    picks = [uids[i] for i in rng.integers(0, n_users, ops)]
+    gains = rng.integers(1, 100, ops).tolist()
+
+    def record():
+        for uid, gain in zip(picks, gains):
+            leaderboard.record(uid, uid, gain, now)
+
+    def standing():
+        for uid in picks:
+            leaderboard.standing('all', uid)
+
+    def pages(offset):
+        return lambda: [leaderboard.page('all', offset, PAGE_SIZE) for _ in range(ops)]
+
+    result = {
+        'users': n_users,
+        'build_ms': build_s * 1000,
+        'record_us': best_of(record, repeat) / ops * 1e6,
+        'standing_us': best_of(standing, repeat) / ops * 1e6,
+    }
+    for name, offset in (('top', 0), ('middle', n_users // 2), ('bottom', max(0, n_users - PAGE_SIZE))):
+        result[f'page_{name}_us'] = best_of(pages(offset), repeat) / ops * 1e6
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--ops', type=int, default=2000, help='operations per timing')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = [run(n, args.ops, args.repeat) for n in args.users]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'users':>9} {'build ms':>9} {'record us':>10} {'rank us':>8} {'top us':>7} {'mid us':>7} {'bottom us':>10}")
+    for r in results:
+        print(f"{r['users']:>9} {r['build_ms']:>9.0f} {r['record_us']:>10.2f} {r['standing_us']:>8.2f} "
+              f"{r['page_top_us']:>7.1f} {r['page_middle_us']:>7.1f} {r['page_bottom_us']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Load-test the HTTP session lifecycle: start, many /log_pose batches, end.
+
+    python benchmarks/bench_load.py --users 50 --batches 100 [--wire binary] [--json]
+
+Starts the app on an ephemeral port in this process, with token
+verification stubbed out (the bearer token is the uid) and the in-memory
+Firestore stand-in, so nothing leaves the machine. Each simulated user is a
+thread with its own keep-alive connection. All users run one phase at a
+time (start_session, then log_pose, then end_session) so every phase is
+measured under full concurrency, followed by a drain phase that waits for
+the queued reports and Firestore writes.
+
+Reports requests per second, p50/p95/p99 latency and the process RSS at
+the end of each phase. --json output is meant to be stored per commit and
+compared; the exit status is 1 when any request failed.
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Isolated, in-memory storage; must be set before app is imported.
+_WORKDIR = tempfile.mkdtemp(prefix='bench_load_')
+os.environ.setdefault('FIRESTORE_BACKEND', 'memory')
+os.environ.setdefault('FIRESTORE_JOURNAL_PATH', os.path.join(_WORKDIR, 'firestore_journal.jsonl'))
+os.environ.setdefault('REPORT_INDEX_PATH', os.path.join(_WORKDIR, 'report_index.sqlite3'))
+
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+
+import app as yoga_app  # noqa: E402
+from pose_wire import POSE_BATCH_MIMETYPE, encode_pose_batch  # noqa: E402
+
+POSES = ('Pranamasana', 'Hasta Uttanasana', 'Uttanasana', 'Dandasana', 'Bhujangasana', 'Adho Mukha Svanasana')
+PHASES = ('start_session', 'log_pose', 'end_session')
+
+
+def fake_verify(id_token):
+    """Treats the bearer token as the uid; stands in for Firebase verification."""
+    return {'uid': id_token, 'exp': time.time() + 3600}
+
+
+def start_server():
+    yoga_app.token_verifier.project_id = None
+    yoga_app.token_verifier.fallback = fake_verify
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    # HTTP/1.1 so each user keeps one connection, as a browser would.
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+    server = make_server('127.0.0.1', 0, yoga_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def rss_mb():
+    """Current resident set size in MiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def pose_batches(index, batches, frames, wire):
+    """Pre-encoded /log_pose bodies for one user, so encoding is not timed."""
+    rng = np.random.default_rng(index)
+    t0 = time.time()
+    bodies = []
+    for batch in range(batches):
+        timestamps = t0 + (batch * frames + np.arange(frames)) * 0.2
+        confidences = rng.uniform(0.6, 1.0, frames)
+        poses = [POSES[(batch // 10 + index) % len(POSES)]] * frames
+        if wire == 'binary':
+            bodies.append(encode_pose_batch(timestamps, confidences, poses))
+        else:
+            records = [{'pose': p, 'confidence': float(c), 'timestamp': float(t)}
+                       for p, c, t in zip(poses, confidences, timestamps)]
+            bodies.append(json.dumps({'pose_data': records}).encode())
+    return bodies
+
+
+class User:
+    def __init__(self, index, port, args):
+        self.token = f'load-user-{index}'
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.bodies = pose_batches(index, args.batches, args.frames_per_batch, args.wire)
+        self.content_type = POSE_BATCH_MIMETYPE if args.wire == 'binary' else 'application/json'
+        self.latencies = {phase: [] for phase in PHASES}
+        self.errors = []
+
+    def post(self, phase, body=b'{}', content_type='application/json'):
+        start = time.perf_counter()
+        try:
+            self.connection.request('POST', f'/{phase}', body, {
+                'Authorization': f'Bearer {self.token}', 'Content-Type': content_type})
+            response = self.connection.getresponse()
+            payload = response.read()
+            if response.status != 200 or json.loads(payload).get('status') != 'success':
+                self.errors.append(f'{self.token} {phase}: {response.status} {payload[:200]!r}')
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            self.errors.append(f'{self.token} {phase}: {e}')
+            self.connection.close()  # reconnects on the next request
+        self.latencies[phase].append(time.perf_counter() - start)
+
+    def run(self, phase):
+        if phase == 'log_pose':
+            for body in self.bodies:
+                self.post(phase, body, self.content_type)
+        else:
+            self.post(phase)
+
+
+def run_phase(users, phase):
+    threads = [threading.Thread(target=user.run, args=(phase,)) for user in users]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([s for user in users for s in user.latencies[phase]]) * 1000
+    result = {
+        'requests': len(latencies),
+        'errors': sum(1 for user in users for e in user.errors if f' {phase}:' in e),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'rss_mb': rss_mb(),
+    }
+    for q in (50, 95, 99):
+        result[f'p{q}_ms'] = float(np.percentile(latencies, q)) if len(latencies) else 0.0
+    return result
+
+
+def drain():
+    """Wait for the reports and Firestore writes queued by end_session."""
+    start = time.perf_counter()
+    yoga_app.report_jobs.shutdown(wait=True)
+    flushed = yoga_app.firestore_writes.flush(timeout=120)
+    return {'seconds': time.perf_counter() - start, 'firestore_flushed': bool(flushed), 'rss_mb': rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50, help='concurrent users')
+    parser.add_argument('--batches', type=int, default=100, help='/log_pose requests per user')
+    parser.add_argument('--frames-per-batch', type=int, default=12)
+    parser.add_argument('--wire', choices=('json', 'binary'), default='json', help='/log_pose body format')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    # The app logs with print(); keep stdout for the results.
+    with contextlib.redirect_stdout(sys.stderr):
+        server = start_server()
+        users = [User(i, server.server_port, args) for i in range(args.users)]
+        result = {
+            'users': args.users,
+            'batches_per_user': args.batches,
+            'frames_per_batch': args.frames_per_batch,
+            'wire': args.wire,
+            'rss_mb_idle': rss_mb(),
+            'phases': {},
+        }
+        for phase in PHASES:
+            result['phases'][phase] = run_phase(users, phase)
+        result['phases']['drain'] = drain()
+        server.shutdown()
+    errors = [e for user in users for e in user.errors]
+    result['errors'] = len(errors)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{args.users} users x {args.batches} batches x {args.frames_per_batch} frames ({args.wire}), "
+              f"idle RSS {result['rss_mb_idle']:.0f} MiB")
+        print(f"{'phase':<14} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'RSS MiB':>8}")
+        for phase in PHASES:
+            r = result['phases'][phase]
+            print(f"{phase:<14} {r['requests']:>8} {r['errors']:>6} {r['requests_per_second']:>8.0f} "
+                  f"{r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['p99_ms']:>7.2f} {r['rss_mb']:>8.0f}")
+        r = result['phases']['drain']
+        print(f"{'drain':<14} {r['seconds']:>8.2f}s reports and Firestore writes, RSS {r['rss_mb']:.0f} MiB")
+        for error in errors[:5]:
+            print('  error:', error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Measure the per-observation cost of the metrics registry and fail above a budget.
+
+    python benchmarks/bench_metrics.py [--budget-ns 1000] [--json]
+
+Times a counter increment, a histogram observation and a histogram
+observation wrapped in two perf_counter() calls (what a timed request
+pays), each on a pre-bound labelled child, plus rendering /metrics.
+Exits 1 when an observation costs more than --budget-ns.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry  # noqa: E402
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(n, repeat):
+    registry = MetricsRegistry(directory=None)
+    counter = registry.counter('bench_events_total', 'Events', ('kind',)).labels('a')
+    histogram = registry.histogram('bench_seconds', 'Latency', ('endpoint',)).labels('/log_pose')
+    perf_counter = time.perf_counter
+
+    def inc():
+        for _ in range(n):
+            counter.inc()
+
+    def observe():
+        for _ in range(n):
+            histogram.observe(0.012)
+
+    def timed():
+        for _ in range(n):
+            start = perf_counter()
+            histogram.observe(perf_counter() - start)
+
+    def loop():
+        for _ in range(n):
+            pass
+
+    baseline = best_of(loop, repeat)
+    for endpoint in range(50):
+        registry.histogram(f'bench_extra_{endpoint}_seconds', 'Latency', ('endpoint',)).labels('/x').observe(0.1)
+    return {
+        'observations': n,
+        'counter_inc_ns': (best_of(inc, repeat) - baseline) / n * 1e9,
+        'histogram_observe_ns': (best_of(observe, repeat) - baseline) / n * 1e9,
+        'timed_observe_ns': (best_of(timed, repeat) - baseline) / n * 1e9,
+        'render_ms': best_of(registry.render, repeat) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--observations', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ns', type=float, default=1000.0, help='fail when one observation costs more')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    result = run(args.observations, args.repeat)
+    worst = max(result['counter_inc_ns'], result['histogram_observe_ns'])
+    result['budget_ns'] = args.budget_ns
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"counter inc        {result['counter_inc_ns']:8.0f} ns")
+        print(f"histogram observe  {result['histogram_observe_ns']:8.0f} ns")
+        print(f"timed observe      {result['timed_observe_ns']:8.0f} ns  (incl. two perf_counter calls)")
+        print(f"render /metrics    {result['render_ms']:8.2f} ms  (52 families)")
+        print("❌ over budget" if worst > args.budget_ns else f"✅ within {args.budget_ns:.0f} ns budget")
+    if worst > args.budget_ns:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Time PDF report generation end to end and per section, with peak memory.
+
+    python benchmarks/bench_reports.py [--frames 10 100000] [--poses 1 50] [--json]
+
+For every (frames, distinct poses) pair, synthesizes a session the way the
+app records it: frames at 5 fps in holds of random length, folded into
+`SessionAggregates`. Then it times:
+
+* summary    the aggregates' `summary()` snapshot handed to the report
+* end_to_end `generate_pdf_report` on a cache miss (cache key, render, store)
+* cache_key  hashing the report inputs, which include every hold
+* metrics / duration / recommendations
+             building one section's flowables and laying it out alone
+* layout     laying out the complete report (`build_pdf`)
+
+Peak memory is measured separately with tracemalloc (which slows the
+code it traces), for building the summary and for one end-to-end report.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_cache import ReportCache  # noqa: E402
+from reports import (build_pdf, duration_section, generate_pdf_report, metrics_section,  # noqa: E402
+                     recommendations_section, report_header, report_styles)
+from session_store import POSE_NAMES, SessionAggregates  # noqa: E402
+
+FRAME_INTERVAL = 0.2  # seconds, the client's 5 fps
+BATCH_FRAMES = 1000
+END_TIME = datetime(2024, 6, 1, 7, 30)
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def peak_kib(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def synthetic_frames(n_frames, n_poses, seed=0):
+    """(timestamps, confidences, codes) of a session cycling through `n_poses` poses in holds."""
+    rng = np.random.default_rng(seed)
+    codes_table = np.array([POSE_NAMES.code(f'Bench Pose {i:02d}') for i in range(n_poses)], dtype=np.uint8)
+    # Holds of 2 to 60 seconds, each of a random pose; shorter in small sessions so all poses occur.
+    longest = max(2, min(300, n_frames // n_poses))
+    lengths = rng.integers(min(10, longest - 1), longest, n_frames // min(10, longest - 1) + 1)
+    poses = codes_table[rng.integers(0, n_poses, len(lengths))]
+    codes = np.repeat(poses, lengths)[:n_frames]
+    timestamps = 1.7e9 + np.arange(n_frames) * FRAME_INTERVAL
+    confidences = rng.uniform(0.55, 1.0, n_frames).astype(np.float32)
+    return timestamps, confidences, codes
+
+
+def aggregate(frames):
+    aggregates = SessionAggregates()
+    timestamps, confidences, codes = frames
+    for i in range(0, len(timestamps), BATCH_FRAMES):
+        batch = slice(i, i + BATCH_FRAMES)
+        aggregates.update(timestamps[batch], confidences[batch], codes[batch])
+    return aggregates
+
+
+def run(n_frames, n_poses, repeat, directory):
+    frames = synthetic_frames(n_frames, n_poses)
+    aggregates = aggregate(frames)
+    summary = aggregates.summary()
+    styles = report_styles()
+    renders = iter(range(10**9))
+
+    def end_to_end():
+        # A new user name per run, so every run is a cache miss.
+        generate_pdf_report(f'bench-{next(renders)}', END_TIME, summary, cache)
+
+    def section(build):
+        return lambda: build_pdf(report_header(styles) + build())
+
+    sections = {
+        'metrics': lambda: metrics_section('bench', END_TIME, summary, styles),
+        'duration': lambda: duration_section(summary, styles),
+        'recommendations': lambda: recommendations_section(summary, styles),
+    }
+    full_story = lambda: (report_header(styles) + sections['metrics']() + sections['duration']()  # noqa: E731
+                          + sections['recommendations']())
+
+    cache = ReportCache(directory, max_bytes=10**12)
+    result = {
+        'frames': n_frames,
+        'pose_variety': n_poses,
+        'poses': len(summary['pose_counts']),  # distinct poses that occur
+        'holds': len(summary['holds']),
+        'summary_ms': best_of(aggregates.summary, repeat) * 1000,
+        'end_to_end_ms': best_of(end_to_end, repeat) * 1000,
+        'cache_key_ms': best_of(lambda: ReportCache.key_for('bench', END_TIME, summary), repeat) * 1000,
+    }
+    for name, build in sections.items():
+        result[f'{name}_ms'] = best_of(section(build), repeat) * 1000
+    result['layout_ms'] = best_of(lambda: build_pdf(full_story()), repeat) * 1000
+    result['summary_peak_kib'] = peak_kib(lambda: aggregate(frames).summary())
+    result['end_to_end_peak_kib'] = peak_kib(end_to_end)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, nargs='+', default=[10, 1000, 100000, 1000000])
+    parser.add_argument('--poses', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench_reports_')
+    try:
+        # generate_pdf_report logs with print(); keep stdout for the results.
+        with contextlib.redirect_stdout(sys.stderr):
+            results = [run(f, p, args.repeat, directory) for f in args.frames for p in args.poses]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'frames':>8} {'poses':>5} {'holds':>6} {'summary':>8} {'e2e ms':>7} {'key ms':>7} {'metrics':>8} {'duration':>8} "
+          f"{'recs':>6} {'layout':>7} {'sum KiB':>8} {'e2e KiB':>8}")
+    for r in results:
+        print(f"{r['frames']:>8} {r['poses']:>5} {r['holds']:>6} {r['summary_ms']:>8.2f} {r['end_to_end_ms']:>7.1f} "
+              f"{r['cache_key_ms']:>7.1f} {r['metrics_ms']:>8.1f} {r['duration_ms']:>8.1f} {r['recommendations_ms']:>6.1f} "
+              f"{r['layout_ms']:>7.1f} {r['summary_peak_kib']:>8.0f} {r['end_to_end_peak_kib']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Compare the JSON and binary /log_pose encodings: body size and server-side parse time.
+
+    python benchmarks/bench_wire_format.py [--frames 12 600 20000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pose_wire import encode_pose_batch, decode_pose_batch  # noqa: E402
+from session_store import frames_from_records  # noqa: E402
+
+POSES = ['Pranamasana', 'Hasta Uttanasana', 'Uttanasana', 'Ashwa Sanchalanasana (L)', 'Dandasana',
+         'Ashtanga Namaskara', 'Bhujangasana', 'Adho Mukha Svanasana', 'Unknown']
+
+
+def synthetic_batch(n_frames, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = time.time() + np.cumsum(rng.uniform(0.15, 0.2, n_frames))
+    confidences = rng.choice([0.70, 0.80, 0.85, 0.88, 0.90, 0.92, 0.95], n_frames)
+    # Poses are held for runs of frames, like a real session.
+    poses = np.repeat(rng.choice(POSES, n_frames // 10 + 1), 10)[:n_frames]
+    return timestamps, confidences, poses
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(n_frames, repeat):
+    timestamps, confidences, poses = synthetic_batch(n_frames)
+    records = [{'pose': str(p), 'confidence': float(c), 'timestamp': float(t)}
+               for t, c, p in zip(timestamps, confidences, poses)]
+    json_body = json.dumps({'pose_data': records, 'user_name': 'Bench User'}).encode('utf-8')
+    binary_body = encode_pose_batch(timestamps, confidences, poses)
+
+    json_time = best_of(lambda: frames_from_records(json.loads(json_body)['pose_data']), repeat)
+    binary_time = best_of(lambda: decode_pose_batch(binary_body), repeat)
+    return {
+        'frames': n_frames,
+        'json_bytes': len(json_body),
+        'binary_bytes': len(binary_body),
+        'size_ratio': len(json_body) / len(binary_body),
+        'json_parse_us': json_time * 1e6,
+        'binary_parse_us': binary_time * 1e6,
+        'parse_speedup': json_time / binary_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, nargs='+', default=[12, 600, 20000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = [run(n, args.repeat) for n in args.frames]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'frames':>8} {'json B':>10} {'binary B':>10} {'size x':>7} {'json us':>10} {'binary us':>10} {'parse x':>8}")
+    for r in results:
+        print(f"{r['frames']:>8} {r['json_bytes']:>10} {r['binary_bytes']:>10} {r['size_ratio']:>7.1f} "
+              f"{r['json_parse_us']:>10.1f} {r['binary_parse_us']:>10.1f} {r['parse_speedup']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Local load test for the /ws/session streaming endpoint.
+
+Starts the app on an ephemeral port with token verification stubbed out
+and the in-memory Firestore stand-in, opens many simultaneous sockets (one
+user each), streams binary pose batches and reports throughput and ack
+latency. Frames are counted as the server acks them, so any it drops show
+up as frames_sent > frames_logged.
+
+    python benchmarks/ws_load_test.py --sockets 200 --batches 20 [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Isolated, in-memory storage; must be set before app is imported.
+_WORKDIR = tempfile.mkdtemp(prefix='ws_load_test_')
+os.environ.setdefault('FIRESTORE_BACKEND', 'memory')
+os.environ.setdefault('FIRESTORE_JOURNAL_PATH', os.path.join(_WORKDIR, 'firestore_journal.jsonl'))
+os.environ.setdefault('REPORT_INDEX_PATH', os.path.join(_WORKDIR, 'report_index.sqlite3'))
+
+import simple_websocket  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+import app as yoga_app  # noqa: E402
+from pose_wire import encode_pose_batch  # noqa: E402
+
+
+def fake_verify(id_token):
+    """Treats the bearer token as the uid; stands in for Firebase verification."""
+    return {'uid': id_token, 'exp': time.time() + 3600}
+
+
+def start_server():
+    yoga_app.token_verifier.project_id = None
+    yoga_app.token_verifier.fallback = fake_verify
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, yoga_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def post(base_url, path, token):
+    req = urllib.request.Request(base_url + path, data=b'{}', method='POST',
+                                 headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def run_user(index, args, base_url, ws_url, latencies, logged, errors, barrier):
+    token = f'load-user-{index}'
+    try:
+        post(base_url, '/start_session', token)
+        ws = simple_websocket.Client.connect(ws_url)
+        ws.send(json.dumps({'type': 'auth', 'token': token}))
+        barrier.wait()
+        frames = args.frames_per_batch
+        t0 = time.time()
+        for batch in range(args.batches):
+            # One contiguous timeline per socket; overlapping batches would be dropped as out of order.
+            timestamps = t0 + (batch * frames + np.arange(frames)) * 0.2
+            body = encode_pose_batch(timestamps, np.full(frames, 0.9), ['Dandasana'] * frames)
+            sent = time.perf_counter()
+            ws.send(body)
+            while True:
+                message = json.loads(ws.receive(timeout=30))
+                if message['type'] == 'ack':
+                    latencies.append(time.perf_counter() - sent)
+                    logged.append(message['logged'])
+                    break
+                if message['type'] == 'error':
+                    raise RuntimeError(message['message'])
+            time.sleep(args.interval)
+        ws.close()
+        post(base_url, '/end_session', token)
+    except Exception as e:
+        errors.append(f'{token}: {e}')
+        try:
+            barrier.abort()
+        except threading.BrokenBarrierError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sockets', type=int, default=200)
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--frames-per-batch', type=int, default=12)
+    parser.add_argument('--interval', type=float, default=0.05, help='seconds between batches per socket')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    server = start_server()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    ws_url = f'ws://127.0.0.1:{server.server_port}/ws/session'
+    latencies, logged, errors = [], [], []
+    barrier = threading.Barrier(args.sockets)
+    threads = [threading.Thread(target=run_user, args=(i, args, base_url, ws_url, latencies, logged, errors, barrier))
+               for i in range(args.sockets)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    lat = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    result = {
+        'sockets': args.sockets,
+        'batches_acked': len(latencies),
+        'frames_sent': len(latencies) * args.frames_per_batch,
+        'frames_logged': sum(logged),
+        'errors': len(errors),
+        'elapsed_seconds': elapsed,
+        'frames_per_second': sum(logged) / elapsed,
+        'ack_ms_p50': float(np.percentile(lat, 50)),
+        'ack_ms_p95': float(np.percentile(lat, 95)),
+        'ack_ms_p99': float(np.percentile(lat, 99)),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f'{key:>18}: {value:.2f}' if isinstance(value, float) else f'{key:>18}: {value}')
+        for error in errors[:5]:
+            print('  error:', error)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+
+# Service account JSON, inline or as a file path (Render, DigitalOcean set the env var).
+FIREBASE_CREDENTIALS = os.environ.get('FIREBASE_CREDENTIALS', 'firebase_service_account.json')
+FIREBASE_PROJECT_ID = os.environ.get('FIREBASE_PROJECT_ID')
+# 'firestore' (default) or 'memory' for the in-process stand-in (tests, local runs).
+FIRESTORE_BACKEND = os.environ.get('FIRESTORE_BACKEND', 'firestore')
+# After a failed initialization, wait this long before trying again (seconds).
+FIREBASE_RETRY_INTERVAL = 60
+
+
+def load_credentials_info(value=FIREBASE_CREDENTIALS):
+    """Service account JSON (inline in the env var or from the file), or None."""
+    try:
+        if value.startswith('{'):
+            return json.loads(value)
+        if os.path.exists(value):
+            with open(value) as f:
+                return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error reading Firebase credentials: {e}")
+    return None
+
+
+class FirebaseClient:
+    """Lazily initialized Firebase app, Firestore client and Auth, shared by all threads.
+
+    Nothing is imported or connected until the first `firestore()` or
+    `verify_id_token()` call. Initialization is double-checked under a lock,
+    so concurrent first requests create one app and one Firestore client
+    (and with it one gRPC channel) that every later request reuses.
+    """
+
+    def __init__(self, credentials_info=None, project_id=None, backend=FIRESTORE_BACKEND):
+        self.credentials_info = credentials_info
+        self.project_id = project_id or (credentials_info or {}).get('project_id')
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._app = None
+        self._firestore = None
+        self._failed_at = None
+        self.last_error = None
+        self.init_seconds = {}
+        self.initialized_at = None
+
+    @classmethod
+    def from_env(cls):
+        info = load_credentials_info()
+        if info is None and FIRESTORE_BACKEND != 'memory':
+            print("⚠️ Firebase credentials not found. DB functions disabled.")
+        return cls(info, FIREBASE_PROJECT_ID)
+
+    @property
+    def configured(self):
+        return self.credentials_info is not None or self.backend == 'memory'
+
+    def firestore(self):
+        """The shared Firestore client, created on first call. None when unavailable."""
+        client = self._firestore
+        if client is not None or not self.configured or self._backing_off():
+            return client
+        with self._lock:
+            if self._firestore is None and not self._backing_off():
+                self._firestore = self._timed('firestore', self._create_firestore)
+        return self._firestore
+
+    def use_firestore(self, client):
+        """Replace the Firestore client, e.g. with a `MemoryFirestore` in tests."""
+        with self._lock:
+            self._firestore = client
+            self._failed_at = None
+
+    def verify_id_token(self, id_token):
+        """Verification through the Firebase Admin SDK (used when no project id is configured)."""
+        from firebase_admin import auth
+        with self._lock:
+            app = self._firebase_app()
+        return auth.verify_id_token(id_token, app=app)
+
+    def health(self):
+        """Initialization state for health checks; never triggers initialization itself."""
+        if not self.configured:
+            status = 'disabled'
+        elif self._firestore is not None:
+            status = 'ok'
+        elif self._failed_at is not None:
+            status = 'error'
+        else:
+            status = 'idle'
+        return {
+            'status': status,
+            'backend': self.backend if self._firestore is None else type(self._firestore).__name__,
+            'project_id': self.project_id,
+            'init_seconds': dict(self.init_seconds),
+            'initialized_at': self.initialized_at,
+            'last_error': self.last_error,
+        }
+
+    def _create_firestore(self):
+        if self.backend == 'memory':
+            from memory_firestore import MemoryFirestore
+            return MemoryFirestore()
+        from firebase_admin import firestore
+        return firestore.client(app=self._firebase_app())
+
+    def _firebase_app(self):
+        # Called with the lock held; raises if the app cannot be initialized.
+        if self._app is None:
+            import firebase_admin
+            from firebase_admin import credentials
+            start = time.perf_counter()
+            if not firebase_admin._apps:  # Prevent re-initialization error
+                firebase_admin.initialize_app(credentials.Certificate(self.credentials_info))
+            self._app = firebase_admin.get_app()
+            self.init_seconds['app'] = time.perf_counter() - start
+        return self._app
+
+    def _timed(self, component, create):
+        start = time.perf_counter()
+        try:
+            result = create()
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"❌ Error initializing Firebase {component}: {e}")
+            return None
+        self.init_seconds[component] = time.perf_counter() - start
+        self._failed_at = self.last_error = None
+        self.initialized_at = self.initialized_at or time.time()
+        print(f"✅ Firebase {component} initialized in {self.init_seconds[component]:.2f}s.")
+        return result
+
+    def _backing_off(self):
+        return self._failed_at is not None and time.monotonic() - self._failed_at < FIREBASE_RETRY_INTERVAL
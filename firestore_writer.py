@@ -0,0 +1,390 @@
+import atexit
+import base64
+import datetime
+import json
+import os
+import threading
+import time
+from collections import deque
+from memory_firestore import MemoryFirestore
+from metrics import REGISTRY
+from tracing import TRACER
+
+# Firestore accepts at most 500 writes per batched commit, and 10 MiB per request.
+FIRESTORE_BATCH_LIMIT = 500
+FIRESTORE_BATCH_MAX_BYTES = 9 * 1024 * 1024
+# A partial batch is committed once its oldest write has waited this long (seconds).
+FIRESTORE_FLUSH_INTERVAL = float(os.environ.get('FIRESTORE_FLUSH_INTERVAL', '1.0'))
+# Retry backoff after a failed commit: doubles from the base up to the cap (seconds).
+FIRESTORE_RETRY_BASE = 0.5
+FIRESTORE_RETRY_MAX = 30.0
+# Writes held in memory; beyond this new writes go straight to the journal.
+FIRESTORE_MAX_PENDING = int(os.environ.get('FIRESTORE_MAX_PENDING', '20000'))
+# Unflushed writes are appended here at exit and replayed on the next start.
+FIRESTORE_JOURNAL_PATH = os.environ.get('FIRESTORE_JOURNAL_PATH', '/tmp/firestore_journal.jsonl')
+# How long exit waits for a last commit before spilling to the journal (seconds).
+FIRESTORE_EXIT_TIMEOUT = 2.0
+# Writes Firestore rejects outright are appended here (with the error) instead of retried.
+FIRESTORE_DEAD_LETTER_PATH = os.environ.get('FIRESTORE_DEAD_LETTER_PATH', '/tmp/firestore_dead_letter.jsonl')
+# google.api_core errors that retrying cannot fix (matched by class name, so
+# google-cloud is not imported); anything else is retried.
+PERMANENT_ERRORS = frozenset(('InvalidArgument', 'PermissionDenied', 'FailedPrecondition', 'Unauthenticated',
+                              'AlreadyExists'))
+
+FIRESTORE_COMMIT_SECONDS = REGISTRY.histogram('yoga_firestore_commit_seconds', 'Batched Firestore commit time.', ('result',))
+FIRESTORE_WRITES = REGISTRY.counter('yoga_firestore_writes_total', 'Document writes committed to Firestore.')
+
+
+class FieldTransform:
+    """A server-side field transform that can sit in a queued write.
+
+    Queued writes use these instead of the google.cloud.firestore sentinels
+    so they can be journaled and applied by `MemoryFirestore`; they are
+    converted when committed to a real client.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.value!r})"
+
+
+class Increment(FieldTransform):
+    """Adds `value` to the stored number (a missing field counts as 0)."""
+
+    __slots__ = ()
+
+
+class Maximum(FieldTransform):
+    """Keeps the larger of `value` and the stored number."""
+
+    __slots__ = ()
+
+
+_TRANSFORMS = {cls.__name__: cls for cls in (Increment, Maximum)}
+
+
+class FirestoreWriteQueue:
+    """Write-behind queue that commits document writes to Firestore in batches.
+
+    `set()` only appends to an in-memory queue; a background thread commits
+    up to FIRESTORE_BATCH_LIMIT writes per batched commit, as soon as a full
+    batch is waiting or FIRESTORE_FLUSH_INTERVAL after the oldest write.
+    Failed commits are retried with exponential backoff and the writes stay
+    queued in order. A batch rejected with a permanent error (PERMANENT_ERRORS)
+    is bisected to find the offending writes, which are appended to the
+    dead-letter file so they cannot block the queue.
+
+    Full-document sets addressed by path are idempotent, so a retried or
+    replayed commit is harmless. Writes that are not (merges with `Increment`)
+    pass `once`: the path of a marker document created in the same atomic
+    commit. If a commit that timed out client-side had in fact succeeded,
+    the retry fails with AlreadyExists and the write is dropped as applied.
+
+    Anything still queued when the process exits is appended to a JSONL
+    journal, which the next process replays on startup.
+    """
+
+    def __init__(self, get_client, journal_path=FIRESTORE_JOURNAL_PATH, batch_limit=FIRESTORE_BATCH_LIMIT,
+                 flush_interval=FIRESTORE_FLUSH_INTERVAL, max_pending=FIRESTORE_MAX_PENDING,
+                 dead_letter_path=FIRESTORE_DEAD_LETTER_PATH):
+        self._get_client = get_client
+        self.journal_path = journal_path
+        self.dead_letter_path = dead_letter_path
+        self.batch_limit = min(batch_limit, FIRESTORE_BATCH_LIMIT)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._file_lock = threading.Lock()  # serializes journal and dead-letter appends
+        self._pending = deque()  # (path, data, merge, enqueued_at, payload bytes)
+        self._in_flight = []
+        self._thread = None
+        self._closed = False
+        self._retry_at = 0.0
+        self._failures_in_row = 0
+        self.committed = 0
+        self.batches = 0
+        self.failures = 0
+        self.journaled = 0
+        self.dead_lettered = 0
+        self.already_applied = 0
+        self.last_error = None
+        self.last_commit_seconds = None
+        atexit.register(self.close)
+
+    def set(self, path, data, merge=False, once=None):
+        """Queue a document write. Returns False if the queue is closed.
+
+        With `once` (a marker document path) the write is applied at most once,
+        however often it is retried or replayed.
+        """
+        with self._cond:
+            if self._closed:
+                return False
+            overflow = len(self._pending) >= self.max_pending
+            if not overflow:
+                self._pending.append((path, data, merge, time.monotonic(), _payload_bytes(data), once))
+                self._ensure_thread()
+                if len(self._pending) >= self.batch_limit:
+                    self._cond.notify()
+        if overflow:
+            # Journaled outside the lock, so the fsync never stalls other requests or the writer.
+            self._spill([(path, data, merge, once)])
+        return True
+
+    def replay_journal(self):
+        """Queue the writes journaled by a previous process. Returns how many were loaded."""
+        # Renaming first means only one process replays a given journal.
+        replay_path = f"{self.journal_path}.replay-{os.getpid()}"
+        try:
+            os.replace(self.journal_path, replay_path)
+        except FileNotFoundError:
+            return 0
+        loaded = 0
+        with open(replay_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line, object_hook=_decode_value)
+                except ValueError:
+                    continue  # a torn last line from a crash
+                self.set(entry['path'], entry['data'], entry.get('merge', False), entry.get('once'))
+                loaded += 1
+        os.remove(replay_path)
+        if loaded:
+            print(f"✅ Replayed {loaded} journaled Firestore writes.")
+        return loaded
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is committed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=FIRESTORE_EXIT_TIMEOUT):
+        """Stop the writer: commit what is queued if Firestore is healthy, journal the rest."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._retry_at = 0.0
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            # A commit still running after the timeout is journaled too; replaying it is
+            # harmless, since non-idempotent writes carry a `once` marker.
+            leftover = [_journal_write(entry) for entry in list(self._in_flight) + list(self._pending)]
+            self._pending.clear()
+        if leftover:
+            self._spill(leftover)
+
+    def stats(self):
+        with self._cond:
+            oldest = self._pending[0][3] if self._pending else None
+            return {
+                'pending': len(self._pending) + len(self._in_flight),
+                'oldest_pending_seconds': time.monotonic() - oldest if oldest is not None else 0.0,
+                'committed': self.committed,
+                'batches': self.batches,
+                'failures': self.failures,
+                'journaled': self.journaled,
+                'dead_lettered': self.dead_lettered,
+                'already_applied': self.already_applied,
+                'last_commit_seconds': self.last_commit_seconds,
+                'last_error': self.last_error,
+            }
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='firestore-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batch = self._next_batch_locked()
+                if batch is None:
+                    return
+                self._in_flight = batch
+            retry = self._commit(batch)
+            with self._cond:
+                self._in_flight = []
+                if not retry:
+                    self._failures_in_row = 0
+                else:
+                    # Put the uncommitted writes back in front, in order, and back off.
+                    self._pending.extendleft(reversed(retry))
+                    self._failures_in_row += 1
+                    delay = min(FIRESTORE_RETRY_MAX, FIRESTORE_RETRY_BASE * 2 ** (self._failures_in_row - 1))
+                    self._retry_at = time.monotonic() + delay
+                    if self._closed:
+                        return
+                self._cond.notify_all()
+
+    def _next_batch_locked(self):
+        """Waits until a batch is due. Returns None once closed and drained, or closed while failing."""
+        while True:
+            now = time.monotonic()
+            if self._closed and (not self._pending or self._failures_in_row):
+                return None
+            if self._pending and now >= self._retry_at:
+                due = self._pending[0][3] + self.flush_interval
+                if self._closed or len(self._pending) >= self.batch_limit or now >= due:
+                    return self._take_batch_locked()
+                self._cond.wait(due - now)
+            elif self._pending:
+                self._cond.wait(self._retry_at - now)
+            else:
+                self._cond.wait()
+
+    def _take_batch_locked(self):
+        batch = [self._pending.popleft()]
+        size = batch[0][4]
+        while self._pending and len(batch) < self.batch_limit:
+            size += self._pending[0][4]
+            if size > FIRESTORE_BATCH_MAX_BYTES:
+                break
+            batch.append(self._pending.popleft())
+        return batch
+
+    def _commit(self, batch):
+        """Commits `batch`. Returns the writes still to be retried, in order (empty on success)."""
+        with TRACER.trace('firestore.commit', writes=len(batch)):
+            error = self._commit_batch(batch)
+        if error is None:
+            return []
+        if not _is_permanent(error):
+            return batch
+        if len(batch) == 1:
+            if batch[0][5] is not None and _error_named(error, 'AlreadyExists'):
+                # The marker exists: an earlier, unconfirmed commit of this write succeeded.
+                with self._cond:
+                    self.already_applied += 1
+                return []
+            self._dead_letter(batch[0], error)
+            return []
+        # Bisect to separate the rejected writes from the good ones.
+        middle = len(batch) // 2
+        retry = self._commit(batch[:middle])
+        if retry:
+            return retry + batch[middle:]
+        return self._commit(batch[middle:])
+
+    def _commit_batch(self, batch):
+        """Returns None on success, or the exception the commit raised."""
+        start = time.perf_counter()
+        try:
+            client = self._get_client()
+            if client is None:
+                raise RuntimeError("Firestore is unavailable")
+            native = not isinstance(client, MemoryFirestore)
+            write_batch = client.batch()
+            for path, data, merge, _, _, once in batch:
+                if once is not None:
+                    write_batch.create(client.document(once), {'write': path})
+                write_batch.set(client.document(path), _native_transforms(data) if native else data, merge=merge)
+            write_batch.commit()
+        except Exception as e:
+            FIRESTORE_COMMIT_SECONDS.labels('error').observe(time.perf_counter() - start)
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            action = 'rejected' if _is_permanent(e) else 'will retry'
+            print(f"❌ Failed to write to Firestore ({len(batch)} writes, {action}): {e}")
+            return e
+        self.committed += len(batch)
+        self.batches += 1
+        self.last_commit_seconds = time.perf_counter() - start
+        FIRESTORE_COMMIT_SECONDS.labels('ok').observe(self.last_commit_seconds)
+        FIRESTORE_WRITES.inc(len(batch))
+        return None
+
+    def _spill(self, writes):
+        """Append writes to the journal (called without the queue lock)."""
+        entries = [{'path': path, 'data': data, 'merge': merge, 'once': once} for path, data, merge, once in writes]
+        if self._append(self.journal_path, entries):
+            with self._cond:
+                self.journaled += len(writes)
+            print(f"⚠️ Journaled {len(writes)} unflushed Firestore writes to {self.journal_path}")
+
+    def _dead_letter(self, write, error):
+        """Set aside a write Firestore rejected permanently; it is not replayed."""
+        path, data, merge, once = _journal_write(write)
+        entry = {'path': path, 'data': data, 'merge': merge, 'once': once, 'error': f"{type(error).__name__}: {error}"}
+        if self._append(self.dead_letter_path, [entry]):
+            with self._cond:
+                self.dead_lettered += 1
+            print(f"⚠️ Dead-lettered rejected Firestore write {path} to {self.dead_letter_path}")
+
+    def _append(self, file_path, entries):
+        try:
+            with self._file_lock, open(file_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, default=_encode_value) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except (OSError, TypeError, ValueError) as e:
+            print(f"❌ Could not write {len(entries)} Firestore writes to {file_path}: {e}")
+            return False
+        return True
+
+
+def _journal_write(entry):
+    """(path, data, merge, once) of a queued entry."""
+    return entry[0], entry[1], entry[2], entry[5]
+
+
+def _is_permanent(error):
+    """True for commit errors that retrying cannot fix."""
+    return any(cls.__name__ in PERMANENT_ERRORS for cls in type(error).__mro__)
+
+
+def _error_named(error, name):
+    return any(cls.__name__ == name for cls in type(error).__mro__)
+
+
+def _payload_bytes(data):
+    """Size of the binary fields of a document, the part that counts against the request limit."""
+    return sum(len(value) for value in data.values() if isinstance(value, bytes))
+
+
+def _native_transforms(data):
+    """Swaps `FieldTransform`s for the google.cloud.firestore equivalents."""
+    converted = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            value = _native_transforms(value)
+        elif isinstance(value, FieldTransform):
+            from google.cloud import firestore
+            value = getattr(firestore, type(value).__name__)(value.value)
+        converted[key] = value
+    return converted
+
+
+def _encode_value(value):
+    if isinstance(value, FieldTransform):
+        return {'__transform__': type(value).__name__, 'value': value.value}
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Cannot journal value of type {type(value).__name__}")
+
+
+def _decode_value(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.datetime.fromisoformat(obj['__datetime__'])
+    if len(obj) == 2 and obj.get('__transform__') in _TRANSFORMS:
+        return _TRANSFORMS[obj['__transform__']](obj['value'])
+    if len(obj) == 1 and '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    return obj
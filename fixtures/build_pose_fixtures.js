@@ -0,0 +1,98 @@
+// Builds fixtures/pose_fixtures.json: synthetic 33-point skeletons labelled by the
+// browser classifier (classifyPose in templates/index.html with the generated
+// static/pose_classifier.js), so the Python engine in yoga_app_core.py can be
+// checked against the exact JS labels.
+//
+//     node fixtures/build_pose_fixtures.js
+const fs = require('fs');
+const path = require('path');
+
+const root = path.join(__dirname, '..');
+const html = fs.readFileSync(path.join(root, 'templates', 'index.html'), 'utf8');
+
+function extractFunction(name) {
+    const start = html.indexOf(`function ${name}(`);
+    let depth = 0;
+    for (let i = html.indexOf('{', start); i < html.length; i++) {
+        if (html[i] === '{') depth++;
+        if (html[i] === '}' && --depth === 0) return html.slice(start, i + 1);
+    }
+    throw new Error(`${name} not found in index.html`);
+}
+
+// classifyPose calls into the classifier generated from pose_rules.json.
+const generated = fs.readFileSync(path.join(root, 'static', 'pose_classifier.js'), 'utf8');
+const classifyPose = new Function(
+    `${generated}\n${extractFunction('calculateAngle')}\n${extractFunction('classifyPose')}\nreturn classifyPose;`)();
+
+// Deterministic PRNG so the fixture file is reproducible.
+let seed = 20251121;
+function random() {
+    seed = (seed * 1103515245 + 12345) % 2147483648;
+    return seed / 2147483648;
+}
+
+function rotate(origin, toward, degrees, length) {
+    // Point at `length` from origin, `degrees` away from the direction origin->toward.
+    const base = Math.atan2(toward.y - origin.y, toward.x - origin.x);
+    const theta = base + degrees * Math.PI / 180;
+    return { x: origin.x + length * Math.cos(theta), y: origin.y + length * Math.sin(theta) };
+}
+
+// Joint angle values to draw from; none sit on a rule threshold.
+const ANGLES = [25, 35, 60, 85, 95, 105, 120, 150, 165, 172, 178];
+const round = (v) => Math.round(v * 1e6) / 1e6;
+
+function skeleton(angles) {
+    const points = Array.from({ length: 33 }, () => ({ x: 0.5, y: 0.5 }));
+    const sides = [
+        { hip: 23, shoulder: 11, elbow: 13, wrist: 15, knee: 25, ankle: 27, x: 0.45, sign: 1 },
+        { hip: 24, shoulder: 12, elbow: 14, wrist: 16, knee: 26, ankle: 28, x: 0.55, sign: -1 },
+    ];
+    sides.forEach((side, i) => {
+        const [elbow, knee, hip, shoulder] = [angles.elbow[i], angles.knee[i], angles.hip[i], angles.shoulder[i]];
+        const H = { x: side.x, y: 0.55 };
+        const S = { x: side.x + 0.02 * random(), y: 0.25 };
+        const K = rotate(H, S, side.sign * hip, 0.22);
+        const A = rotate(K, H, -side.sign * knee, 0.2);
+        const E = rotate(S, H, -side.sign * shoulder, 0.15);
+        const W = rotate(E, S, side.sign * elbow, 0.14);
+        Object.assign(points, { [side.hip]: H, [side.shoulder]: S, [side.knee]: K,
+                                [side.ankle]: A, [side.elbow]: E, [side.wrist]: W });
+    });
+    return points.map(p => ({ x: round(p.x), y: round(p.y) }));
+}
+
+const pick = () => ANGLES[Math.floor(random() * ANGLES.length)];
+const high = () => [165, 172, 178][Math.floor(random() * 3)];
+const low = (max) => ANGLES.filter(a => a < max)[Math.floor(random() * ANGLES.filter(a => a < max).length)];
+const pair = (f) => [f(), f()];
+
+// Templates biased toward each rule, plus fully random skeletons.
+const templates = [
+    () => ({ elbow: pair(pick), knee: pair(high), hip: pair(high), shoulder: pair(high) }),
+    () => ({ elbow: pair(high), knee: pair(high), hip: pair(high), shoulder: pair(() => low(40)) }),
+    () => ({ elbow: pair(pick), knee: pair(high), hip: pair(() => low(90)), shoulder: pair(pick) }),
+    () => ({ elbow: pair(pick), knee: [low(100), high()], hip: [low(100), high()], shoulder: pair(pick) }),
+    () => ({ elbow: pair(pick), knee: [high(), low(100)], hip: [high(), low(100)], shoulder: pair(pick) }),
+    () => ({ elbow: pair(high), knee: pair(high), hip: pair(() => low(110)), shoulder: pair(pick) }),
+    () => ({ elbow: pair(pick), knee: pair(() => low(100)), hip: pair(() => [105, 120, 150][Math.floor(random() * 3)]), shoulder: pair(pick) }),
+    () => ({ elbow: pair(() => low(160)), knee: pair(high), hip: pair(high), shoulder: pair(pick) }),
+    () => ({ elbow: pair(pick), knee: pair(pick), hip: pair(pick), shoulder: pair(pick) }),
+];
+
+const fixtures = [];
+for (let i = 0; i < 180; i++) {
+    const landmarks = skeleton(templates[i % templates.length]());
+    const result = classifyPose(landmarks);
+    fixtures.push({ landmarks: landmarks.map(p => [p.x, p.y]), pose: result.pose, confidence: parseFloat(result.confidence) });
+}
+
+const out = path.join(__dirname, 'pose_fixtures.json');
+fs.writeFileSync(out, JSON.stringify({
+    source: 'classifyPose in templates/index.html (node fixtures/build_pose_fixtures.js)',
+    fixtures,
+}) + '\n');
+const counts = {};
+fixtures.forEach(f => { counts[f.pose] = (counts[f.pose] || 0) + 1; });
+console.log(`Wrote ${fixtures.length} fixtures to ${out}`, counts);
@@ -0,0 +1,265 @@
+"""In-memory points leaderboards: today, this week and all time.
+
+Each window keeps a `SortedList` of ``(-points, uid)`` next to a uid -> points
+dict, so recording points, looking up a rank and reading any page are all
+O(log n) (plus the page length), even with a million users. Daily and weekly
+windows are keyed by UTC day / ISO week and reset when the period rolls over.
+
+The boards live in each worker process. Points from this worker's sessions
+are applied immediately. Every LEADERBOARD_REFRESH_INTERVAL seconds
+`Leaderboard.update` picks up sessions that ended on other workers: it reads
+only the user_stats documents whose ``last_session_at`` moved since the last
+sync, plus those users' sessions of the current week. `Leaderboard.rebuild`
+reloads every user_stats document and runs at first use and then every
+LEADERBOARD_FULL_REBUILD_INTERVAL seconds. Both queries are single-field
+range filters on one collection, so they use Firestore's automatic indexes;
+no composite or collection-group index is needed. Points only ever
+accumulate, so a reload keeps the larger of the local and stored totals:
+sessions still in the Firestore write queue are not lost by a reload.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sortedcontainers import SortedList
+from user_stats import USER_STATS_COLLECTION
+
+# Seconds between incremental syncs, and between full reloads, from Firestore.
+LEADERBOARD_REFRESH_INTERVAL = float(os.environ.get('LEADERBOARD_REFRESH_INTERVAL', '300'))
+LEADERBOARD_FULL_REBUILD_INTERVAL = float(os.environ.get('LEADERBOARD_FULL_REBUILD_INTERVAL', '86400'))
+# An incremental sync re-reads this many seconds before the previous one, for
+# stats writes that reached Firestore late (write queue batching and retries).
+LEADERBOARD_SYNC_OVERLAP = float(os.environ.get('LEADERBOARD_SYNC_OVERLAP', '600'))
+LEADERBOARD_WINDOWS = ('daily', 'weekly', 'all')
+
+
+def _period(window, at):
+    """Period key for a timestamp: the UTC day, the ISO week, or None for all time."""
+    if window == 'all':
+        return None
+    at = at.astimezone(timezone.utc) if at.tzinfo else at
+    if window == 'daily':
+        return at.date().isoformat()
+    year, week, _ = at.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _at_or_after(at, start):
+    """`at >= start` for a stored timestamp; naive datetimes are taken as UTC."""
+    if not isinstance(at, datetime):
+        return False
+    return (at if at.tzinfo else at.replace(tzinfo=timezone.utc)) >= start
+
+
+def _period_start(window, now):
+    day = datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
+    return day if window == 'daily' else day - timedelta(days=now.weekday())
+
+
+class RankedBoard:
+    """Points per uid, ordered by points descending then uid. Not thread-safe on its own."""
+
+    __slots__ = ('period', '_points', '_ranked')
+
+    def __init__(self, period=None, points=None):
+        self.period = period
+        self._points = dict(points or {})
+        self._ranked = SortedList((-p, uid) for uid, p in self._points.items())
+
+    def __len__(self):
+        return len(self._points)
+
+    def add(self, uid, points):
+        self._set(uid, self._points.get(uid, 0) + points)
+
+    def raise_to(self, uid, points):
+        if points > self._points.get(uid, 0):
+            self._set(uid, points)
+
+    def _set(self, uid, points):
+        old = self._points.get(uid)
+        if old is not None:
+            self._ranked.remove((-old, uid))
+        self._points[uid] = points
+        self._ranked.add((-points, uid))
+
+    def rank(self, uid):
+        """1-based rank of uid, or None if it has no points in this window."""
+        points = self._points.get(uid)
+        if points is None:
+            return None
+        return self._ranked.index((-points, uid)) + 1
+
+    def points(self, uid):
+        return self._points.get(uid)
+
+    def page(self, offset, limit):
+        """[(rank, uid, points)] for ranks offset+1 .. offset+limit."""
+        return [(offset + i + 1, uid, -neg) for i, (neg, uid)
+                in enumerate(self._ranked.islice(offset, offset + limit))]
+
+
+class Leaderboard:
+    """Daily, weekly and all-time `RankedBoard`s for one process, guarded by one lock."""
+
+    def __init__(self, get_db=None, refresh_interval=LEADERBOARD_REFRESH_INTERVAL,
+                 full_rebuild_interval=LEADERBOARD_FULL_REBUILD_INTERVAL, sync_overlap=LEADERBOARD_SYNC_OVERLAP):
+        self._get_db = get_db
+        self.refresh_interval = refresh_interval
+        self.full_rebuild_interval = full_rebuild_interval
+        self.sync_overlap = sync_overlap
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        now = datetime.now(timezone.utc)
+        self._boards = {w: RankedBoard(_period(w, now)) for w in LEADERBOARD_WINDOWS}
+        self._names = {}
+        # uids recorded while a rebuild is reading Firestore, reconciled at the swap
+        self._dirty = None
+        self._next_refresh_at = 0.0
+        self.rebuilt_at = None  # last full reload
+        self.synced_at = None  # start of the last full or incremental reload
+        self.last_error = None
+
+    def record(self, uid, display_name, points, at):
+        """Credit points earned at datetime `at` to every window that covers it."""
+        with self._lock:
+            self._names[uid] = display_name
+            if self._dirty is not None:
+                self._dirty.add(uid)
+            now = datetime.now(timezone.utc)
+            for window in LEADERBOARD_WINDOWS:
+                board = self._current(window, now)
+                if points and _period(window, at) == board.period:
+                    board.add(uid, points)
+
+    def page(self, window, offset, limit):
+        """(entries, total) for one window; entries are dicts with rank, display_name and points."""
+        self._maybe_refresh()
+        with self._lock:
+            board = self._current(window)
+            entries = [{'rank': rank, 'display_name': self._names.get(uid), 'points': points}
+                       for rank, uid, points in board.page(offset, limit)]
+            return entries, len(board)
+
+    def standing(self, window, uid):
+        """{'rank', 'points'} for uid in a window; rank is None without points."""
+        with self._lock:
+            board = self._current(window)
+            return {'rank': board.rank(uid), 'points': board.points(uid) or 0}
+
+    def rebuild(self):
+        """Reload all windows from Firestore. Returns the number of all-time entries."""
+        db = self._get_db() if self._get_db else None
+        if db is None:
+            return 0
+        started = time.time()
+        now = datetime.now(timezone.utc)
+        week_start = _period_start('weekly', now)
+        names, totals, active = {}, {}, []
+        for snapshot in db.collection(USER_STATS_COLLECTION).stream():
+            data = snapshot.to_dict()
+            names[snapshot.id] = data.get('display_name')
+            if data.get('points'):
+                totals[snapshot.id] = data['points']
+            if _at_or_after(data.get('last_session_at'), week_start):
+                active.append(snapshot.id)
+
+        loaded = {'all': totals, **self._periodic_points(db, active, now)}
+        with self._lock:
+            local = {w: dict(b._points) for w, b in self._boards.items() if b.period == _period(w, now)}
+            self._dirty = set()
+        # Merging and sorting happen outside the lock; only uids recorded meanwhile are redone under it.
+        boards = {}
+        for window, points in loaded.items():
+            for uid, p in local.get(window, {}).items():
+                if p > points.get(uid, 0):
+                    points[uid] = p
+            boards[window] = RankedBoard(_period(window, now), points)
+        with self._lock:
+            for window, board in boards.items():
+                current = self._boards[window]
+                if current.period == board.period:
+                    for uid in self._dirty:
+                        board.raise_to(uid, current.points(uid) or 0)
+            self._boards = boards
+            self._dirty = None
+            self._names.update(names)
+            self.rebuilt_at = time.time()
+            self.synced_at = started
+        return len(boards['all'])
+
+    def update(self):
+        """Apply user_stats documents changed since the last sync. Returns how many were read."""
+        db = self._get_db() if self._get_db else None
+        if db is None or self.synced_at is None:
+            return 0
+        started = time.time()
+        now = datetime.now(timezone.utc)
+        since = datetime.fromtimestamp(self.synced_at - self.sync_overlap, timezone.utc)
+        query = db.collection(USER_STATS_COLLECTION).where('last_session_at', '>=', since)
+        changed = {snapshot.id: snapshot.to_dict() for snapshot in query.stream()}
+        periodic = self._periodic_points(db, list(changed), now)
+        with self._lock:
+            for uid, data in changed.items():
+                self._names[uid] = data.get('display_name')
+                self._current('all', now).raise_to(uid, data.get('points') or 0)
+                for window, points in periodic.items():
+                    self._current(window, now).raise_to(uid, points.get(uid, 0))
+            self.synced_at = started
+        return len(changed)
+
+    @staticmethod
+    def _periodic_points(db, uids, now):
+        """{window: {uid: points}} for today and this week, from the given users' stored sessions."""
+        periodic = {w: {} for w in LEADERBOARD_WINDOWS if w != 'all'}
+        week_start = _period_start('weekly', now)
+        for uid in uids:
+            query = db.collection(f"users/{uid}/yoga_sessions").where('session_end_time', '>=', week_start)
+            for snapshot in query.stream():
+                data = snapshot.to_dict()
+                points, at = data.get('points_awarded'), data.get('session_end_time')
+                if not points or at is None:
+                    continue
+                for window, totals_by_uid in periodic.items():
+                    if _period(window, at) == _period(window, now):
+                        totals_by_uid[uid] = totals_by_uid.get(uid, 0) + points
+        return periodic
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': {w: len(b) for w, b in self._boards.items()},
+                'rebuilt_at': self.rebuilt_at,
+                'synced_at': self.synced_at,
+                'last_error': self.last_error,
+            }
+
+    def _current(self, window, now=None):
+        # Called with the lock held; starts a fresh board when the day or week rolls over.
+        board = self._boards[window]
+        period = _period(window, now or datetime.now(timezone.utc))
+        if board.period != period:
+            board = self._boards[window] = RankedBoard(period)
+        return board
+
+    def _maybe_refresh(self):
+        """Starts a background sync when the boards are stale; never blocks the caller."""
+        if self._get_db is None:
+            return
+        if time.time() >= self._next_refresh_at and self._refresh_lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh, name='leaderboard-rebuild', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            if self.rebuilt_at is None or time.time() - self.rebuilt_at >= self.full_rebuild_interval:
+                self.rebuild()
+            else:
+                self.update()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"❌ Leaderboard refresh failed: {e}")
+        finally:
+            # Also after a failure: wait a full interval before trying again.
+            self._next_refresh_at = time.time() + self.refresh_interval
+            self._refresh_lock.release()
@@ -0,0 +1,160 @@
+import json
+import time
+from pose_wire import decode_pose_batch
+from session_store import POSE_NAMES, frames_from_records
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:  # the streaming endpoint is optional
+    Sock = None
+
+# Seconds between status/feedback pushes on an open socket.
+STATUS_PUSH_INTERVAL = 1.0
+# The first message must authenticate within this many seconds.
+WS_AUTH_TIMEOUT = 10.0
+
+
+def register_live_stream(app, sessions, verify_token):
+    """Adds the /ws/session streaming endpoint. Returns False if flask-sock is not installed."""
+    if Sock is None:
+        print("⚠️ flask-sock not installed. /ws/session streaming disabled.")
+        return False
+
+    sock = Sock(app)
+
+    @sock.route('/ws/session')
+    def session_stream(ws):
+        """Persistent per-user channel: frames in, acks and status/feedback out."""
+        try:
+            LiveStream(ws, sessions, verify_token).run()
+        except ConnectionClosed:
+            pass
+
+    return True
+
+
+class LiveStream:
+    """One WebSocket connection.
+
+    Protocol (JSON text messages unless noted):
+      client -> {"type": "auth", "token": <Firebase ID token>}   first, and again to refresh
+      client -> {"type": "frames", "pose_data": [...]} or a binary pose_wire batch
+      server -> {"type": "ready"} | {"type": "ack", "logged": n} | {"type": "status", ...}
+                | {"type": "error", "message": ...}
+    Every frames message gets exactly one ack, info or error reply, in order,
+    so the client can wait for its last batch before ending the session. A
+    failed refresh auth is answered with an error carrying "reply_to": "auth",
+    which is not a frames reply.
+    Frames go through the same session methods as POST /log_pose.
+    """
+
+    def __init__(self, ws, sessions, verify_token):
+        self.ws = ws
+        self.sessions = sessions
+        self.verify_token = verify_token
+        self.uid = None
+        self.token_exp = 0.0
+
+    def run(self):
+        message = self.ws.receive(timeout=WS_AUTH_TIMEOUT)
+        data = self._parse(message) if isinstance(message, str) else None
+        if not data or data.get('type') != 'auth' or not self._authenticate(data):
+            self.ws.close(reason=1008, message='Authentication required')
+            return
+        self._send({'type': 'ready', 'uid': self.uid})
+
+        next_status = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= next_status:
+                self._push_status()
+                next_status = now + STATUS_PUSH_INTERVAL
+            message = self.ws.receive(timeout=max(0.0, next_status - time.monotonic()))
+            if message is not None:
+                self._handle(message)
+
+    def _parse(self, message):
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _authenticate(self, data):
+        try:
+            claims = self.verify_token(data['token'])
+        except Exception as e:
+            print(f"JWT Verification Failed: {e}")
+            return False
+        # A connection stays bound to the user that opened it.
+        if self.uid is not None and claims['uid'] != self.uid:
+            return False
+        self.uid = claims['uid']
+        self.token_exp = float(claims['exp'])
+        return True
+
+    def _handle(self, message):
+        data = None
+        if not isinstance(message, (bytes, bytearray)):
+            data = self._parse(message)
+            if data is None:
+                self._send({'type': 'error', 'message': 'Invalid message.'})
+                return
+        kind = 'frames' if data is None else data.get('type')
+
+        if kind == 'auth':
+            if not self._authenticate(data):
+                self._send({'type': 'error', 'message': 'Invalid or expired authentication token', 'reply_to': 'auth'})
+                self.ws.close(reason=1008, message='Authentication failed')
+            return
+        if time.time() >= self.token_exp:
+            # The client should send a fresh {"type": "auth"} before the token expires.
+            self._send({'type': 'error', 'message': 'Authentication token expired'})
+            self.ws.close(reason=1008, message='Token expired')
+            return
+
+        if kind == 'frames':
+            if data is None:
+                self._log(lambda: decode_pose_batch(message))
+            else:
+                self._log(lambda: frames_from_records(data['pose_data']))
+        elif kind == 'status':
+            self._push_status()
+        else:
+            self._send({'type': 'error', 'message': 'Unknown message type.'})
+
+    def _log(self, decode):
+        session = self.sessions.get(self.uid)
+        if session is None or not session.active:
+            self._send({'type': 'info', 'message': 'Session is not active.'})
+            return
+        try:
+            columns = decode()
+        except (KeyError, TypeError, ValueError):
+            self._send({'type': 'error', 'message': 'Invalid pose data format.'})
+            return
+        logged = session.log_frames(*columns)
+        if logged is None:
+            self._send({'type': 'info', 'message': 'Session is not active.'})
+        else:
+            self._send({'type': 'ack', 'logged': logged})
+
+    def _push_status(self):
+        session = self.sessions.get(self.uid)
+        if session is None:
+            self._send({'type': 'status', 'session_active': False, 'poses_logged': 0})
+            return
+        status = session.status()
+        aggregates = session.aggregates
+        current_code = aggregates.holds.current_code
+        status['type'] = 'status'
+        status['feedback'] = {
+            'current_pose': POSE_NAMES.name(current_code) if current_code is not None else None,
+            'average_confidence': aggregates.mean_confidence,
+            'duration_seconds': aggregates.duration_seconds,
+        }
+        self._send(status)
+
+    def _send(self, payload):
+        self.ws.send(json.dumps(payload))
@@ -0,0 +1,273 @@
+"""In-process stand-in for the subset of the Firestore client API this app uses.
+
+Select it with FIRESTORE_BACKEND=memory, or install one explicitly with
+`FirebaseClient.use_firestore(MemoryFirestore())`. Documents are plain dicts
+held under one lock; nothing is persisted. Increment/Maximum/Minimum field
+transforms (the google.cloud.firestore ones or firestore_writer's) are
+applied by type name, so google.cloud is never imported.
+"""
+import copy
+import operator
+import threading
+import uuid
+
+
+class AlreadyExists(ValueError):
+    """`create()` of an existing document (named like google.api_core's error)."""
+
+
+class MemoryFirestore:
+    """Thread-safe dict-backed replacement for `google.cloud.firestore.Client`."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # collection path -> {document id: data}, insertion ordered
+        self._collections = {}
+        self.writes = 0
+
+    def collection(self, name):
+        return MemoryCollection(self, name)
+
+    def document(self, path):
+        collection, _, doc_id = path.rpartition('/')
+        return MemoryDocument(self, collection, doc_id)
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def collection_group(self, collection_id):
+        return MemoryCollectionGroup(self, collection_id)
+
+    def collections(self):
+        with self._lock:
+            return [MemoryCollection(self, path) for path in self._collections if '/' not in path]
+
+    # Storage primitives, called with the lock held or taking it themselves.
+    def _get(self, collection, doc_id):
+        with self._lock:
+            data = self._collections.get(collection, {}).get(doc_id)
+            return copy.deepcopy(data)
+
+    def _set(self, collection, doc_id, data, merge=False):
+        with self._lock:
+            docs = self._collections.setdefault(collection, {})
+            if not (merge and doc_id in docs):
+                docs[doc_id] = {}
+            _merge(docs[doc_id], copy.deepcopy(data))
+            self.writes += 1
+
+    def _update(self, collection, doc_id, data):
+        with self._lock:
+            docs = self._collections.get(collection, {})
+            if doc_id not in docs:
+                raise KeyError(f"No document to update: {collection}/{doc_id}")
+            for field, value in data.items():
+                _set_field(docs[doc_id], field, copy.deepcopy(value))
+            self.writes += 1
+
+    def _delete(self, collection, doc_id):
+        with self._lock:
+            self._collections.get(collection, {}).pop(doc_id, None)
+            self.writes += 1
+
+    def _ids(self, collection):
+        with self._lock:
+            return list(self._collections.get(collection, {}))
+
+    def _paths(self, collection_id):
+        with self._lock:
+            return [path for path in self._collections if path.rpartition('/')[2] == collection_id]
+
+
+class MemoryCollection:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rpartition('/')[2]
+
+    def document(self, document_id=None):
+        return MemoryDocument(self._client, self.path, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(data)
+        return None, ref
+
+    def where(self, field, op, value):
+        return MemoryQuery(self).where(field, op, value)
+
+    def stream(self):
+        for doc_id in self._client._ids(self.path):
+            snapshot = self.document(doc_id).get()
+            if snapshot.exists:
+                yield snapshot
+
+    def get(self):
+        return list(self.stream())
+
+
+class MemoryCollectionGroup:
+    """Every collection with a given id, at any depth (`Client.collection_group`)."""
+
+    def __init__(self, client, collection_id):
+        self._client = client
+        self.id = collection_id
+
+    def where(self, field, op, value):
+        return MemoryQuery(self).where(field, op, value)
+
+    def stream(self):
+        for path in self._client._paths(self.id):
+            yield from MemoryCollection(self._client, path).stream()
+
+    def get(self):
+        return list(self.stream())
+
+
+class MemoryQuery:
+    """A collection (or group) filtered with `where`; documents missing the field never match."""
+
+    _OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le,
+                  '>': operator.gt, '>=': operator.ge}
+
+    def __init__(self, source, filters=()):
+        self._source = source
+        self._filters = filters
+
+    def where(self, field, op, value):
+        return MemoryQuery(self._source, self._filters + ((field, self._OPERATORS[op], value),))
+
+    def stream(self):
+        for snapshot in self._source.stream():
+            if all(_matches(snapshot, field, compare, value) for field, compare, value in self._filters):
+                yield snapshot
+
+    def get(self):
+        return list(self.stream())
+
+
+class MemoryDocument:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def collection(self, name):
+        return MemoryCollection(self._client, f"{self.path}/{name}")
+
+    def get(self):
+        return MemorySnapshot(self, self._client._get(self._collection, self.id))
+
+    def set(self, data, merge=False):
+        self._client._set(self._collection, self.id, data, merge=merge)
+
+    def create(self, data):
+        with self._client._lock:
+            if self._client._get(self._collection, self.id) is not None:
+                raise AlreadyExists(f"Document already exists: {self.path}")
+            self.set(data)
+
+    def update(self, data):
+        self._client._update(self._collection, self.id, data)
+
+    def delete(self):
+        self._client._delete(self._collection, self.id)
+
+
+class MemorySnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field):
+        value = self._data
+        for part in field.split('.'):
+            value = value[part]
+        return copy.deepcopy(value)
+
+
+class MemoryWriteBatch:
+    """Buffers writes and applies them together on `commit()`.
+
+    Like Firestore, a batch whose `create()` targets an existing document
+    fails as a whole, before any write is applied.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+        self._creates = []
+
+    def __len__(self):
+        return len(self._ops)
+
+    def set(self, reference, data, merge=False):
+        self._ops.append(lambda: reference.set(data, merge=merge))
+
+    def create(self, reference, data):
+        self._creates.append(reference)
+        self._ops.append(lambda: reference.create(data))
+
+    def update(self, reference, data):
+        self._ops.append(lambda: reference.update(data))
+
+    def delete(self, reference):
+        self._ops.append(reference.delete)
+
+    def commit(self):
+        with self._client._lock:
+            created = set()
+            for reference in self._creates:
+                if reference.path in created or reference.get().exists:
+                    raise AlreadyExists(f"Document already exists: {reference.path}")
+                created.add(reference.path)
+            for op in self._ops:
+                op()
+        results, self._ops, self._creates = [None] * len(self._ops), [], []
+        return results
+
+
+def _matches(snapshot, field, compare, value):
+    try:
+        return compare(snapshot.get(field), value)
+    except (KeyError, TypeError):
+        return False
+
+
+def _merge(target, data):
+    for key, value in data.items():
+        if isinstance(value, dict):
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            _merge(target[key], value)
+        else:
+            target[key] = _transformed(target.get(key), value)
+
+
+def _transformed(current, value):
+    """The stored result of writing `value` over `current`, applying field transforms."""
+    kind = type(value).__name__
+    if kind not in ('Increment', 'Maximum', 'Minimum') or not hasattr(value, 'value'):
+        return value
+    if not isinstance(current, (int, float)) or isinstance(current, bool):
+        return value.value
+    if kind == 'Increment':
+        return current + value.value
+    return max(current, value.value) if kind == 'Maximum' else min(current, value.value)
+
+
+def _set_field(document, field, value):
+    """Applies a dotted field path, as `DocumentReference.update` does."""
+    parts = field.split('.')
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = _transformed(document.get(parts[-1]), value)
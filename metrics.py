@@ -0,0 +1,355 @@
+"""Process-local metrics and their Prometheus text exposition (served at /metrics).
+
+Counters, gauges and histograms hold plain Python numbers behind one small
+lock per labelled child, so an observation costs a few hundred nanoseconds.
+Bind labels once at import time (``REQUEST_SECONDS.labels('/log_pose')``) and
+keep the child; `labels()` on the hot path adds a dict lookup.
+
+With several worker processes, set METRICS_DIR to a directory shared by
+them. Each process then writes a snapshot of its values to
+``metrics-{pid}.json`` every METRICS_FLUSH_INTERVAL seconds (and at exit),
+and /metrics on any worker adds up the snapshots of all of them. Counters
+and histograms of exited workers keep counting towards the totals: the
+next render folds them into ``metrics-archived.json`` and deletes the
+worker's file. Gauges only include live processes.
+"""
+import atexit
+import bisect
+import contextlib
+import fcntl
+import glob
+import json
+import os
+import threading
+
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+# Seconds; request and render latencies.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+ARCHIVE_FILE = 'metrics-archived.json'
+
+
+class CounterValue:
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        # acquire/release is measurably cheaper than `with` on this path.
+        self._lock.acquire()
+        try:
+            self.value += amount
+        finally:
+            self._lock.release()
+
+
+class GaugeValue:
+    __slots__ = ('_lock', 'value', '_function')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+        self._function = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, fn):
+        """Read the value from `fn()` at collection time instead."""
+        self._function = fn
+
+    def get(self):
+        return float(self._function()) if self._function is not None else self.value
+
+
+class HistogramValue:
+    __slots__ = ('_lock', '_bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        # Per-bucket (not cumulative) counts; the last slot is +Inf.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self._bounds, value)
+        self._lock.acquire()
+        try:
+            self.counts[i] += 1
+            self.sum += value
+        finally:
+            self._lock.release()
+
+
+class Metric:
+    """A named metric family; `labels(*values)` returns the child for one label set."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.labelnames:
+            self._unlabelled = self.labels()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self):
+        """{label values: value} snapshot, as plain JSON-friendly data."""
+        return {values: self._sample(child) for values, child in list(self._children.items())}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1):
+        self._unlabelled.inc(amount)
+
+    def _new_child(self):
+        return CounterValue()
+
+    def _sample(self, child):
+        return child.value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value):
+        self._unlabelled.set(value)
+
+    def set_function(self, fn):
+        self._unlabelled.set_function(fn)
+
+    def _new_child(self):
+        return GaugeValue()
+
+    def _sample(self, child):
+        return child.get()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def observe(self, value):
+        self._unlabelled.observe(value)
+
+    def _new_child(self):
+        return HistogramValue(self.buckets)
+
+    def _sample(self, child):
+        with child._lock:
+            return list(child.counts) + [child.sum]
+
+
+class MetricsRegistry:
+    """All metrics of this process, plus the multiprocess snapshot files."""
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        """This process's metrics as JSON-friendly data."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: {'kind': m.kind, 'help': m.documentation, 'labelnames': list(m.labelnames),
+                         'buckets': list(m.buckets) if m.kind == 'histogram' else None,
+                         'samples': [[list(values), value] for values, value in m.samples().items()]}
+                for m in metrics}
+
+    def start(self):
+        """Begin writing snapshots to `directory` (no-op when METRICS_DIR is unset)."""
+        if not self.directory or self._flusher is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.write_snapshot)
+
+    def write_snapshot(self):
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'metrics': self.snapshot()}, f)
+        os.replace(tmp, path)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                print(f"⚠️ Could not write metrics snapshot: {e}")
+
+    def render(self):
+        """Prometheus text exposition of this process, or of all processes sharing METRICS_DIR."""
+        if not self.directory:
+            return _render(self.snapshot())
+        self.write_snapshot()
+        merged = {}
+        dead = []
+        # Shared: no archive pass can move a snapshot into ARCHIVE_FILE mid-read and have it counted twice.
+        with self._archive_lock(fcntl.LOCK_SH):
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                data = _load(path)
+                if data is None:
+                    continue  # being replaced, or removed
+                alive = data['pid'] is not None and _alive(data['pid'])
+                _merge_snapshot(merged, data['metrics'], alive)
+                if data['pid'] is not None and not alive:
+                    dead.append(path)
+        if dead:
+            try:
+                self._archive(dead)
+            except OSError as e:
+                print(f"⚠️ Could not archive metrics snapshots: {e}")
+        return _render(merged)
+
+    def _archive(self, paths):
+        """Fold the counters and histograms of exited processes into ARCHIVE_FILE and delete their snapshots."""
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+        with self._archive_lock(fcntl.LOCK_EX):
+            archived = _load(archive_path) or {'pid': None, 'metrics': {}}
+            folded = []
+            for path in paths:
+                data = _load(path)  # re-read under the lock: another worker may have archived it
+                if data is None:
+                    continue
+                _merge_snapshot(archived['metrics'], data['metrics'], alive=False)
+                folded.append(path)
+            if not folded:
+                return
+            tmp = f"{archive_path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(archived, f)
+            os.replace(tmp, archive_path)
+            for path in folded:
+                os.remove(path)
+
+    @contextlib.contextmanager
+    def _archive_lock(self, operation):
+        """flock on a file in `directory`, shared by every process writing there."""
+        with open(os.path.join(self.directory, 'metrics-archive.lock'), 'a') as lock:
+            fcntl.flock(lock, operation)
+            yield
+
+
+def _load(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge_snapshot(merged, metrics, alive):
+    for name, family in metrics.items():
+        if family['kind'] == 'gauge' and not alive:
+            continue
+        target = merged.setdefault(name, dict(family, samples=[]))
+        index = {tuple(values): i for i, (values, _) in enumerate(target['samples'])}
+        for values, value in family['samples']:
+            i = index.get(tuple(values))
+            if i is None:
+                target['samples'].append([values, value])
+            elif isinstance(value, list):
+                target['samples'][i][1] = [a + b for a, b in zip(target['samples'][i][1], value)]
+            else:
+                target['samples'][i][1] += value
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    value = float(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _render(metrics):
+    lines = []
+    for name, family in metrics.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        names = family['labelnames']
+        for values, value in family['samples']:
+            if family['kind'] != 'histogram':
+                lines.append(f"{name}{_format_labels(names, values)} {_format_value(value)}")
+                continue
+            *counts, total = value
+            cumulative = 0
+            for bound, count in zip(list(family['buckets']) + [float('inf')], counts):
+                cumulative += count
+                label = _format_labels(names, values, ('le', _format_value(bound)))
+                lines.append(f"{name}_bucket{label} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(names, values)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(names, values)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,248 @@
+"""Declarative pose rules, compiled for NumPy and for the browser.
+
+pose_rules.json describes the angle features (three MediaPipe landmarks,
+angle measured at the middle one), named predicates and one rule per asana.
+A condition is either a predicate name or ``[feature, op, threshold]`` with
+op one of ``>``, ``>=``, ``<``, ``<=``, or ``[feature, "near", center, tol]``
+meaning ``abs(angle - center) < tol``. Rules are checked in ascending
+``priority``; the first one whose conditions all hold wins.
+
+`compile_rules` turns the file into a `RulePlan`: each distinct comparison
+becomes one vectorized op, each predicate used by more than one rule is
+ANDed once per batch, and the rules are then combined into a first-match
+label index. `generate_js` emits the same plan as static/pose_classifier.js::
+
+    python pose_rules.py            # rewrite static/pose_classifier.js
+    python pose_rules.py --check    # exit 1 if it is out of date
+"""
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POSE_RULES_PATH = os.environ.get('POSE_RULES_PATH', os.path.join(BASE_DIR, 'pose_rules.json'))
+POSE_CLASSIFIER_JS = os.path.join(BASE_DIR, 'static', 'pose_classifier.js')
+# Frames evaluated per block; keeps the boolean scratch rows in cache.
+RULE_BLOCK_FRAMES = 16384
+
+# MediaPipe Pose landmark order.
+LANDMARK_NAMES = (
+    'NOSE', 'LEFT_EYE_INNER', 'LEFT_EYE', 'LEFT_EYE_OUTER', 'RIGHT_EYE_INNER', 'RIGHT_EYE',
+    'RIGHT_EYE_OUTER', 'LEFT_EAR', 'RIGHT_EAR', 'MOUTH_LEFT', 'MOUTH_RIGHT', 'LEFT_SHOULDER',
+    'RIGHT_SHOULDER', 'LEFT_ELBOW', 'RIGHT_ELBOW', 'LEFT_WRIST', 'RIGHT_WRIST', 'LEFT_PINKY',
+    'RIGHT_PINKY', 'LEFT_INDEX', 'RIGHT_INDEX', 'LEFT_THUMB', 'RIGHT_THUMB', 'LEFT_HIP', 'RIGHT_HIP',
+    'LEFT_KNEE', 'RIGHT_KNEE', 'LEFT_ANKLE', 'RIGHT_ANKLE', 'LEFT_HEEL', 'RIGHT_HEEL',
+    'LEFT_FOOT_INDEX', 'RIGHT_FOOT_INDEX',
+)
+_LANDMARK_INDEX = {name: i for i, name in enumerate(LANDMARK_NAMES)}
+
+_COMPARE = {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal}
+
+
+class RuleError(ValueError):
+    """Raised for an invalid pose rule file."""
+
+
+def load_rules(path=POSE_RULES_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _parse_condition(cond, features):
+    """Normalizes ``[feature, op, threshold(, tol)]`` to a hashable tuple."""
+    if not isinstance(cond, list) or len(cond) < 3:
+        raise RuleError(f"Bad condition {cond!r}")
+    feature, op = cond[0], cond[1]
+    if feature not in features:
+        raise RuleError(f"Unknown angle feature {feature!r}")
+    if op == 'near' and len(cond) == 4:
+        return (feature, op, float(cond[2]), float(cond[3]))
+    if op in _COMPARE and len(cond) == 3:
+        return (feature, op, float(cond[2]), None)
+    raise RuleError(f"Bad condition {cond!r}")
+
+
+class RulePlan:
+    """A compiled rule file. `evaluate` classifies an (N, F) angle array."""
+
+    def __init__(self, spec):
+        features = spec['features']
+        self.features = tuple(features)
+        try:
+            self.joints = {name: tuple(_LANDMARK_INDEX[p] for p in points) for name, points in features.items()}
+        except KeyError as e:
+            raise RuleError(f"Unknown landmark {e.args[0]!r}")
+        if any(len(points) != 3 for points in self.joints.values()):
+            raise RuleError("Each angle feature needs exactly three landmarks")
+
+        rules = sorted(spec['rules'], key=lambda r: r['priority'])  # stable: ties keep file order
+        fallback = spec['fallback']
+        self.labels = (fallback['pose'],) + tuple(r['pose'] for r in rules)
+        self.confidences = np.array([fallback['confidence']] + [r['confidence'] for r in rules], dtype=np.float32)
+
+        # Distinct comparisons, each evaluated once per batch.
+        self.atoms = []
+        atom_index = {}
+
+        def atom(cond):
+            key = _parse_condition(cond, features)
+            if key not in atom_index:
+                atom_index[key] = len(self.atoms)
+                self.atoms.append(key)
+            return atom_index[key]
+
+        predicates = {}
+        for name, conds in spec.get('predicates', {}).items():
+            predicates[name] = tuple(sorted({atom(c) for c in conds}))
+
+        # Each rule becomes a set of terms: shared predicates and single comparisons.
+        rule_terms = []
+        for rule in rules:
+            names, atoms = set(), set()
+            for cond in rule['when']:
+                if isinstance(cond, str):
+                    if cond not in predicates:
+                        raise RuleError(f"Unknown predicate {cond!r} in rule {rule['pose']!r}")
+                    names.add(cond)
+                else:
+                    atoms.add(atom(cond))
+            rule_terms.append((names, atoms))
+
+        # Predicates used by several rules are materialized once; the rest are inlined.
+        uses = {}
+        for names, _ in rule_terms:
+            for name in names:
+                uses[name] = uses.get(name, 0) + 1
+        self.shared = [name for name in predicates if uses.get(name, 0) > 1]
+        shared_row = {name: len(self.atoms) + i for i, name in enumerate(self.shared)}
+        self.shared_atoms = [predicates[name] for name in self.shared]
+
+        self.rule_rows = []
+        for names, atoms in rule_terms:
+            rows = {shared_row[n] for n in names if n in shared_row}
+            covered = {a for n in names if n in shared_row for a in predicates[n]}
+            for n in names:
+                if n not in shared_row:
+                    atoms |= set(predicates[n])
+            rows |= atoms - covered
+            if not rows:
+                raise RuleError("A rule needs at least one condition")
+            self.rule_rows.append(tuple(sorted(rows)))
+
+        self._feature_column = {name: i for i, name in enumerate(self.features)}
+        # First-match lookup: row r of the match table is rule r; the extra last row is the fallback.
+        self._first_match = np.append(np.arange(1, len(rules) + 1), 0).astype(np.int8)
+
+    def evaluate(self, angles):
+        """(N, F) angles -> (label_index int8, confidence float32)."""
+        angles = np.asarray(angles, dtype=np.float64)
+        if angles.ndim != 2 or angles.shape[1] != len(self.features):
+            raise ValueError(f"Expected angles shaped (N, {len(self.features)}), got {angles.shape}")
+        columns = np.ascontiguousarray(angles.T)
+        n = columns.shape[1]
+        label_index = np.empty(n, dtype=np.int8)
+
+        block = min(n, RULE_BLOCK_FRAMES)
+        terms = np.empty((len(self.atoms) + len(self.shared), block), dtype=bool)
+        matched = np.empty((len(self.rule_rows) + 1, block), dtype=bool)
+        scratch = np.empty(block)
+        for start in range(0, n, RULE_BLOCK_FRAMES):
+            stop = min(start + RULE_BLOCK_FRAMES, n)
+            width = stop - start
+            self._eval_block(columns[:, start:stop], terms[:, :width], matched[:, :width], scratch[:width])
+            label_index[start:stop] = self._first_match[matched[:, :width].argmax(axis=0)]
+        return label_index, self.confidences[label_index]
+
+    def _eval_block(self, columns, terms, matched, scratch):
+        for row, (feature, op, value, tol) in enumerate(self.atoms):
+            x = columns[self._feature_column[feature]]
+            if op == 'near':
+                np.subtract(x, value, out=scratch)
+                np.abs(scratch, out=scratch)
+                np.less(scratch, tol, out=terms[row])
+            else:
+                _COMPARE[op](x, value, out=terms[row])
+        offset = len(self.atoms)
+        for i, rows in enumerate(self.shared_atoms):
+            _conjoin(terms, rows, terms[offset + i])
+        for r, rows in enumerate(self.rule_rows):
+            _conjoin(terms, rows, matched[r])
+        matched[-1] = True
+
+
+def _conjoin(terms, rows, out):
+    """out = AND of terms[rows], computed in place without a gathered copy."""
+    if len(rows) == 1:
+        np.copyto(out, terms[rows[0]])
+        return
+    np.logical_and(terms[rows[0]], terms[rows[1]], out=out)
+    for row in rows[2:]:
+        np.logical_and(out, terms[row], out=out)
+
+
+def compile_rules(spec):
+    return RulePlan(spec)
+
+
+def _js_condition(feature_column, key):
+    feature, op, value, tol = key
+    x = f"a[{feature_column[feature]}]"
+    if op == 'near':
+        return f"Math.abs({x} - {value:g}) < {tol:g}"
+    return f"{x} {op} {value:g}"
+
+
+def generate_js(plan, source='pose_rules.json'):
+    """Browser classifier equivalent to `plan.evaluate`, one frame at a time."""
+    column = plan._feature_column
+    lines = [
+        f"// Generated from {source} by `python pose_rules.py`. Do not edit by hand.",
+        "",
+        f"const POSE_ANGLE_FEATURES = {json.dumps(list(plan.features))};",
+        "// Landmark triples [a, b, c] per feature; the angle is measured at b.",
+        f"const POSE_ANGLE_JOINTS = {json.dumps([list(plan.joints[f]) for f in plan.features])};",
+        "",
+        "// a: angles in POSE_ANGLE_FEATURES order.",
+        "function classifyPoseAngles(a) {",
+    ]
+    for row, key in enumerate(plan.atoms):
+        lines.append(f"    const t{row} = {_js_condition(column, key)};")
+    offset = len(plan.atoms)
+    for i, (name, atoms) in enumerate(zip(plan.shared, plan.shared_atoms)):
+        lines.append(f"    const t{offset + i} = {' && '.join(f't{a}' for a in atoms)};  // {name}")
+    for label, confidence, rows in zip(plan.labels[1:], plan.confidences[1:], plan.rule_rows):
+        terms = ' && '.join(f"t{r}" for r in rows)
+        lines.append(f"    if ({terms}) return {{ pose: {json.dumps(label)}, confidence: {float(confidence):.2f} }};")
+    lines.append(f"    return {{ pose: {json.dumps(plan.labels[0])}, confidence: {float(plan.confidences[0]):.2f} }};")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate static/pose_classifier.js from the pose rule file.")
+    parser.add_argument('--rules', default=POSE_RULES_PATH)
+    parser.add_argument('--out', default=POSE_CLASSIFIER_JS)
+    parser.add_argument('--check', action='store_true', help='exit 1 if the generated file is stale')
+    args = parser.parse_args()
+
+    source = generate_js(compile_rules(load_rules(args.rules)), os.path.basename(args.rules))
+    if args.check:
+        try:
+            with open(args.out, encoding='utf-8') as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current != source:
+            print(f"❌ {args.out} is out of date; run python pose_rules.py")
+            sys.exit(1)
+        print(f"✅ {args.out} is up to date")
+        return
+    with open(args.out, 'w', encoding='utf-8') as f:
+        f.write(source)
+    print(f"✅ Wrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
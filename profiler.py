@@ -0,0 +1,219 @@
+"""On-demand CPU profiling of a running worker, without redeploying.
+
+* `SamplingProfiler` samples every thread's Python stack through
+  `sys._current_frames()` for a few seconds and returns collapsed stacks
+  (``thread;outer;...;leaf count`` per line), the input format of
+  flamegraph.pl, speedscope and inferno. It costs nothing while idle and
+  about a stack walk per thread per interval while sampling. Served at
+  /admin/profile to the uids listed in ADMIN_UIDS.
+
+* Per-request cProfile: with PROFILE_REQUESTS=all every request is profiled,
+  with PROFILE_REQUESTS=header only requests sending ``X-Profile: 1`` with an
+  admin's ID token. Each profile is dumped as a pstats file in PROFILE_DIR
+  and named in the ``X-Profile-File`` response header; only the newest
+  PROFILE_MAX_FILES are kept. `profiled()` blocks (report rendering) started
+  from a profiled request are profiled into their own file, even on a report
+  worker thread; the request calls `finish_request_profile()` before handing
+  the work off, so its own profile does not hold the profiler. With
+  REPORT_WORKER_MODE=process the render runs in another process and is not
+  profiled.
+
+Only one cProfile can be active per process (Python 3.12+ raises otherwise),
+so profiles are taken under a non-blocking lock: a request or block that
+finds it busy runs unprofiled and counts towards yoga_profiles_skipped_total.
+"""
+import contextlib
+import contextvars
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from metrics import REGISTRY
+
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', 'off')  # off | header | all
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/profiles')
+# pstats files kept in PROFILE_DIR; older ones are deleted.
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '100'))
+# Sampling limits for /admin/profile.
+PROFILE_MAX_SECONDS = 60.0
+PROFILE_DEFAULT_INTERVAL = 0.005
+# Leaf functions of threads that are blocked rather than running.
+IDLE_FUNCTIONS = frozenset({'wait', 'select', 'poll', 'epoll', 'accept', 'sleep', '_wait_for_tstate_lock'})
+
+_profile_requested = contextvars.ContextVar('profile_requested', default=None)
+# Held while a cProfile.Profile is enabled anywhere in the process.
+_cprofile_lock = threading.Lock()
+PROFILES_SKIPPED = REGISTRY.counter('yoga_profiles_skipped_total',
+                                    'Requested cProfile captures skipped because another one was running.', ('kind',))
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a sampling profile is already running in this process."""
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class SamplingProfiler:
+    """Statistical profiler over all threads of this process, one capture at a time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def capture(self, seconds, interval=PROFILE_DEFAULT_INTERVAL, include_idle=False):
+        """Sample for `seconds`. Returns (collapsed stack text, stats dict)."""
+        seconds = min(max(seconds, interval), PROFILE_MAX_SECONDS)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already being captured")
+        try:
+            return self._sample(seconds, interval, include_idle)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds, interval, include_idle):
+        stacks = Counter()
+        labels = {}  # code object -> label, computed once per function
+        own = threading.get_ident()
+        samples = idle = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if not include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                    idle += 1
+                    continue
+                path = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    path.append(label)
+                    frame = frame.f_back
+                path.append(names.get(thread_id, str(thread_id)).replace(';', ':'))
+                stacks[';'.join(reversed(path))] += 1
+            samples += 1
+            time.sleep(interval)
+        text = ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        return text, {'seconds': time.perf_counter() - started, 'samples': samples,
+                      'stacks': len(stacks), 'idle_skipped': idle, 'interval': interval}
+
+
+def request_profiling_enabled(headers, is_admin):
+    """True if the request should be profiled; `is_admin(headers)` gates the X-Profile header."""
+    if PROFILE_REQUESTS == 'all':
+        return True
+    return PROFILE_REQUESTS == 'header' and headers.get('X-Profile') == '1' and is_admin(headers)
+
+
+def _start_cprofile(kind):
+    """An enabled profile, or None if another one is active in this process."""
+    if not _cprofile_lock.acquire(blocking=False):
+        PROFILES_SKIPPED.labels(kind).inc()
+        return None
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except BaseException:
+        _cprofile_lock.release()
+        raise
+    return profile
+
+
+def _stop_cprofile(profile):
+    profile.disable()
+    _cprofile_lock.release()
+
+
+def _dump(profile, name):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+    path = os.path.join(PROFILE_DIR, f"{safe}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}.pstats")
+    profile.dump_stats(path)
+    _prune(PROFILE_MAX_FILES)
+    return path
+
+
+def _prune(keep):
+    """Delete all but the newest `keep` pstats files in PROFILE_DIR."""
+    try:
+        entries = [e for e in os.scandir(PROFILE_DIR) if e.name.endswith('.pstats')]
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        for entry in entries[keep:]:
+            os.remove(entry.path)
+    except OSError:
+        pass  # raced with another worker's prune
+
+
+@contextlib.contextmanager
+def profiled(name):
+    """Profile a block into its own pstats file when the current request is being profiled."""
+    if not _profile_requested.get():
+        yield
+        return
+    profile = _start_cprofile('block')
+    if profile is None:
+        print(f"⚠️ Profile of {name} skipped: another profile is running in this process.")
+        yield
+        return
+    try:
+        yield
+    finally:
+        _stop_cprofile(profile)
+        print(f"✅ Profile written: {_dump(profile, name)}")
+
+
+def finish_request_profile():
+    """Stop and dump the current request's profile now, not after the response.
+
+    Call it before handing work with a `profiled()` block to another thread,
+    which would otherwise find the profiler busy. Returns the pstats path, or
+    None if the request is not being profiled.
+    """
+    from flask import g, request
+    profile = g.pop('profile', None)
+    if profile is None:
+        return None
+    _stop_cprofile(profile)
+    g.profile_file = _dump(profile, f"{request.method}-{request.endpoint or 'unknown'}")
+    return g.profile_file
+
+
+def profile_flask(app, is_admin=lambda headers: False):
+    """cProfile the requests selected by PROFILE_REQUESTS.
+
+    `is_admin(headers)` decides whether an ``X-Profile: 1`` header is honoured.
+    """
+    if PROFILE_REQUESTS not in ('header', 'all'):
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        if request_profiling_enabled(request.headers, is_admin):
+            g.profile_token = _profile_requested.set(True)
+            g.profile = _start_cprofile('request')  # None while another profile is running
+
+    @app.after_request
+    def _stop_profile(response):
+        path = finish_request_profile() or g.pop('profile_file', None)
+        if path is not None:
+            response.headers['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def _reset_profile(exc):
+        # after_request is skipped on unhandled errors; never leave the profiler enabled.
+        profile = g.pop('profile', None)
+        if profile is not None:
+            _stop_cprofile(profile)
+        token = g.pop('profile_token', None)
+        if token is not None:
+            _profile_requested.reset(token)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Upper bound on cached PDFs kept in REPORTS_DIR (/tmp is small on Vercel).
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+_CACHE_FILE = re.compile(r'^[0-9a-f]{64}\.pdf$')
+
+
+class ReportCache:
+    """Content-addressed store of rendered report PDFs with size-bounded LRU eviction.
+
+    Files are named by a SHA-256 of the report inputs, so identical inputs map
+    to the same PDF and never need ReportLab again. Files already on disk are
+    picked up at startup, oldest first.
+    """
+
+    def __init__(self, directory, max_bytes=REPORT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_existing()
+
+    @staticmethod
+    def key_for(user_name, end_time, summary):
+        """Hash of everything that ends up in the rendered PDF."""
+        payload = {
+            'user_name': user_name,
+            'date': end_time.strftime('%B %d, %Y'),
+            'time': end_time.strftime('%I:%M %p'),
+            'summary': summary,
+        }
+        canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key):
+        """Path of the cached PDF for `key`, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                path = self.path_for(key)
+                if os.path.exists(path):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return path
+                # Removed behind our back (e.g. /tmp cleanup).
+                self._total_bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """Store PDF bytes under `key` and return the file path."""
+        path = self.path_for(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict_locked(keep=key)
+        return path
+
+    def _evict_locked(self, keep=None):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                break
+            del self._entries[key]
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+
+    def _load_existing(self):
+        found = []
+        for entry in os.scandir(self.directory):
+            if _CACHE_FILE.match(entry.name):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        with self._lock:
+            for _, key, size in sorted(found):
+                self._entries[key] = size
+                self._total_bytes += size
+            self._evict_locked()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
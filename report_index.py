@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# Reports kept per user, and for how long; older entries are dropped from the index.
+REPORT_RETENTION_PER_USER = int(os.environ.get('REPORT_RETENTION_PER_USER', '50'))
+REPORT_RETENTION_DAYS = float(os.environ.get('REPORT_RETENTION_DAYS', '30'))
+# How often the age-based retention sweep runs (seconds).
+RETENTION_SWEEP_INTERVAL = 3600
+
+ReportRecord = namedtuple('ReportRecord', 'uid session_id path size created_at download_name')
+
+
+class ReportIndex:
+    """Per-user index of generated reports, stored in SQLite.
+
+    Every lookup queries the database (indexed by user and creation time),
+    so reports added by any worker process are visible to all of them;
+    nothing scans REPORTS_DIR. Records whose PDF has been evicted from the
+    report cache are dropped when a lookup finds them missing, so history
+    only lists reports that can still be downloaded.
+    """
+
+    def __init__(self, db_path, max_per_user=REPORT_RETENTION_PER_USER, max_age_days=REPORT_RETENTION_DAYS):
+        self.db_path = db_path
+        self.max_per_user = max_per_user
+        self.max_age = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS reports ('
+            ' uid TEXT NOT NULL, session_id TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL,'
+            ' created_at REAL NOT NULL, download_name TEXT NOT NULL, PRIMARY KEY (uid, session_id))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS reports_by_user ON reports (uid, created_at)')
+
+    def add(self, uid, session_id, path, download_name):
+        """Record a finished report and apply the retention policy for the user."""
+        record = ReportRecord(uid, session_id, path, os.path.getsize(path), time.time(), download_name)
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?)', record)
+            self._conn.execute(
+                'DELETE FROM reports WHERE uid = ? AND session_id NOT IN'
+                ' (SELECT session_id FROM reports WHERE uid = ? ORDER BY created_at DESC LIMIT ?)',
+                (uid, uid, self.max_per_user))
+            if record.created_at - self._last_sweep > RETENTION_SWEEP_INTERVAL:
+                self._last_sweep = record.created_at
+                self._conn.execute('DELETE FROM reports WHERE created_at < ?', (record.created_at - self.max_age,))
+        return record
+
+    def get(self, uid, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT uid, session_id, path, size, created_at, download_name FROM reports'
+                ' WHERE uid = ? AND session_id = ?', (uid, session_id)).fetchone()
+        records = self._available([ReportRecord(*row)] if row else [])
+        return records[0] if records else None
+
+    def latest(self, uid):
+        """Most recent report of `uid` whose file still exists, or None."""
+        records = self._available(self._user_records(uid))
+        return records[0] if records else None
+
+    def history(self, uid, page=1, per_page=20):
+        """One page of the user's downloadable reports, newest first. Returns (records, total)."""
+        records = self._available(self._user_records(uid))
+        start = (page - 1) * per_page
+        return records[start:start + per_page], len(records)
+
+    def _user_records(self, uid):
+        """All records of `uid`, newest first (at most `max_per_user`)."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT uid, session_id, path, size, created_at, download_name FROM reports'
+                ' WHERE uid = ? ORDER BY created_at DESC', (uid,)).fetchall()
+        return [ReportRecord(*row) for row in rows]
+
+    def _available(self, records):
+        """The records whose PDF still exists; the others were evicted from the report cache and are dropped."""
+        available, missing = [], []
+        for record in records:
+            (available if os.path.exists(record.path) else missing).append(record)
+        if missing:
+            with self._lock:
+                self._conn.executemany('DELETE FROM reports WHERE uid = ? AND session_id = ? AND path = ?',
+                                       [(r.uid, r.session_id, r.path) for r in missing])
+        return available
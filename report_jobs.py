@@ -0,0 +1,153 @@
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '2'))
+# Jobs waiting or running at once; further submissions are rejected.
+REPORT_QUEUE_LIMIT = int(os.environ.get('REPORT_QUEUE_LIMIT', '100'))
+# "thread" renders in the request process; "process" renders in worker processes
+# so ReportLab does not hold the GIL of the request threads.
+REPORT_WORKER_MODE = os.environ.get('REPORT_WORKER_MODE', 'thread')
+# Finished jobs remembered for status polling.
+REPORT_JOB_RETENTION = 1000
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class QueueFullError(Exception):
+    """Raised when the report queue already holds REPORT_QUEUE_LIMIT jobs."""
+
+
+class ReportJob:
+    __slots__ = ('job_id', 'uid', 'session_id', 'status', 'submitted_at', 'started_at',
+                 'finished_at', 'result', 'error')
+
+    def __init__(self, uid, session_id):
+        self.job_id = uuid.uuid4().hex
+        self.uid = uid
+        self.session_id = session_id
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'session_id': self.session_id,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+        }
+
+
+class ReportJobQueue:
+    """Bounded pool that runs report generation off the request thread.
+
+    Jobs run on worker threads. CPU-heavy steps go through `run_cpu`, which in
+    "process" mode hands them to a process pool, so those callables and their
+    arguments must be picklable.
+    """
+
+    def __init__(self, workers=REPORT_WORKERS, max_pending=REPORT_QUEUE_LIMIT, mode=REPORT_WORKER_MODE):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown report worker mode: {mode}")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.mode = mode
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report')
+        self._process_pool = None
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def submit(self, uid, session_id, fn, *args, on_done=None):
+        """Queue `fn(*args)`; `on_done(job)` runs in the worker after success."""
+        job = ReportJob(uid, session_id)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError("Report queue is full")
+            self._pending += 1
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > REPORT_JOB_RETENTION:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.status in (QUEUED, RUNNING):
+                    break
+                self._jobs.popitem(last=False)
+        # The job runs in the submitter's context, so its tracing spans join the request's trace.
+        self._executor.submit(contextvars.copy_context().run, self._run, job, fn, args, on_done)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, on_done):
+        job.status = RUNNING
+        job.started_at = time.time()
+        with self._lock:
+            self._running += 1
+        try:
+            job.result = fn(*args)
+            if on_done is not None:
+                on_done(job)
+            job.status = DONE
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            print(f"❌ Report job {job.job_id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            latency = job.finished_at - job.submitted_at
+            with self._lock:
+                self._pending -= 1
+                self._running -= 1
+                if job.status == DONE:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+
+    def run_cpu(self, fn, *args):
+        """Run `fn(*args)` in the process pool (process mode) or inline, and return its result."""
+        if self.mode == 'process':
+            return self._get_process_pool().submit(fn, *args).result()
+        return fn(*args)
+
+    def _get_process_pool(self):
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._process_pool
+
+    def stats(self):
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                'mode': self.mode,
+                'workers': self.workers,
+                'queue_depth': self._pending - self._running,
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'avg_latency_seconds': self._latency_total / finished if finished else 0.0,
+                'max_latency_seconds': self._latency_max,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
@@ -0,0 +1,173 @@
+import io
+import time
+from metrics import REGISTRY
+from profiler import profiled
+from tracing import span
+
+PDF_RENDER_SECONDS = REGISTRY.histogram('yoga_pdf_render_seconds', 'Time to render one PDF report (cache misses only).')
+
+
+# --- PDF GENERATION ---
+def report_filename(user_name, end_time):
+    """File name the user sees when downloading the report."""
+    timestamp = end_time.strftime("%Y%m%d_%H%M%S")
+    return f"{user_name}_AyurSutra_Report_{timestamp}.pdf"
+
+
+def generate_pdf_report(user_name, end_time, summary, cache, run=None):
+    """Return the path of the session report, rendering it only on a cache miss.
+
+    `run(fn, *args)` executes the render, e.g. in a report worker process.
+    """
+    with span('report.cache_lookup'):
+        key = cache.key_for(user_name, end_time, summary)
+        report_path = cache.get(key)
+    if report_path is None:
+        started = time.perf_counter()
+        with span('report.render', frames=summary['frame_count']), profiled('report.render'):
+            pdf_bytes = run(render_pdf_report, user_name, end_time, summary) if run else render_pdf_report(user_name, end_time, summary)
+        PDF_RENDER_SECONDS.observe(time.perf_counter() - started)
+        with span('report.cache_store', bytes=len(pdf_bytes)):
+            report_path = cache.put(key, pdf_bytes)
+        print(f"✅ Report generated: {report_path}")
+    return report_path
+
+
+def render_pdf_report(user_name, end_time, summary):
+    """Generate professional AyurSutra PDF report with dynamic recommendations.
+
+    Takes only plain data and returns the PDF bytes, so it can run in a
+    report worker process.
+    """
+    styles = report_styles()
+    story = report_header(styles)
+    if summary['frame_count']:
+        story += metrics_section(user_name, end_time, summary, styles)
+        story += duration_section(summary, styles)
+        story += recommendations_section(summary, styles)
+    else:
+        from reportlab.platypus import Paragraph
+        story.append(Paragraph("⚠️ No pose data recorded during this session.", styles['Normal']))
+    return build_pdf(story)
+
+
+# Each section returns its flowables, so they can be rendered (and benchmarked) on their own.
+def report_styles():
+    # ReportLab is imported here so cold starts that never render a report skip it.
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+
+    styles = getSampleStyleSheet()
+    AS_BLUE = colors.HexColor('#2E86AB')
+    AS_PINK = colors.HexColor('#A23B72')
+    return {
+        'Normal': styles['Normal'],
+        'blue': AS_BLUE,
+        'title': ParagraphStyle('AyurSutraTitle', parent=styles['Heading1'], fontSize=28, textColor=AS_BLUE, spaceAfter=15, alignment=TA_CENTER),
+        'subtitle': ParagraphStyle('Subtitle', parent=styles['Heading2'], fontSize=18, textColor=AS_PINK, spaceAfter=25, alignment=TA_CENTER),
+        'heading': ParagraphStyle('ReportHeading', parent=styles['Heading2'], fontSize=16, textColor=AS_PINK, spaceAfter=10, spaceBefore=15),
+    }
+
+
+def report_header(styles):
+    from reportlab.platypus import Paragraph
+
+    return [
+        Paragraph("A Y U R S U T R A", styles['title']),
+        Paragraph("Yoga Pose Monitoring & Diagnostic Report", styles['subtitle']),
+        Paragraph("I. Session Metrics", styles['heading']),
+    ]
+
+
+def metrics_section(user_name, end_time, summary, styles):
+    """I. Session Metrics: the participant / duration / confidence table."""
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    duration_min = summary['duration_seconds'] / 60
+    avg_conf = summary['average_confidence']
+    
+    summary_data = [
+        ['Participant ID', user_name, 'Date', end_time.strftime('%B %d, %Y')],
+        ['Total Duration', f"{duration_min:.2f} Minutes", 'Time', end_time.strftime('%I:%M %p')],
+        ['Analyzed Frames', str(summary['frame_count']), 'Avg Confidence', f"{avg_conf:.2%}"]
+    ]
+    
+    summary_table = Table(summary_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch])
+    summary_table.setStyle(TableStyle([('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F5F5F5')), ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#F5F5F5')), ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey), ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')]))
+    return [summary_table]
+
+
+def duration_section(summary, styles):
+    """II. Pose Duration Analysis: one row per detected pose."""
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle, Paragraph
+
+    pose_counts = summary['pose_counts']
+    pose_seconds = summary['pose_seconds']
+    
+    data = [['Pose Name', 'Frames Detected', 'Total Time (Seconds)']]
+    for pose_name, count in pose_counts.items():
+        duration_sec = pose_seconds.get(pose_name, 0.0)
+        data.append([pose_name, str(count), f"{duration_sec:.1f} s"])
+    
+    table = Table(data, colWidths=[3.5*inch, 1.5*inch, 1.5*inch])
+    table.setStyle(TableStyle([('BACKGROUND', (0, 0), (-1, 0), styles['blue']), ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke), ('ALIGN', (0, 0), (-1, -1), 'CENTER'), ('ALIGN', (0, 1), (0, -1), 'LEFT'), ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'), ('BOTTOMPADDING', (0, 0), (-1, 0), 10), ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#EBF4FA')), ('GRID', (0, 0), (-1, -1), 0.5, colors.black)]))
+    return [Paragraph("II. Pose Duration Analysis", styles['heading']), table]
+
+
+def report_recommendations(summary):
+    """Improvement-plan bullet points for a session summary with frames."""
+    avg_conf = summary['average_confidence']
+    pose_seconds = summary['pose_seconds']
+
+    recommendations = []
+    if avg_conf < 0.80:
+        recommendations.append("• Aim for brighter lighting and confirm your entire body is visible to improve tracking accuracy.")
+    elif avg_conf < 0.90:
+        recommendations.append("• Focus on fine-tuning your body's lines and alignment to achieve more precise posture confirmation.")
+    
+    pose_durations = {name: sec for name, sec in sorted(pose_seconds.items()) if name != 'Unknown'}
+    holds = [hold for hold in summary['holds'] if hold['pose'] != 'Unknown']
+    if pose_durations:
+        # Longest single continuous hold, not the total across holds.
+        longest = max(holds, key=lambda hold: hold['duration_seconds'])
+        recommendations.append(f"• **Successfully held {longest['pose']}** for {longest['duration_seconds']:.1f} seconds. Maintain this dedication to duration.")
+        brief_poses = {name: sec for name, sec in pose_durations.items() if 0 < sec < 5}
+        if brief_poses:
+            brief_pose_name = min(brief_poses, key=brief_poses.get)
+            recommendations.append(f"• **{brief_pose_name}** was held briefly ({brief_poses[brief_pose_name]:.1f} seconds). Practice holding fundamental poses for **15 to 30 seconds** to maximize physical benefit.")
+    
+    recommendations.append("• Progression Goal: Concentrate on gaining more flexibility or depth in the postures where you spent the least amount of time.")
+    return recommendations
+
+
+def recommendations_section(summary, styles):
+    """III. Personalized Improvement Plan."""
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle, Paragraph
+
+    story = [Paragraph("III. Personalized Improvement Plan", styles['heading'])]
+    recommendations = report_recommendations(summary)
+    if recommendations:
+        list_data = [[Paragraph(rec, styles['Normal'])] for rec in recommendations]
+        list_table = Table(list_data, colWidths=[6.5*inch])
+        list_table.setStyle(TableStyle([('LEFTPADDING', (0, 0), (-1, -1), 0), ('VALIGN', (0, 0), (-1, -1), 'TOP'), ('LINEABOVE', (0, 0), (-1, 0), 1, colors.lightgrey)]))
+        story.append(list_table)
+    return story
+
+
+def build_pdf(story):
+    """Lay out flowables on letter pages; returns the PDF bytes."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    doc.build(story)
+    return buffer.getvalue()
+# --- END PDF GENERATION ---
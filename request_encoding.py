@@ -0,0 +1,132 @@
+import os
+import zlib
+from werkzeug.exceptions import BadRequest, LengthRequired, RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.wsgi import LimitedStream, get_content_length
+
+try:
+    import zstandard
+except ImportError:  # zstd support is optional
+    zstandard = None
+
+# Hard cap on the decompressed size of one request body (zip-bomb guard).
+MAX_DECOMPRESSED_BYTES = int(os.environ.get('MAX_DECOMPRESSED_BYTES', str(8 * 1024 * 1024)))
+# Compressed bytes read from the socket per step.
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class _ZlibReader:
+    """Incrementally inflates a gzip or zlib stream, never producing more than asked for."""
+
+    def __init__(self, raw, wbits):
+        self._raw = raw
+        self._inflater = zlib.decompressobj(wbits)
+        self._pending = b''
+        self._eof = False
+
+    def read(self, size):
+        out = []
+        while size > 0 and not self._eof:
+            if not self._pending:
+                self._pending = self._raw.read(READ_CHUNK_SIZE)
+                if not self._pending:
+                    if not self._inflater.eof:
+                        raise zlib.error("compressed stream is truncated")
+                    self._eof = True
+                    break
+            data = self._inflater.decompress(self._pending, size)
+            self._pending = self._inflater.unconsumed_tail
+            if self._inflater.eof:
+                self._eof = True
+            out.append(data)
+            size -= len(data)
+        return b''.join(out)
+
+
+def _zstd_reader(raw):
+    if zstandard is None:
+        return None
+    return zstandard.ZstdDecompressor().stream_reader(raw, read_size=READ_CHUNK_SIZE)
+
+
+_DECODERS = {
+    'gzip': lambda raw: _ZlibReader(raw, 16 + zlib.MAX_WBITS),
+    'x-gzip': lambda raw: _ZlibReader(raw, 16 + zlib.MAX_WBITS),
+    'deflate': lambda raw: _ZlibReader(raw, zlib.MAX_WBITS),
+    'zstd': _zstd_reader,
+}
+
+
+class DecompressingStream:
+    """File-like view of a compressed request body that inflates on demand.
+
+    Only the decompressed bytes the application reads are materialized, and
+    reading past `limit` raises 413 instead of inflating further.
+    """
+
+    def __init__(self, reader, limit):
+        self._reader = reader
+        self._limit = limit
+        self._produced = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                chunk = self.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+
+        # Ask for one byte more than allowed so an oversized body is detected.
+        want = min(size, self._limit - self._produced + 1)
+        try:
+            data = self._reader.read(want) if want > 0 else b''
+        except (zlib.error, EOFError) as e:
+            raise BadRequest(f"Malformed compressed request body: {e}")
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise BadRequest(f"Malformed compressed request body: {e}")
+            raise
+        self._produced += len(data)
+        if self._produced > self._limit:
+            raise RequestEntityTooLarge(f"Decompressed request body exceeds {self._limit} bytes")
+        return data
+
+    def readline(self, size=-1):
+        # Only needed by form parsers; JSON and binary bodies use read().
+        return self.read(size)
+
+
+class DecompressRequestMiddleware:
+    """WSGI middleware that transparently decodes `Content-Encoding` request bodies.
+
+    Applies only to `paths`; other routes see the request unchanged. Unknown
+    encodings get 415.
+    """
+
+    def __init__(self, wsgi_app, paths, max_bytes=MAX_DECOMPRESSED_BYTES):
+        self.wsgi_app = wsgi_app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding and encoding != 'identity' and environ.get('PATH_INFO') in self.paths:
+            raw = environ['wsgi.input']
+            content_length = get_content_length(environ)
+            if content_length is not None:
+                raw = LimitedStream(raw, content_length)
+            elif 'wsgi.input_terminated' not in environ:
+                return LengthRequired()(environ, start_response)
+
+            decoder = _DECODERS.get(encoding)
+            reader = decoder(raw) if decoder is not None else None
+            if reader is None:
+                error = UnsupportedMediaType(f"Unsupported Content-Encoding: {encoding}")
+                return error(environ, start_response)
+
+            environ['wsgi.input'] = DecompressingStream(reader, self.max_bytes)
+            environ['wsgi.input_terminated'] = True
+            environ.pop('CONTENT_LENGTH', None)
+            del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
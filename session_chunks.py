@@ -0,0 +1,173 @@
+"""Frame-level session history as compressed chunk documents.
+
+A finished session's frames are split into chunks stored under
+``users/{uid}/yoga_sessions/{session_id}/chunks/{index:04d}``, each holding
+a zlib-compressed binary payload below SESSION_CHUNK_MAX_BYTES, so a two hour
+session with landmarks fits in a handful of documents. Payload layout
+(little-endian, before compression)::
+
+    header      4s magic "YSC1" | u8 version | u8 pose count K | u16 reserved
+                | u32 frame count N | u32 landmark frame count M
+    poses       K x (u8 length | UTF-8 name)
+    timestamps  N x i64  float64 bit patterns, delta coded
+    conf        N x f32
+    codes       N x u8   index into the pose list
+    lm frames   M x u32  frame offset within the chunk
+    landmarks   M x 33 x 4 i16, delta coded along frames
+
+Both delta codings wrap around and are exact; they only make the columns
+compress better. `iter_session_chunks` streams the chunks back one document
+at a time and `read_session_frames` rebuilds the session's column arrays.
+"""
+import os
+import struct
+import zlib
+from collections import namedtuple
+import numpy as np
+from session_store import (LANDMARK_CHANNELS, NUM_LANDMARKS, POSE_NAMES, FrameBuffer, LandmarkBatch,
+                           LandmarkBuffer)
+
+MAGIC = b'YSC1'
+VERSION = 1
+# Compressed payload per chunk; Firestore documents are limited to 1 MiB in total.
+SESSION_CHUNK_MAX_BYTES = 1000000
+# Uncompressed bytes tried per chunk; chunks that compress worse are shrunk.
+SESSION_CHUNK_TARGET_BYTES = 4 * 1024 * 1024
+# zlib level; 1 compresses these columns nearly as well as 6 at a fraction of the cost.
+SESSION_CHUNK_COMPRESSION = int(os.environ.get('SESSION_CHUNK_COMPRESSION', '1'))
+
+_HEADER = struct.Struct('<4sBBHII')
+_LANDMARK_BYTES = NUM_LANDMARKS * LANDMARK_CHANNELS * 2
+
+# One decoded chunk; `landmarks` rows are relative to `start_frame`.
+SessionChunk = namedtuple('SessionChunk', 'index start_frame timestamps confidences codes landmarks')
+
+
+class ChunkError(ValueError):
+    """Raised for a malformed or missing session chunk."""
+
+
+def chunk_collection_path(uid, session_id):
+    return f"users/{uid}/yoga_sessions/{session_id}/chunks"
+
+
+def encode_session_chunks(frames, landmarks=None):
+    """Split a session's `FrameBuffer` (and `LandmarkBuffer`) into chunk documents.
+
+    Returns a list of dicts ready for Firestore, in frame order.
+    """
+    n = len(frames)
+    if landmarks is not None and len(landmarks):
+        lm_index = landmarks.frame_index.astype(np.int64)
+        lm_values = landmarks.values
+    else:
+        lm_index = np.empty(0, dtype=np.int64)
+        lm_values = np.empty((0, NUM_LANDMARKS, LANDMARK_CHANNELS), dtype=np.int16)
+
+    bytes_per_frame = 13 + _LANDMARK_BYTES * len(lm_index) / max(n, 1)
+    step = max(1, int(SESSION_CHUNK_TARGET_BYTES // bytes_per_frame))
+    documents = []
+    start = 0
+    while start < n:
+        stop = min(start + step, n)
+        lo, hi = np.searchsorted(lm_index, (start, stop))
+        payload = zlib.compress(_pack(frames.timestamps[start:stop], frames.confidences[start:stop],
+                                      frames.codes[start:stop], lm_index[lo:hi] - start, lm_values[lo:hi]),
+                                SESSION_CHUNK_COMPRESSION)
+        if len(payload) > SESSION_CHUNK_MAX_BYTES and stop - start > 1:
+            # Compresses worse than hoped: shrink to the observed ratio, with some headroom.
+            step = max(1, int((stop - start) * 0.9 * SESSION_CHUNK_MAX_BYTES / len(payload)))
+            continue
+        documents.append({
+            'index': len(documents),
+            'start_frame': start,
+            'frames': stop - start,
+            'landmark_frames': int(hi - lo),
+            'encoding': 'ysc1+zlib',
+            'data': payload,
+        })
+        start = stop
+    return documents
+
+
+def _pack(timestamps, confidences, codes, lm_offsets, lm_values):
+    used, local_codes = np.unique(codes, return_inverse=True)
+    names = [POSE_NAMES.name(int(code)).encode('utf-8')[:255] for code in used]
+    parts = [_HEADER.pack(MAGIC, VERSION, len(names), 0, len(timestamps), len(lm_offsets))]
+    parts += [bytes([len(name)]) + name for name in names]
+    bits = np.ascontiguousarray(timestamps, dtype='<f8').view('<i8')
+    parts.append(np.diff(bits, prepend=np.int64(0)).astype('<i8').tobytes())
+    parts.append(np.asarray(confidences, dtype='<f4').tobytes())
+    parts.append(local_codes.astype(np.uint8).tobytes())
+    parts.append(np.asarray(lm_offsets, dtype='<u4').tobytes())
+    parts.append(np.diff(lm_values.astype('<i2'), axis=0, prepend=np.zeros((1,) + lm_values.shape[1:], '<i2'))
+                 .astype('<i2').tobytes())
+    return b''.join(parts)
+
+
+def decode_session_chunk(document):
+    """Decode one chunk document (a dict) into a `SessionChunk`."""
+    try:
+        body = zlib.decompress(document['data'])
+    except (KeyError, zlib.error) as e:
+        raise ChunkError(f"Unreadable session chunk: {e}")
+    if len(body) < _HEADER.size:
+        raise ChunkError("Session chunk is truncated")
+    magic, version, n_poses, _, n, m = _HEADER.unpack_from(body, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ChunkError("Not a session chunk (bad magic or version)")
+
+    offset = _HEADER.size
+    lut = np.empty(n_poses, dtype=np.uint8)
+    try:
+        for i in range(n_poses):
+            length = body[offset]
+            lut[i] = POSE_NAMES.code(body[offset + 1:offset + 1 + length].decode('utf-8'))
+            offset += 1 + length
+    except (IndexError, UnicodeDecodeError):
+        raise ChunkError("Session chunk has a malformed pose table")
+    if len(body) - offset != 13 * n + (4 + _LANDMARK_BYTES) * m:
+        raise ChunkError("Session chunk length does not match its frame counts")
+
+    deltas = np.frombuffer(body, dtype='<i8', count=n, offset=offset)
+    timestamps = np.cumsum(deltas, dtype=np.int64).view(np.float64)
+    offset += 8 * n
+    confidences = np.frombuffer(body, dtype='<f4', count=n, offset=offset).astype(np.float32)
+    offset += 4 * n
+    local_codes = np.frombuffer(body, dtype=np.uint8, count=n, offset=offset)
+    offset += n
+    if n and int(local_codes.max()) >= n_poses:
+        raise ChunkError("Session chunk references an unknown pose")
+    landmarks = None
+    if m:
+        rows = np.frombuffer(body, dtype='<u4', count=m, offset=offset).astype(np.intp)
+        offset += 4 * m
+        deltas = np.frombuffer(body, dtype='<i2', count=m * NUM_LANDMARKS * LANDMARK_CHANNELS, offset=offset)
+        values = np.cumsum(deltas.reshape(m, NUM_LANDMARKS, LANDMARK_CHANNELS), axis=0, dtype=np.int16)
+        landmarks = LandmarkBatch(rows, values)
+    return SessionChunk(document.get('index'), document.get('start_frame'), timestamps, confidences,
+                        lut[local_codes], landmarks)
+
+
+def iter_session_chunks(db, uid, session_id):
+    """Stream a stored session's chunks in frame order, decoding one document at a time."""
+    expected = 0
+    for snapshot in db.collection(chunk_collection_path(uid, session_id)).stream():
+        chunk = decode_session_chunk(snapshot.to_dict())
+        if chunk.start_frame != expected:
+            raise ChunkError(f"Session {session_id} is missing frames {expected}..{chunk.start_frame}")
+        expected += len(chunk.timestamps)
+        yield chunk
+
+
+def read_session_frames(db, uid, session_id):
+    """Rebuild a stored session as (FrameBuffer, LandmarkBuffer or None)."""
+    frames = FrameBuffer()
+    landmarks = None
+    for chunk in iter_session_chunks(db, uid, session_id):
+        if chunk.landmarks is not None:
+            if landmarks is None:
+                landmarks = LandmarkBuffer(max_frames=np.iinfo(np.uint32).max)
+            landmarks.append(len(frames), chunk.landmarks)
+        frames.append(chunk.timestamps, chunk.confidences, chunk.codes)
+    return frames, landmarks
@@ -0,0 +1,646 @@
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+import numpy as np
+from metrics import REGISTRY
+from pose_rules import load_rules
+
+# Upper bound on sessions held by one worker process. When full, idle and
+# finished sessions are evicted first so memory stays bounded.
+MAX_SESSIONS = int(os.environ.get('MAX_SESSIONS', '10000'))
+# Sessions with no activity for this many seconds are dropped on the next sweep.
+SESSION_IDLE_TTL = float(os.environ.get('SESSION_IDLE_TTL', '7200'))
+# Expired sessions are swept when a session starts, at most this often (seconds).
+SESSION_SWEEP_INTERVAL = float(os.environ.get('SESSION_SWEEP_INTERVAL', '60'))
+# Frames preallocated per session; buffers double when full.
+INITIAL_FRAME_CAPACITY = 512
+# A gap between consecutive frames longer than this (pause, lost batches)
+# ends the current hold; the gap is not credited to any pose.
+MAX_FRAME_GAP = float(os.environ.get('MAX_FRAME_GAP', '5.0'))
+
+# A new pose label must be seen on this many consecutive logged frames before
+# it replaces the current hold; shorter runs are treated as label flicker.
+HOLD_MIN_FRAMES = int(os.environ.get('HOLD_MIN_FRAMES', '3'))
+
+# Raw landmarks: 33 points x (x, y, z, visibility), stored as int16 fixed point
+# (value * LANDMARK_SCALE, so 1e-4 resolution over +/-3.27), 264 bytes per frame.
+NUM_LANDMARKS = 33
+LANDMARK_CHANNELS = 4
+LANDMARK_SCALE = 10000
+# Landmark frames kept per session (default: 2 h at ~6 logged frames/s, ~11 MB).
+# Frames past the cap are still logged, just without landmarks.
+MAX_LANDMARK_FRAMES = int(os.environ.get('MAX_LANDMARK_FRAMES', '43200'))
+
+
+# Pose names outside pose_rules.json that one process interns before mapping
+# further new names to "Unknown".
+POSE_NAME_EXTRA = int(os.environ.get('POSE_NAME_EXTRA', '64'))
+
+
+def canonical_pose_names():
+    """"Unknown" followed by the labels of pose_rules.json (and the client's no-pose label)."""
+    spec = load_rules()
+    names = ['Unknown', spec['fallback']['pose'], 'No Pose Detected'] + [rule['pose'] for rule in spec['rules']]
+    return list(dict.fromkeys(names))
+
+
+class PoseNameTable:
+    """Process-wide interning of pose names to small integer codes.
+
+    Code 0 is always "Unknown", followed by the canonical names, which are
+    interned up front and can never be crowded out. Clients can send
+    arbitrary strings, so other names only get codes up to a small separate
+    budget (`max_extra`); anything past that is stored as "Unknown".
+    """
+
+    UNKNOWN = 0
+    MAX_NAMES = 256  # codes are uint8
+
+    def __init__(self, canonical=('Unknown',), max_extra=POSE_NAME_EXTRA):
+        if not canonical or canonical[0] != 'Unknown':
+            raise ValueError('The first canonical pose name must be "Unknown"')
+        self._lock = threading.Lock()
+        self._names = list(canonical)
+        self._codes = {name: code for code, name in enumerate(self._names)}
+        self.capacity = min(self.MAX_NAMES, len(self._names) + max_extra)
+
+    def code(self, name):
+        code = self._codes.get(name)
+        if code is not None:
+            return code
+        with self._lock:
+            code = self._codes.get(name)
+            if code is None:
+                if len(self._names) >= self.capacity:
+                    return self.UNKNOWN
+                code = len(self._names)
+                self._names.append(name)
+                self._codes[name] = code
+            return code
+
+    def name(self, code):
+        return self._names[code]
+
+    def names(self):
+        """Snapshot of the table; index with a code array to decode names."""
+        return np.array(self._names, dtype=object)
+
+    def __len__(self):
+        return len(self._names)
+
+
+POSE_NAMES = PoseNameTable(canonical_pose_names())
+
+FRAMES_INGESTED = REGISTRY.counter('yoga_frames_ingested_total', 'Pose frames logged to live sessions (HTTP and WebSocket).')
+FRAMES_DROPPED = REGISTRY.counter('yoga_frames_dropped_total', 'Pose frames dropped as no newer than the last logged frame of their session.')
+
+
+# Landmarks for some frames of a batch: `rows` index the batch, `values` is
+# the matching (m, 33, 4) int16 fixed-point array.
+LandmarkBatch = namedtuple('LandmarkBatch', 'rows values')
+
+
+def quantize_landmarks(values):
+    """Float (m, 33, 4) landmarks to int16 fixed point."""
+    values = np.asarray(values, dtype=np.float32)
+    if values.ndim != 3 or values.shape[1:] != (NUM_LANDMARKS, LANDMARK_CHANNELS):
+        raise ValueError(f"Landmarks must be shaped ({NUM_LANDMARKS}, {LANDMARK_CHANNELS}) per frame")
+    limit = np.iinfo(np.int16).max
+    return np.clip(np.rint(values * LANDMARK_SCALE), -limit, limit).astype(np.int16)
+
+
+def dequantize_landmarks(values):
+    """int16 fixed-point landmarks back to float32 (a copy)."""
+    return values.astype(np.float32) / np.float32(LANDMARK_SCALE)
+
+
+def frames_from_records(records):
+    """Convert a batch of `{pose, confidence, timestamp[, landmarks]}` dicts into column arrays.
+
+    Returns (timestamps, confidences, codes, landmarks); landmarks is a
+    `LandmarkBatch` for the records that carried `[[x, y, z, visibility]] * 33`,
+    or None. Raises ValueError (or KeyError/TypeError) for malformed records.
+    """
+    n = len(records)
+    timestamps = np.fromiter((float(r['timestamp']) for r in records), np.float64, n)
+    confidences = np.fromiter((float(r['confidence']) for r in records), np.float32, n)
+    codes = np.fromiter((POSE_NAMES.code(str(r['pose'])) for r in records), np.uint8, n)
+
+    rows = [i for i, r in enumerate(records) if r.get('landmarks') is not None]
+    landmarks = None
+    if rows:
+        values = quantize_landmarks([records[i]['landmarks'] for i in rows])
+        landmarks = LandmarkBatch(np.array(rows, dtype=np.intp), values)
+    return timestamps, confidences, codes, landmarks
+
+
+def order_frames(timestamps, confidences, codes, landmarks=None, after=None):
+    """Sort a batch by timestamp and drop frames at or before `after`.
+
+    Overlapping requests and the WebSocket-to-HTTP fallback can deliver
+    batches out of order or twice; a frame no newer than the last one logged
+    would credit negative time, so it is dropped. Returns the columns in the
+    same shape as `frames_from_records` (unchanged if already in order).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    n = len(timestamps)
+    keep = np.argsort(timestamps, kind='stable')
+    if after is not None:
+        keep = keep[timestamps[keep] > after]
+    if len(keep) == n and not np.any(np.diff(keep) < 0):
+        return timestamps, confidences, codes, landmarks
+    timestamps = timestamps[keep]
+    confidences = np.asarray(confidences)[keep]
+    codes = np.asarray(codes)[keep]
+    if landmarks is not None:
+        # Map landmark rows to their frame's new position; dropped frames map to -1.
+        position = np.full(n, -1, dtype=np.intp)
+        position[keep] = np.arange(len(keep))
+        rows = position[landmarks.rows]
+        kept = np.flatnonzero(rows >= 0)
+        kept = kept[np.argsort(rows[kept], kind='stable')]
+        landmarks = LandmarkBatch(rows[kept], landmarks.values[kept]) if len(kept) else None
+    return timestamps, confidences, codes, landmarks
+
+
+class FrameBuffer:
+    """Growable column store of logged frames (13 bytes per frame).
+
+    Columns are float64 timestamps, float32 confidences and uint8 pose codes
+    from `POSE_NAMES`. The accessors return views of the filled region.
+    """
+
+    __slots__ = ('_timestamps', '_confidences', '_codes', '_size')
+
+    def __init__(self, capacity=INITIAL_FRAME_CAPACITY):
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._confidences = np.empty(capacity, dtype=np.float32)
+        self._codes = np.empty(capacity, dtype=np.uint8)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return self._timestamps.nbytes + self._confidences.nbytes + self._codes.nbytes
+
+    @property
+    def timestamps(self):
+        return self._timestamps[:self._size]
+
+    @property
+    def confidences(self):
+        return self._confidences[:self._size]
+
+    @property
+    def codes(self):
+        return self._codes[:self._size]
+
+    def append(self, timestamps, confidences, codes):
+        """Append equally sized column arrays."""
+        n = len(timestamps)
+        if not (len(confidences) == len(codes) == n):
+            raise ValueError("Frame columns must have equal length")
+        end = self._size + n
+        if end > len(self._timestamps):
+            self._grow(end)
+        self._timestamps[self._size:end] = timestamps
+        self._confidences[self._size:end] = confidences
+        self._codes[self._size:end] = codes
+        self._size = end
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * len(self._timestamps), INITIAL_FRAME_CAPACITY)
+        for attr in ('_timestamps', '_confidences', '_codes'):
+            old = getattr(self, attr)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, attr, new)
+
+
+class LandmarkBuffer:
+    """Growable store of quantized landmarks for the frames that carried them.
+
+    `values` is an (n, 33, 4) int16 view and `frame_index` maps each row to
+    its frame in the session's `FrameBuffer`. Joint angles are unchanged by
+    the uniform fixed-point scale, so `yoga_app_core.classify_landmarks` can
+    run on `values` directly; use `dequantize_landmarks` for coordinates.
+    """
+
+    __slots__ = ('_values', '_frame_index', '_size', 'max_frames', 'dropped')
+
+    def __init__(self, capacity=INITIAL_FRAME_CAPACITY, max_frames=MAX_LANDMARK_FRAMES):
+        self._values = np.empty((capacity, NUM_LANDMARKS, LANDMARK_CHANNELS), dtype=np.int16)
+        self._frame_index = np.empty(capacity, dtype=np.uint32)
+        self._size = 0
+        self.max_frames = max_frames
+        self.dropped = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return self._values.nbytes + self._frame_index.nbytes
+
+    @property
+    def values(self):
+        return self._values[:self._size]
+
+    @property
+    def frame_index(self):
+        return self._frame_index[:self._size]
+
+    def append(self, first_frame, batch):
+        """Store a `LandmarkBatch` whose rows are relative to frame `first_frame`."""
+        n = min(len(batch.rows), self.max_frames - self._size)
+        self.dropped += len(batch.rows) - n
+        if n <= 0:
+            return
+        end = self._size + n
+        if end > len(self._values):
+            self._grow(end)
+        self._values[self._size:end] = batch.values[:n]
+        self._frame_index[self._size:end] = first_frame + batch.rows[:n]
+        self._size = end
+
+    def _grow(self, needed):
+        capacity = min(max(needed, 2 * len(self._values)), self.max_frames)
+        for attr in ('_values', '_frame_index'):
+            old = getattr(self, attr)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, attr, new)
+
+
+class HoldSegment(namedtuple('HoldSegment', 'code start end confidence_sum frames')):
+    """One continuous hold of a pose. `end` is where the next hold begins."""
+
+    __slots__ = ()
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.frames
+
+    def to_dict(self):
+        return {
+            'pose': POSE_NAMES.name(self.code),
+            'start': self.start,
+            'end': self.end,
+            'duration_seconds': self.duration,
+            'mean_confidence': self.mean_confidence,
+            'frames': self.frames,
+        }
+
+
+class HoldTracker:
+    """Smooths the label stream with hysteresis and run-length encodes it into holds.
+
+    A batch is first split into runs of equal labels (vectorized), so the
+    Python loop is per run, not per frame. A run of a different label only
+    starts a new hold once it reaches `min_frames`; shorter runs are folded
+    into the current hold. A gap longer than MAX_FRAME_GAP always ends the
+    hold at its last frame. Frames must arrive in timestamp order, each batch
+    newer than the last (see `order_frames`). Per-pose totals of closed holds are kept in
+    arrays, so reads cost O(1) in session length.
+    """
+
+    __slots__ = ('min_frames', 'max_gap', 'segments', 'pose_frames', 'pose_seconds', '_current', '_pending')
+
+    def __init__(self, min_frames=HOLD_MIN_FRAMES, max_gap=MAX_FRAME_GAP):
+        self.min_frames = max(1, min_frames)
+        self.max_gap = max_gap
+        self.segments = []
+        self.pose_frames = np.zeros(POSE_NAMES.capacity, dtype=np.int64)
+        self.pose_seconds = np.zeros(POSE_NAMES.capacity, dtype=np.float64)
+        # Open hold and the not yet confirmed run after it, as [code, start, last, conf_sum, frames].
+        self._current = None
+        self._pending = None
+
+    @property
+    def current_code(self):
+        """Smoothed label of the ongoing hold, or None before the first frame."""
+        current = self._current
+        return current[0] if current is not None else None
+
+    def update(self, timestamps, confidences, codes):
+        n = len(timestamps)
+        if not n:
+            return
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        gaps = np.diff(timestamps)
+        breaks = np.flatnonzero((codes[1:] != codes[:-1]) | (gaps > self.max_gap)) + 1
+        starts = np.concatenate(([0], breaks))
+        stops = np.concatenate((breaks, [n]))
+        conf_sums = np.add.reduceat(np.asarray(confidences, dtype=np.float64), starts)
+
+        last = self._pending or self._current
+        after_gap = np.empty(len(starts), dtype=bool)
+        after_gap[0] = last is not None and timestamps[0] - last[2] > self.max_gap
+        after_gap[1:] = gaps[breaks - 1] > self.max_gap
+        for i, (start, stop) in enumerate(zip(starts.tolist(), stops.tolist())):
+            run = [int(codes[start]), float(timestamps[start]), float(timestamps[stop - 1]),
+                   float(conf_sums[i]), stop - start]
+            self._add_run(run, after_gap[i])
+
+    def _add_run(self, run, after_gap):
+        current = self._current
+        if current is None:
+            self._current = run
+        elif after_gap:
+            self._absorb_pending()
+            self._close(current[2])
+            self._current = run
+        elif run[0] == current[0]:
+            self._absorb_pending()
+            _extend(current, run)
+        else:
+            pending = self._pending
+            if pending is not None and pending[0] == run[0]:
+                _extend(pending, run)
+            else:
+                self._absorb_pending()
+                self._pending = pending = run
+            if pending[4] >= self.min_frames:
+                # Confirmed: the previous hold lasted until this label first appeared.
+                self._close(pending[1])
+                self._current, self._pending = pending, None
+
+    def _absorb_pending(self):
+        if self._pending is not None:
+            _extend(self._current, self._pending)
+            self._pending = None
+
+    def _close(self, end):
+        code, start, _last, conf_sum, frames = self._current
+        self.segments.append(HoldSegment(code, start, end, conf_sum, frames))
+        self.pose_frames[code] += frames
+        self.pose_seconds[code] += end - start
+
+    def open_segment(self):
+        """The ongoing hold (with any unconfirmed run folded in), or None."""
+        current, pending = self._current, self._pending
+        if current is None:
+            return None
+        if pending is None:
+            return HoldSegment(current[0], current[1], current[2], current[3], current[4])
+        return HoldSegment(current[0], current[1], pending[2], current[3] + pending[3], current[4] + pending[4])
+
+    def holds(self):
+        """All holds so far, the open one last."""
+        segments = list(self.segments)
+        current = self.open_segment()
+        if current is not None:
+            segments.append(current)
+        return segments
+
+    def totals(self):
+        """(frames, seconds) per pose code, including the open hold."""
+        frames, seconds = self.pose_frames.copy(), self.pose_seconds.copy()
+        current = self.open_segment()
+        if current is not None:
+            frames[current.code] += current.frames
+            seconds[current.code] += current.duration
+        return frames, seconds
+
+
+def _extend(segment, run):
+    segment[2] = run[2]
+    segment[3] += run[3]
+    segment[4] += run[4]
+
+
+class SessionAggregates:
+    """Running statistics of a session, updated per batch so reads are O(1) in session length."""
+
+    __slots__ = ('frame_count', 'confidence_sum', 'confidence_sumsq', 'first_timestamp',
+                 'last_timestamp', 'holds')
+
+    def __init__(self):
+        self.frame_count = 0
+        self.confidence_sum = 0.0
+        self.confidence_sumsq = 0.0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.holds = HoldTracker()
+
+    def update(self, timestamps, confidences, codes):
+        """Fold a batch of frame columns into the aggregates."""
+        n = len(timestamps)
+        if not n:
+            return
+        conf = np.asarray(confidences, dtype=np.float64)
+        self.frame_count += n
+        self.confidence_sum += float(conf.sum())
+        self.confidence_sumsq += float(np.dot(conf, conf))
+        first, last = float(np.min(timestamps)), float(np.max(timestamps))
+        if self.first_timestamp is None or first < self.first_timestamp:
+            self.first_timestamp = first
+        if self.last_timestamp is None or last > self.last_timestamp:
+            self.last_timestamp = last
+        self.holds.update(timestamps, conf, codes)
+
+    @property
+    def duration_seconds(self):
+        if self.frame_count < 2:
+            return 0.0
+        return self.last_timestamp - self.first_timestamp
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.frame_count if self.frame_count else 0.0
+
+    @property
+    def confidence_std(self):
+        if not self.frame_count:
+            return 0.0
+        mean = self.mean_confidence
+        return max(0.0, self.confidence_sumsq / self.frame_count - mean * mean) ** 0.5
+
+    def pose_count_dict(self):
+        """Smoothed frame count per pose name, most frequent first."""
+        counts, _ = self.holds.totals()
+        codes = np.flatnonzero(counts)
+        codes = codes[np.argsort(-counts[codes], kind='stable')]
+        return {POSE_NAMES.name(code): int(counts[code]) for code in codes}
+
+    def pose_seconds_dict(self):
+        """Seconds held per pose name, from hold timestamps."""
+        counts, seconds = self.holds.totals()
+        codes = np.flatnonzero(counts)
+        return {POSE_NAMES.name(code): float(seconds[code]) for code in codes}
+
+    def summary(self):
+        """Plain-data snapshot used for points, Firestore and the PDF report."""
+        return {
+            'frame_count': self.frame_count,
+            'duration_seconds': self.duration_seconds,
+            'average_confidence': self.mean_confidence,
+            'confidence_std': self.confidence_std,
+            'pose_counts': self.pose_count_dict(),
+            'pose_seconds': self.pose_seconds_dict(),
+            'holds': [segment.to_dict() for segment in self.holds.holds()],
+        }
+
+
+class YogaSession:
+    """State of one user's yoga session. Mutable fields are guarded by `lock`."""
+
+    __slots__ = ('uid', 'session_id', 'display_name', 'active', 'started_at', 'ended_at',
+                 'last_seen', 'lock', 'frames', 'landmarks', 'landmark_frames', 'aggregates', 'on_end')
+
+    def __init__(self, uid, display_name, on_end=None):
+        self.uid = uid
+        self.session_id = uuid.uuid4().hex
+        self.display_name = display_name
+        self.active = True
+        self.started_at = time.time()
+        self.ended_at = None
+        self.last_seen = self.started_at
+        self.lock = threading.Lock()
+        self.frames = FrameBuffer()
+        # Allocated on the first batch that carries landmarks.
+        self.landmarks = None
+        self.landmark_frames = 0
+        self.aggregates = SessionAggregates()
+        # Called once, without the lock held, when the session ends.
+        self.on_end = on_end
+
+    def log_frames(self, timestamps, confidences, codes, landmarks=None):
+        """Append a batch of frame columns. Returns the number logged, or None if the session has ended.
+
+        The batch is sorted by timestamp; frames no newer than the last logged
+        one (late or resent batches) are dropped and not counted.
+        """
+        received = len(timestamps)
+        with self.lock:
+            if not self.active:
+                return None
+            timestamps, confidences, codes, landmarks = order_frames(
+                timestamps, confidences, codes, landmarks, after=self.aggregates.last_timestamp)
+            first_frame = len(self.frames)
+            self.frames.append(timestamps, confidences, codes)
+            if landmarks is not None and len(landmarks.rows):
+                if self.landmarks is None:
+                    self.landmarks = LandmarkBuffer()
+                self.landmarks.append(first_frame, landmarks)
+                self.landmark_frames = len(self.landmarks)
+            self.aggregates.update(timestamps, confidences, codes)
+            self.last_seen = time.time()
+        FRAMES_INGESTED.inc(len(timestamps))
+        if received > len(timestamps):
+            FRAMES_DROPPED.inc(received - len(timestamps))
+        return len(timestamps)
+
+    def end(self):
+        """Mark the session finished. Returns False if it was already ended."""
+        with self.lock:
+            if not self.active:
+                return False
+            self.active = False
+            self.ended_at = self.last_seen = time.time()
+        if self.on_end is not None:
+            self.on_end(self)
+        return True
+
+    def release_buffers(self):
+        """Free the frame and landmark buffers of an ended session.
+
+        Call once the summary and chunks have been built from them; counts in
+        `status()` come from the aggregates and stay valid.
+        """
+        with self.lock:
+            if self.active:
+                raise RuntimeError("Cannot release the buffers of an active session")
+            self.frames = FrameBuffer(0)
+            self.landmarks = None
+
+    def status(self):
+        """Snapshot of the session for the status endpoint."""
+        with self.lock:
+            return {
+                'session_id': self.session_id,
+                'session_active': self.active,
+                'poses_logged': self.aggregates.frame_count,
+                'landmark_frames': self.landmark_frames,
+                'current_user_uid': self.uid,
+                'current_user_display_name': self.display_name,
+            }
+
+
+class SessionRegistry:
+    """Thread-safe map of Firebase UID to the user's current session.
+
+    The registry lock only guards insertions and evictions; lookups are plain
+    dict reads and all per-frame work happens under the session's own lock,
+    so concurrent users never contend with each other. Sessions idle for
+    longer than `idle_ttl` are swept when a session starts, at most every
+    `sweep_interval` seconds, and whenever the registry is full.
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_ttl=SESSION_IDLE_TTL,
+                 sweep_interval=SESSION_SWEEP_INTERVAL):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._by_uid = {}
+        self._last_sweep = time.time()
+        # Active sessions, kept up to date as sessions start and end.
+        self._live_lock = threading.Lock()
+        self._live = 0
+
+    def start(self, uid, display_name):
+        """Create a new session for `uid`, replacing any previous one."""
+        session = YogaSession(uid, display_name, on_end=self._session_ended)
+        with self._live_lock:
+            self._live += 1
+        now = session.started_at
+        with self._lock:
+            previous = self._by_uid.pop(uid, None)
+            if previous is not None:
+                previous.end()
+            if len(self._by_uid) >= self.max_sessions or now - self._last_sweep >= self.sweep_interval:
+                self._evict_locked(now)
+            self._by_uid[uid] = session
+        return session
+
+    def get(self, uid):
+        """Current (possibly ended) session for `uid`, or None."""
+        return self._by_uid.get(uid)
+
+    def __len__(self):
+        return len(self._by_uid)
+
+    def live_count(self):
+        """Number of sessions that are still active."""
+        return self._live
+
+    def _session_ended(self, session):
+        with self._live_lock:
+            self._live -= 1
+
+    def _evict_locked(self, now):
+        """Drop expired sessions, then the least recently seen ones, until there is room."""
+        self._last_sweep = now
+        expired = [s for s in self._by_uid.values() if now - s.last_seen > self.idle_ttl]
+        for session in expired:
+            self._remove_locked(session)
+
+        overflow = len(self._by_uid) - self.max_sessions + 1
+        if overflow > 0:
+            # Finished sessions go before active ones, oldest activity first.
+            victims = sorted(self._by_uid.values(), key=lambda s: (s.active, s.last_seen))
+            for session in victims[:overflow]:
+                self._remove_locked(session)
+
+    def _remove_locked(self, session):
+        self._by_uid.pop(session.uid, None)
+        session.end()
@@ -0,0 +1,51 @@
+// Generated from pose_rules.json by `python pose_rules.py`. Do not edit by hand.
+
+const POSE_ANGLE_FEATURES = ["left_elbow", "right_elbow", "left_knee", "right_knee", "left_hip", "right_hip", "left_shoulder", "right_shoulder"];
+// Landmark triples [a, b, c] per feature; the angle is measured at b.
+const POSE_ANGLE_JOINTS = [[11, 13, 15], [12, 14, 16], [23, 25, 27], [24, 26, 28], [11, 23, 25], [12, 24, 26], [13, 11, 23], [14, 12, 24]];
+
+// a: angles in POSE_ANGLE_FEATURES order.
+function classifyPoseAngles(a) {
+    const t0 = a[0] > 160;
+    const t1 = a[1] > 160;
+    const t2 = a[2] > 160;
+    const t3 = a[3] > 160;
+    const t4 = a[4] > 160;
+    const t5 = a[5] > 160;
+    const t6 = Math.abs(a[4] - 180) < 20;
+    const t7 = Math.abs(a[5] - 180) < 20;
+    const t8 = Math.abs(a[6] - 180) < 20;
+    const t9 = Math.abs(a[7] - 180) < 20;
+    const t10 = a[6] > 160;
+    const t11 = a[7] > 160;
+    const t12 = a[6] < 40;
+    const t13 = a[7] < 40;
+    const t14 = a[4] < 90;
+    const t15 = a[5] < 90;
+    const t16 = a[2] < 100;
+    const t17 = a[4] < 100;
+    const t18 = a[5] > 140;
+    const t19 = a[3] < 100;
+    const t20 = a[5] < 100;
+    const t21 = a[4] > 140;
+    const t22 = a[4] > 100;
+    const t23 = a[5] > 100;
+    const t24 = a[0] < 160;
+    const t25 = a[1] < 160;
+    const t26 = a[4] < 110;
+    const t27 = a[5] < 110;
+    const t28 = t0 && t1;  // arms_straight
+    const t29 = t2 && t3;  // legs_straight
+    const t30 = t4 && t5;  // hips_open
+    const t31 = t8 && t9;  // shoulders_flat
+    if (t10 && t11 && t29 && t30) return { pose: "Pranamasana", confidence: 0.95 };
+    if (t12 && t13 && t28 && t29 && t30) return { pose: "Hasta Uttanasana", confidence: 0.90 };
+    if (t14 && t15 && t29) return { pose: "Uttanasana", confidence: 0.85 };
+    if (t3 && t16 && t17 && t18) return { pose: "Ashwa Sanchalanasana (L)", confidence: 0.88 };
+    if (t2 && t19 && t20 && t21) return { pose: "Ashwa Sanchalanasana (R)", confidence: 0.88 };
+    if (t6 && t7 && t28 && t29 && t31) return { pose: "Dandasana", confidence: 0.80 };
+    if (t16 && t19 && t22 && t23) return { pose: "Ashtanga Namaskara", confidence: 0.70 };
+    if (t24 && t25 && t29 && t30 && t31) return { pose: "Bhujangasana", confidence: 0.80 };
+    if (t26 && t27 && t28 && t29) return { pose: "Adho Mukha Svanasana", confidence: 0.92 };
+    return { pose: "Unknown", confidence: 0.50 };
+}
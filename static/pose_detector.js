@@ -56,6 +56,11 @@ async function apiCall(endpoint, method = 'GET', body = null) {
     }
 }
 
+// Binary pose batch encoding (encodePoseBatch, landmarkRows) comes from static/pose_wire.js.
+
+// Raw landmarks quadruple the upload size; opt in when the server should re-score sessions.
+const SEND_LANDMARKS = false;
+
 // --- Session Management Handlers ---
 startSessionButton.onclick = async () => {
     sessionActive = true;
@@ -80,11 +85,46 @@ endSessionButton.onclick = async () => {
     
     feedbackDiv.innerText = data.message;
 
-    if (data.status === 'success' && data.report_path) {
-        logStatusDiv.innerHTML = `Report generated! <a href="/download_report" target="_blank">Download Report</a>`;
+    if (data.status === 'success' && data.report_job_id) {
+        waitForReport(data.report_job_id);
     }
 };
 
+// The PDF is rendered in the background; poll until it is ready.
+async function waitForReport(jobId) {
+    for (let attempt = 0; attempt < 60; attempt++) {
+        const data = await apiCall(`/report_status/${jobId}`);
+        if (data.report_ready) {
+            logStatusDiv.innerHTML = `Report generated! <a href="#" id="downloadReportLink">Download Report</a>`;
+            document.getElementById("downloadReportLink").onclick = (event) => {
+                event.preventDefault();
+                downloadReport();
+            };
+            return;
+        }
+        if (data.status !== 'success' || data.job.status === 'failed') {
+            return;
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
+// Reports are per user, so the download has to carry the ID token.
+async function downloadReport() {
+    const response = await fetch('/download_report', {
+        headers: { 'Authorization': `Bearer ${USER_ID_TOKEN}` }
+    });
+    if (!response.ok) {
+        logStatusDiv.innerText = 'API Error: No reports available';
+        return;
+    }
+    const link = document.createElement('a');
+    link.href = URL.createObjectURL(await response.blob());
+    link.download = 'AyurSutra_Report.pdf';
+    link.click();
+    URL.revokeObjectURL(link.href);
+}
+
 // --- Batch Logging Logic ---
 function batchLogPoseData() {
     if (!sessionActive || poseDataLog.length === 0) {
@@ -98,7 +138,16 @@ function batchLogPoseData() {
     const dataToSend = [...poseDataLog]; // Copy the data
     poseDataLog = []; // Clear the original array
     
-    apiCall('/log_pose', 'POST', { pose_data: dataToSend })
+    const binaryBatch = encodePoseBatch(dataToSend);
+    const request = binaryBatch
+        ? fetch('/log_pose', {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${USER_ID_TOKEN}`, 'Content-Type': POSE_BATCH_MIMETYPE },
+            body: binaryBatch
+        }).catch(error => console.error('API Call to /log_pose failed:', error))
+        : apiCall('/log_pose', 'POST', { pose_data: dataToSend });
+
+    request
         .then(() => {
             if (sessionActive) {
                 setTimeout(batchLogPoseData, LOG_INTERVAL_MS); // Schedule next log
@@ -187,12 +236,13 @@ function predictWebcam() {
 
         if (sessionActive) {
             // Log the pose data required by the Python backend's pose_log array
-            poseDataLog.push({
+            const frame = {
                 timestamp: Date.now() / 1000, // Unix timestamp in seconds
                 pose: poseName,
                 confidence: confidenceScore,
-                // Add any other metrics like 'angle_data' here
-            });
+            };
+            if (SEND_LANDMARKS) frame.landmarks = landmarkRows(landmarks);
+            poseDataLog.push(frame);
         }
         // --- END POSE ANALYSIS & LOGGING ---
         
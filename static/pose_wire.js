@@ -0,0 +1,74 @@
+// static/pose_wire.js
+// Binary /log_pose batch encoding (mirrors pose_wire.py). Shared by templates/index.html
+// and static/pose_detector.js; load it before either script.
+
+const POSE_BATCH_MIMETYPE = 'application/x-yoga-pose-batch';
+const LANDMARK_SCALE = 10000;  // session_store.LANDMARK_SCALE
+const LANDMARK_FRAME_BYTES = 33 * 4 * 2;
+
+// MediaPipe landmarks as [[x, y, z, visibility]] rows for /log_pose.
+function landmarkRows(landmarks) {
+    return landmarks.map(p => [p.x, p.y, p.z || 0, p.visibility === undefined ? 1 : p.visibility]);
+}
+
+function encodePoseBatch(frames) {
+    // Header: "YPB1", version, pose count, flags, frame count, base timestamp.
+    // Then the pose names, then per frame: u32 ms delta, u8 pose code, u8 confidence,
+    // and, if every frame carries landmarks, 33 x 4 int16 fixed-point values per frame.
+    const names = [];
+    const codeOf = new Map();
+    const codes = frames.map(f => {
+        if (!codeOf.has(f.pose)) {
+            codeOf.set(f.pose, names.length);
+            names.push(f.pose);
+        }
+        return codeOf.get(f.pose);
+    });
+    if (names.length > 255) return null;
+
+    const encoder = new TextEncoder();
+    const nameBytes = names.map(name => encoder.encode(String(name)).slice(0, 255));
+    const tableSize = nameBytes.reduce((size, bytes) => size + 1 + bytes.length, 0);
+    const n = frames.length;
+    const withLandmarks = n > 0 && frames.every(f => Array.isArray(f.landmarks) && f.landmarks.length === 33);
+    const frameBytes = 6 + (withLandmarks ? LANDMARK_FRAME_BYTES : 0);
+    const buffer = new ArrayBuffer(20 + tableSize + frameBytes * n);
+    const view = new DataView(buffer);
+    const bytes = new Uint8Array(buffer);
+
+    const base = n ? frames[0].timestamp : 0;
+    bytes.set([0x59, 0x50, 0x42, 0x31], 0);
+    view.setUint8(4, 1);
+    view.setUint8(5, names.length);
+    view.setUint16(6, withLandmarks ? 1 : 0, true);
+    view.setUint32(8, n, true);
+    view.setFloat64(12, base, true);
+
+    let offset = 20;
+    for (const encoded of nameBytes) {
+        view.setUint8(offset++, encoded.length);
+        bytes.set(encoded, offset);
+        offset += encoded.length;
+    }
+    let previousMs = 0;
+    for (let i = 0; i < n; i++) {
+        // A backwards timestamp is clamped to the previous one, so it cannot shift the frames after it.
+        const offsetMs = Math.max(previousMs, Math.round((frames[i].timestamp - base) * 1000));
+        view.setUint32(offset + 4 * i, offsetMs - previousMs, true);
+        previousMs = offsetMs;
+        bytes[offset + 4 * n + i] = codes[i];
+        bytes[offset + 5 * n + i] = Math.round(Math.min(1, Math.max(0, frames[i].confidence)) * 255);
+    }
+    if (withLandmarks) {
+        let at = offset + 6 * n;
+        for (const frame of frames) {
+            for (const point of frame.landmarks) {
+                for (let k = 0; k < 4; k++, at += 2) {
+                    const fixed = Math.round((point[k] || 0) * LANDMARK_SCALE);
+                    view.setInt16(at, Math.max(-32767, Math.min(32767, fixed)), true);
+                }
+            }
+        }
+    }
+    return buffer;
+}
@@ -0,0 +1,93 @@
+import pytest
+
+from firestore_writer import FirestoreWriteQueue, Increment, Maximum
+from memory_firestore import AlreadyExists, MemoryFirestore
+
+
+@pytest.fixture
+def db():
+    return MemoryFirestore()
+
+
+def test_set_and_get_roundtrip(db):
+    db.document('users/u1').set({'name': 'Asha', 'points': 3})
+    snapshot = db.document('users/u1').get()
+    assert snapshot.exists
+    assert snapshot.to_dict() == {'name': 'Asha', 'points': 3}
+    assert not db.document('users/u2').get().exists
+
+
+def test_merge_applies_increment_and_maximum(db):
+    stats = db.document('user_stats/u1')
+    stats.set({'sessions': Increment(1), 'best': Maximum(10), 'pose_seconds': {'Uttanasana': Increment(4.5)}},
+              merge=True)
+    stats.set({'sessions': Increment(1), 'best': Maximum(7), 'pose_seconds': {'Uttanasana': Increment(1.5)}},
+              merge=True)
+    assert stats.get().to_dict() == {'sessions': 2, 'best': 10, 'pose_seconds': {'Uttanasana': 6.0}}
+
+
+def test_set_without_merge_replaces_document(db):
+    db.document('c/d').set({'a': 1, 'b': 2})
+    db.document('c/d').set({'a': Increment(5)})
+    assert db.document('c/d').get().to_dict() == {'a': 5}
+
+
+def test_create_of_existing_document_raises_already_exists(db):
+    db.document('c/d').create({'a': 1})
+    with pytest.raises(AlreadyExists):
+        db.document('c/d').create({'a': 2})
+    assert db.document('c/d').get().to_dict() == {'a': 1}
+
+
+def test_batch_with_existing_create_fails_as_a_whole(db):
+    db.document('markers/s1').create({'write': 'stats/u1'})
+    batch = db.batch()
+    batch.set(db.document('stats/u1'), {'sessions': Increment(1)}, merge=True)
+    batch.create(db.document('markers/s1'), {'write': 'stats/u1'})
+    with pytest.raises(AlreadyExists):
+        batch.commit()
+    assert not db.document('stats/u1').get().exists
+
+
+def test_batch_with_duplicate_creates_fails_as_a_whole(db):
+    batch = db.batch()
+    batch.create(db.document('markers/s1'), {})
+    batch.set(db.document('stats/u1'), {'sessions': Increment(1)}, merge=True)
+    batch.create(db.document('markers/s1'), {})
+    with pytest.raises(AlreadyExists):
+        batch.commit()
+    assert not db.document('markers/s1').get().exists
+    assert not db.document('stats/u1').get().exists
+
+
+def test_batch_applies_all_writes_on_commit(db):
+    batch = db.batch()
+    batch.create(db.document('markers/s1'), {})
+    batch.set(db.document('stats/u1'), {'sessions': Increment(1)}, merge=True)
+    assert not db.document('stats/u1').get().exists
+    batch.commit()
+    assert db.document('stats/u1').get().to_dict() == {'sessions': 1}
+
+
+def test_where_and_collection_group(db):
+    db.document('users/a/yoga_sessions/1').set({'points_awarded': 5})
+    db.document('users/b/yoga_sessions/1').set({'points_awarded': 20})
+    high = [s.to_dict()['points_awarded'] for s in db.collection_group('yoga_sessions')
+            .where('points_awarded', '>=', 10).stream()]
+    assert high == [20]
+    assert [s.id for s in db.collection('users/a/yoga_sessions').stream()] == ['1']
+
+
+def test_write_queue_applies_once_marked_writes_once(db, tmp_path):
+    queue = FirestoreWriteQueue(lambda: db, journal_path=str(tmp_path / 'journal.jsonl'),
+                                dead_letter_path=str(tmp_path / 'dead.jsonl'), flush_interval=0.01)
+    try:
+        for _ in range(3):
+            queue.set('stats/u1', {'sessions': Increment(1), 'best': Maximum(8)}, merge=True, once='markers/s1')
+        queue.set('stats/u1', {'sessions': Increment(1)}, merge=True, once='markers/s2')
+        assert queue.flush(timeout=5)
+    finally:
+        queue.close()
+    assert db.document('stats/u1').get().to_dict() == {'sessions': 2, 'best': 8}
+    assert queue.already_applied == 2
+    assert queue.dead_lettered == 0
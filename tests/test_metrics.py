@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+from metrics import ARCHIVE_FILE, MetricsRegistry
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def write_snapshot(directory, pid, registry):
+    with open(os.path.join(directory, f'metrics-{pid}.json'), 'w', encoding='utf-8') as f:
+        json.dump({'pid': pid, 'metrics': registry.snapshot()}, f)
+
+
+def test_render_archives_snapshots_of_exited_processes(tmp_path):
+    for _ in range(2):
+        exited = MetricsRegistry(directory=None)
+        exited.counter('jobs_total', 'Jobs.').inc(3)
+        exited.gauge('queue_depth', 'Queued jobs.').set(5)
+        exited.histogram('job_seconds', 'Job time.', buckets=(1.0,)).observe(0.5)
+        write_snapshot(str(tmp_path), dead_pid(), exited)
+
+    registry = MetricsRegistry(directory=str(tmp_path))
+    registry.counter('jobs_total', 'Jobs.').inc(1)
+    first = registry.render()
+    assert 'jobs_total 7' in first
+    assert 'job_seconds_count 2' in first
+    assert 'queue_depth' not in first
+    assert sorted(p.name for p in tmp_path.glob('metrics-*.json')) == sorted(
+        [ARCHIVE_FILE, f'metrics-{os.getpid()}.json'])
+    assert registry.render() == first
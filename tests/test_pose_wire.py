@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from pose_wire import PoseBatchError, decode_pose_batch, encode_pose_batch
+
+
+def test_roundtrip():
+    timestamps = [1700000000.0, 1700000000.2, 1700000000.4]
+    body = encode_pose_batch(timestamps, [0.9, 0.5, 1.0], ['Unknown', 'No Pose Detected', 'Unknown'])
+    decoded_timestamps, confidences, codes, landmarks = decode_pose_batch(body)
+    np.testing.assert_allclose(decoded_timestamps, timestamps)
+    np.testing.assert_allclose(confidences, [0.9, 0.5, 1.0], atol=1 / 255)
+    assert codes[0] == codes[2] != codes[1]
+    assert landmarks is None
+
+
+def test_backwards_timestamp_does_not_shift_later_frames():
+    body = encode_pose_batch([100.0, 101.0, 100.5, 102.0], [1.0] * 4, ['Unknown'] * 4)
+    np.testing.assert_allclose(decode_pose_batch(body)[0], [100.0, 101.0, 101.0, 102.0])
+
+
+def test_too_many_poses():
+    names = [f'pose-{i}' for i in range(256)]
+    with pytest.raises(PoseBatchError):
+        encode_pose_batch(np.arange(256, dtype=float), np.ones(256), names)
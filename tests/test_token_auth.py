@@ -0,0 +1,114 @@
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from token_auth import GoogleKeyStore, TokenVerifier
+
+PROJECT_ID = 'yoga-test'
+KID = 'test-key'
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def clock():
+    now = [time.time()]
+    fake = lambda: now[0]
+    fake.advance = lambda seconds: now.__setitem__(0, now[0] + seconds)
+    return fake
+
+
+@pytest.fixture
+def verifier(private_key, clock):
+    pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode('ascii')
+    key_store = GoogleKeyStore(fetcher=lambda: ({KID: pem}, 3600), clock=clock)
+    return TokenVerifier(PROJECT_ID, key_store=key_store, max_ttl=600, clock=clock)
+
+
+def make_token(private_key, uid='user-1', lifetime=3600, kid=KID, **overrides):
+    now = int(time.time())
+    claims = {
+        'sub': uid,
+        'aud': PROJECT_ID,
+        'iss': f'https://securetoken.google.com/{PROJECT_ID}',
+        'iat': now,
+        'exp': now + lifetime,
+        'auth_time': now,
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, private_key, algorithm='RS256', headers={'kid': kid})
+
+
+def test_verifies_token_signed_by_local_key(verifier, private_key):
+    claims = verifier.verify(make_token(private_key))
+    assert claims['uid'] == 'user-1'
+
+
+def test_rejects_expired_token(verifier, private_key):
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(make_token(private_key, lifetime=-3600))
+
+
+@pytest.mark.parametrize('claim, value', [
+    ('aud', 'another-project'),
+    ('iss', 'https://securetoken.google.com/another-project'),
+])
+def test_rejects_wrong_audience_or_issuer(verifier, private_key, claim, value):
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(make_token(private_key, **{claim: value}))
+
+
+def test_rejects_token_signed_by_another_key(verifier):
+    other = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with pytest.raises(jwt.InvalidSignatureError):
+        verifier.verify(make_token(other))
+
+
+def test_rejects_unknown_kid(verifier, private_key):
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(make_token(private_key, kid='rotated-away'))
+
+
+def test_cache_serves_repeat_verifications_until_max_ttl(verifier, private_key, clock):
+    token = make_token(private_key)
+    verifier.verify(token)
+    verifier.verify(token)
+    assert (verifier.hits, verifier.misses) == (1, 1)
+
+    clock.advance(601)
+    verifier.verify(token)
+    assert (verifier.hits, verifier.misses) == (1, 2)
+
+
+def test_cache_entry_never_outlives_token_exp(verifier, private_key, clock):
+    token = make_token(private_key, lifetime=30)
+    verifier.verify(token)
+    clock.advance(31)  # past `exp` but well inside max_ttl
+    verifier.verify(token)
+    assert (verifier.hits, verifier.misses) == (0, 2)
+
+
+def test_failed_key_fetch_backs_off_and_keeps_stale_keys(private_key, clock):
+    pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode('ascii')
+    fetches = []
+
+    def fetcher():
+        fetches.append(clock())
+        if len(fetches) > 1:
+            raise OSError('certificate endpoint down')
+        return {KID: pem}, 60
+
+    key_store = GoogleKeyStore(fetcher=fetcher, clock=clock)
+    assert key_store.get_key(KID) is not None
+    clock.advance(120)  # keys expired
+    for _ in range(5):
+        assert key_store.get_key(KID) is not None
+    assert len(fetches) == 2
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.request
+from metrics import REGISTRY
+
+# Public x509 certificates Google uses to sign Firebase ID tokens.
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+# Used when the certificate response has no Cache-Control max-age.
+DEFAULT_KEYS_MAX_AGE = 3600
+# An unknown `kid` forces a refetch, but no more often than this (seconds).
+MIN_KEYS_REFRESH_INTERVAL = 60
+# After a failed fetch the stale keys keep being served and the next fetch
+# waits, doubling from the base up to the cap (seconds).
+KEYS_RETRY_BASE = 5
+KEYS_RETRY_MAX = 300
+# Verified tokens kept per process, and the longest time one is trusted
+# without re-verification even if `exp` is later.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_MAX_TTL = 600
+CLOCK_SKEW_SECONDS = 10
+
+TOKEN_VERIFY_SECONDS = REGISTRY.histogram(
+    'yoga_token_verify_seconds', 'ID token verification time, by verified-token cache outcome.', ('cache',),
+    buckets=(0.00001, 0.00005, 0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+_VERIFY_HIT = TOKEN_VERIFY_SECONDS.labels('hit')
+_VERIFY_MISS = TOKEN_VERIFY_SECONDS.labels('miss')
+
+
+def fetch_google_certs(url=GOOGLE_CERTS_URL, timeout=5):
+    """Downloads the signing certificates. Returns ({kid: pem}, max_age_seconds)."""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        certs = json.loads(response.read().decode('utf-8'))
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    return certs, int(match.group(1)) if match else DEFAULT_KEYS_MAX_AGE
+
+
+def _load_public_key(pem):
+    """Accepts either an x509 certificate (what Google serves) or a bare public key."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives.serialization import load_pem_public_key
+    data = pem.encode('utf-8') if isinstance(pem, str) else pem
+    if b'BEGIN CERTIFICATE' in data:
+        return x509.load_pem_x509_certificate(data).public_key()
+    return load_pem_public_key(data)
+
+
+class GoogleKeyStore:
+    """Cached set of token signing keys, refreshed when the server-provided max-age runs out.
+
+    Fetches are rate limited: at most one per MIN_KEYS_REFRESH_INTERVAL for
+    unknown kids, and with exponential backoff while fetches fail, so an
+    outage of the certificate endpoint does not put every verification
+    behind a blocking fetch.
+
+    `fetcher` returns ({kid: pem}, max_age); pass one backed by a locally
+    generated key pair to verify tokens without network access.
+    """
+
+    def __init__(self, fetcher=fetch_google_certs, clock=time.time):
+        self._fetcher = fetcher
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._expires_at = 0.0
+        self._next_fetch_at = 0.0
+        self._failures_in_row = 0
+
+    def get_key(self, kid):
+        now = self._clock()
+        key = self._keys.get(kid)
+        if key is not None and now < self._expires_at:
+            return key
+        # Refresh on expiry, or when a new kid appears (Google rotates keys).
+        if now >= self._next_fetch_at:
+            self.refresh()
+        # Possibly a stale key, if the refresh failed or is backing off.
+        return self._keys.get(kid)
+
+    def refresh(self):
+        with self._lock:
+            now = self._clock()
+            if now < self._next_fetch_at:
+                return  # Another thread just refreshed, or fetches are backing off.
+            try:
+                certs, max_age = self._fetcher()
+                keys = {kid: _load_public_key(pem) for kid, pem in certs.items()}
+            except Exception as e:
+                # Keep serving the previous keys rather than failing every request.
+                self._failures_in_row += 1
+                delay = min(KEYS_RETRY_MAX, KEYS_RETRY_BASE * 2 ** (self._failures_in_row - 1))
+                self._next_fetch_at = now + delay
+                print(f"⚠️ Could not refresh token signing keys (next try in {delay}s): {e}")
+                return
+            self._keys = keys
+            self._failures_in_row = 0
+            self._expires_at = now + max_age
+            self._next_fetch_at = now + min(max_age, MIN_KEYS_REFRESH_INTERVAL)
+
+
+class TokenVerifier:
+    """Verifies Firebase ID tokens locally with pyjwt and caches the decoded claims.
+
+    Cache entries are keyed by a SHA-256 of the token and never outlive the
+    token's `exp`. Without a project id the claims come from `fallback`
+    (normally `firebase_admin.auth.verify_id_token`) and are cached the same way.
+    """
+
+    def __init__(self, project_id=None, key_store=None, fallback=None,
+                 cache_size=TOKEN_CACHE_SIZE, max_ttl=TOKEN_CACHE_MAX_TTL, clock=time.time):
+        self.project_id = project_id
+        self.key_store = key_store or GoogleKeyStore(clock=clock)
+        self.fallback = fallback
+        self.cache_size = cache_size
+        self.max_ttl = max_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def verify(self, id_token):
+        """Returns the token claims (with `uid`), or raises if the token is invalid."""
+        started = time.perf_counter()
+        cache_key = hashlib.sha256(id_token.encode('utf-8')).digest()
+        now = self._clock()
+        entry = self._cache.get(cache_key)
+        if entry is not None and now < entry[0]:
+            self.hits += 1
+            _VERIFY_HIT.observe(time.perf_counter() - started)
+            return entry[1]
+
+        self.misses += 1
+        claims = self._decode(id_token) if self.project_id else self.fallback(id_token)
+        expires_at = min(float(claims['exp']), now + self.max_ttl)
+        with self._lock:
+            if len(self._cache) >= self.cache_size:
+                self._evict_locked(now)
+            self._cache[cache_key] = (expires_at, claims)
+        _VERIFY_MISS.observe(time.perf_counter() - started)
+        return claims
+
+    def _evict_locked(self, now):
+        """Drops expired entries; if none expired, drops the oldest tenth."""
+        expired = [k for k, (expires_at, _) in self._cache.items() if expires_at <= now]
+        if not expired:
+            expired = list(self._cache)[:max(1, self.cache_size // 10)]
+        for k in expired:
+            del self._cache[k]
+
+    def _decode(self, id_token):
+        import jwt  # deferred: pyjwt and cryptography are only needed once a token arrives
+        header = jwt.get_unverified_header(id_token)
+        if header.get('alg') != 'RS256':
+            raise jwt.InvalidAlgorithmError("ID token must be signed with RS256")
+        key = self.key_store.get_key(header.get('kid'))
+        if key is None:
+            raise jwt.InvalidTokenError(f"No signing key for kid {header.get('kid')!r}")
+
+        claims = jwt.decode(
+            id_token, key, algorithms=['RS256'],
+            audience=self.project_id,
+            issuer=f'https://securetoken.google.com/{self.project_id}',
+            leeway=CLOCK_SKEW_SECONDS,
+            options={'require': ['exp', 'iat', 'sub', 'aud', 'iss']},
+        )
+        subject = claims['sub']
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise jwt.InvalidTokenError("ID token has an invalid subject")
+        if claims.get('auth_time', 0) > self._clock() + CLOCK_SKEW_SECONDS:
+            raise jwt.ImmatureSignatureError("ID token auth_time is in the future")
+        claims['uid'] = subject
+        return claims
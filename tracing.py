@@ -0,0 +1,258 @@
+"""Lightweight, sampled tracing spans with an OTLP/JSON file sink and Server-Timing.
+
+A request is traced when it is sampled (TRACE_SAMPLE_RATE, default 0: off).
+While tracing is on, or with TRACE_ACCEPT_PARENT=1, a W3C ``traceparent``
+header with the sampled flag also forces a trace; with both unset the header
+is ignored, so clients cannot turn tracing on. Inside a traced request,
+``with span('stage'):`` records a child span; outside one it returns a shared
+no-op context manager, so untraced code pays one context variable lookup per
+span.
+
+Finished traces are appended to TRACE_FILE, one OTLP ``ExportTraceServiceRequest``
+JSON object per line (what the OpenTelemetry collector's file exporter writes
+and its file receiver reads). Once the file reaches TRACE_FILE_MAX_BYTES it is
+rotated to ``TRACE_FILE.1``, so at most about twice that is kept on disk.
+Traced responses also carry a ``Server-Timing`` header with the total time
+per span name, which browser dev tools display. Work handed to another
+thread keeps its trace when started inside ``contextvars.copy_context().run``
+(see report_jobs.py).
+"""
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+import time
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0'))
+TRACE_ACCEPT_PARENT = os.environ.get('TRACE_ACCEPT_PARENT', '0') == '1'
+TRACE_FILE = os.environ.get('TRACE_FILE', '/tmp/traces.jsonl')
+TRACE_FILE_MAX_BYTES = int(os.environ.get('TRACE_FILE_MAX_BYTES', str(64 * 1024 * 1024)))
+TRACE_SERVICE_NAME = os.environ.get('TRACE_SERVICE_NAME', 'yoga-app')
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER = 1, 2
+
+_current = contextvars.ContextVar('current_span', default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans of one trace; exported together once the root span ends."""
+
+    __slots__ = ('trace_id', 'spans', 'tracer', 'exported')
+
+    def __init__(self, tracer, trace_id=None):
+        self.tracer = tracer
+        self.trace_id = trace_id or f"{random.getrandbits(128):032x}"
+        self.spans = []
+        self.exported = False
+
+    def server_timing(self):
+        """Server-Timing header value: total milliseconds per span name, root first."""
+        totals = {}
+        for s in self.spans:
+            if s.end_ns is not None:
+                name = 'total' if s.parent_id is None or s.kind == SPAN_KIND_SERVER else s.name
+                totals[name] = totals.get(name, 0) + (s.end_ns - s.start_ns)
+        return ', '.join(f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)};dur={ns / 1e6:.2f}" for name, ns in totals.items())
+
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'kind', 'attributes', 'start_ns', 'end_ns',
+                 'error', '_token')
+
+    def __init__(self, trace, name, parent_id=None, attributes=None, kind=SPAN_KIND_INTERNAL):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.end()
+        _current.reset(self._token)
+        return False
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace.spans.append(self)
+            if self.trace.exported:
+                # Finished after its trace was exported (e.g. in a report worker thread).
+                self.trace.tracer.export([self])
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class Tracer:
+    """Sampling decisions and the JSONL sink."""
+
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE, path=TRACE_FILE, service_name=TRACE_SERVICE_NAME,
+                 accept_parent=TRACE_ACCEPT_PARENT, max_bytes=TRACE_FILE_MAX_BYTES):
+        self.sample_rate = sample_rate
+        self.accept_parent = accept_parent
+        self.path = path
+        self.max_bytes = max_bytes
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self.exported = 0
+
+    def start_trace(self, name, traceparent=None, kind=SPAN_KIND_INTERNAL, **attributes):
+        """A root span if this trace is sampled, else None. Use it as a context manager."""
+        parent_id = trace_id = None
+        match = _TRACEPARENT.match(traceparent or '') if self.sample_rate or self.accept_parent else None
+        if match and int(match.group(3), 16) & 1:
+            trace_id, parent_id = match.group(1), match.group(2)
+        elif not (self.sample_rate and random.random() < self.sample_rate):
+            return None
+        return Span(Trace(self, trace_id), name, parent_id, attributes, kind)
+
+    def trace(self, name, **attributes):
+        """`start_trace` as a context manager for background work; a no-op when not sampled."""
+        if _current.get() is not None:
+            return span(name, **attributes)
+        root = self.start_trace(name, **attributes)
+        return _RootContext(root) if root is not None else NOOP_SPAN
+
+    def finish(self, root):
+        """End a root span and export its trace."""
+        root.end()
+        root.trace.exported = True
+        self.export(root.trace.spans)
+
+    def export(self, spans):
+        if not self.path or not spans:
+            return
+        line = json.dumps({'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}},
+                                        {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}}]},
+            'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': [s.to_otlp() for s in spans]}],
+        }]}, separators=(',', ':'))
+        try:
+            with self._lock:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+                    size = f.tell()
+                if self.max_bytes and size >= self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+            self.exported += len(spans)
+        except OSError as e:
+            print(f"⚠️ Could not write trace: {e}")
+
+
+class _RootContext:
+    __slots__ = ('root',)
+
+    def __init__(self, root):
+        self.root = root
+
+    def __enter__(self):
+        return self.root.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.root.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self.root._token)
+        self.root.trace.tracer.finish(self.root)
+        return False
+
+
+def span(name, **attributes):
+    """A child of the current span, or a no-op when the current work is not traced."""
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def current_span():
+    return _current.get()
+
+
+TRACER = Tracer()
+
+
+def trace_flask(app, tracer=TRACER):
+    """Trace sampled requests as SERVER spans and add their Server-Timing header."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_trace():
+        root = tracer.start_trace(f"{request.method} {request.url_rule or request.path}",
+                                  traceparent=request.headers.get('traceparent'), kind=SPAN_KIND_SERVER,
+                                  **{'http.method': request.method, 'http.target': request.path})
+        if root is not None:
+            g.trace_root = root.__enter__()
+
+    @app.after_request
+    def _server_timing(response):
+        root = g.get('trace_root')
+        if root is not None:
+            root.set('http.status_code', response.status_code)
+            root.end()
+            response.headers['Server-Timing'] = root.trace.server_timing()
+            response.headers['traceresponse'] = f"00-{root.trace.trace_id}-{root.span_id}-01"
+        return response
+
+    @app.teardown_request
+    def _finish_trace(exc):
+        root = g.pop('trace_root', None)
+        if root is not None:
+            if exc is not None:
+                root.error = f"{type(exc).__name__}: {exc}"
+            _current.reset(root._token)
+            tracer.finish(root)
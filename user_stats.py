@@ -0,0 +1,113 @@
+"""Per-user lifetime totals, kept in one document per user.
+
+``user_stats/{uid}`` is updated once per finished session with field
+transforms (Increment, Maximum) in a merge write, so sessions ending at the
+same time on different workers never overwrite each other and no read is
+needed. Increments are not idempotent, so each update is queued with a
+``user_stats/{uid}/applied_sessions/{session_id}`` marker created in the
+same commit (see `FirestoreWriteQueue.set`'s `once`); a retried or replayed
+update for a session that was already counted is dropped. Profile and
+leaderboard views read that one document instead of scanning
+``users/{uid}/yoga_sessions``. `rebuild_user_stats` recomputes the documents
+from the stored sessions::
+
+    flask --app app rebuild-user-stats [UID ...]
+"""
+from firestore_writer import FIRESTORE_BATCH_LIMIT, Increment, Maximum
+
+USER_STATS_COLLECTION = 'user_stats'
+
+
+def user_stats_path(uid):
+    return f"{USER_STATS_COLLECTION}/{uid}"
+
+
+def applied_session_path(uid, session_id):
+    """Marker document recording that a session has been folded into the user's totals."""
+    return f"{user_stats_path(uid)}/applied_sessions/{session_id}"
+
+
+def longest_holds(holds):
+    """{pose: longest single hold in seconds} from a summary's `holds` list."""
+    longest = {}
+    for hold in holds:
+        pose = hold['pose']
+        longest[pose] = max(longest.get(pose, 0.0), hold['duration_seconds'])
+    return longest
+
+
+def session_stats_update(session_data):
+    """Merge write folding one stored session document into the user's totals.
+
+    Queue it with `once=applied_session_path(...)` so it is counted once.
+    """
+    points = session_data['points_awarded']
+    return {
+        'uid': session_data['uid'],
+        'display_name': session_data['display_name'],
+        'sessions': Increment(1),
+        'points': Increment(points),
+        'total_seconds': Increment(session_data['duration_seconds']),
+        'pose_seconds': {pose: Increment(seconds) for pose, seconds in session_data['pose_time_seconds'].items()},
+        'best_hold_seconds': {pose: Maximum(seconds) for pose, seconds in session_data.get('longest_holds', {}).items()},
+        'best_session_points': Maximum(points),
+        'last_session_id': session_data['session_id'],
+        'last_session_at': session_data['session_end_time'],
+    }
+
+
+def empty_user_stats(uid):
+    return {'uid': uid, 'display_name': None, 'sessions': 0, 'points': 0, 'total_seconds': 0.0,
+            'pose_seconds': {}, 'best_hold_seconds': {}, 'best_session_points': 0,
+            'last_session_id': None, 'last_session_at': None}
+
+
+def stats_view(stats):
+    """The stats document as returned to clients, with minutes alongside seconds."""
+    view = dict(empty_user_stats(stats.get('uid')), **stats)
+    view['total_minutes'] = round(view['total_seconds'] / 60, 1)
+    return view
+
+
+def stats_from_sessions(uid, sessions):
+    """Totals recomputed from stored session documents, oldest first."""
+    stats = empty_user_stats(uid)
+    for data in sorted(sessions, key=lambda d: d['session_end_time']):
+        stats['display_name'] = data.get('display_name', stats['display_name'])
+        stats['sessions'] += 1
+        stats['points'] += data.get('points_awarded', 0)
+        stats['total_seconds'] += data.get('duration_seconds', 0)
+        for pose, seconds in data.get('pose_time_seconds', {}).items():
+            stats['pose_seconds'][pose] = stats['pose_seconds'].get(pose, 0) + seconds
+        for pose, seconds in data.get('longest_holds', {}).items():
+            stats['best_hold_seconds'][pose] = max(stats['best_hold_seconds'].get(pose, 0), seconds)
+        stats['best_session_points'] = max(stats['best_session_points'], data.get('points_awarded', 0))
+        stats['last_session_id'] = data.get('session_id')
+        stats['last_session_at'] = data['session_end_time']
+    return stats
+
+
+def rebuild_user_stats(db, uids=None):
+    """Rewrite user_stats documents from yoga_sessions. Returns the number of users written.
+
+    With no `uids`, every user with a stored session is rebuilt (one
+    collection group scan); otherwise only the given users are read.
+    """
+    by_user = {}
+    if uids:
+        for uid in uids:
+            by_user[uid] = [s.to_dict() for s in db.collection(f"users/{uid}/yoga_sessions").stream()]
+    else:
+        for snapshot in db.collection_group('yoga_sessions').stream():
+            uid = snapshot.reference.path.split('/')[1]
+            by_user.setdefault(uid, []).append(snapshot.to_dict())
+
+    batch, written = db.batch(), 0
+    for uid, sessions in by_user.items():
+        batch.set(db.document(user_stats_path(uid)), stats_from_sessions(uid, sessions))
+        written += 1
+        if written % FIRESTORE_BATCH_LIMIT == 0:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+    return written
@@ -0,0 +1,79 @@
+"""Server-side pose classification, vectorized over frames.
+
+Mirrors `calculateAngle` / `classifyPose` in templates/index.html: the
+joint angles named in pose_rules.json are computed from MediaPipe's 33-point
+pose landmarks and the compiled rules are applied as boolean masks over all
+frames at once. The browser runs the same rules via static/pose_classifier.js.
+"""
+import numpy as np
+from pose_rules import POSE_RULES_PATH, compile_rules, load_rules
+
+NUM_LANDMARKS = 33
+
+# Features, labels and thresholds all come from the rule file (see pose_rules.py).
+RULES = compile_rules(load_rules(POSE_RULES_PATH))
+
+# Angle name -> (a, b, c) landmarks; the angle is measured at b.
+ANGLE_JOINTS = RULES.joints
+ANGLE_NAMES = RULES.features
+# Only these landmarks are read; _A/_B/_C index into this subset.
+_USED = np.unique([RULES.joints[name] for name in ANGLE_NAMES])
+_A, _B, _C = (np.searchsorted(_USED, idx) for idx in zip(*(RULES.joints[name] for name in ANGLE_NAMES)))
+# Frames per block in calculate_angles.
+ANGLE_CHUNK_FRAMES = 4096
+
+# Labels in rule priority order; index 0 is the fallback.
+POSE_LABELS = RULES.labels
+POSE_CONFIDENCES = RULES.confidences
+
+
+def calculate_angles(landmarks):
+    """Joint angles in degrees for a batch of frames.
+
+    `landmarks` is (N, 33, k) or (33, k) with x, y in the first two columns
+    (any extra z/visibility columns are ignored). Returns an (N, F) float64
+    array with columns in `ANGLE_NAMES` order.
+    """
+    lm = np.asarray(landmarks)
+    if lm.ndim == 2:
+        lm = lm[np.newaxis]
+    if lm.shape[1] != NUM_LANDMARKS or lm.shape[2] < 2:
+        raise ValueError(f"Expected landmarks shaped (N, {NUM_LANDMARKS}, >=2), got {lm.shape}")
+    # Stored angle-major so each angle column is contiguous for the rules.
+    out = np.empty((len(ANGLE_NAMES), len(lm)))
+    # Work in cache-sized blocks of frames; one big pass is about twice as slow.
+    for start in range(0, len(lm), ANGLE_CHUNK_FRAMES):
+        block = lm[start:start + ANGLE_CHUNK_FRAMES]
+        out[:, start:start + len(block)] = _block_angles(block)
+    return out.T
+
+
+def _block_angles(lm):
+    """(F, n) angles for one block of frames."""
+    # One gather of the used landmarks into contiguous (12, n) x and y rows.
+    points = np.take(lm, _USED, axis=1)[..., :2]
+    x = np.ascontiguousarray(points[..., 0].T, dtype=np.float64)
+    y = np.ascontiguousarray(points[..., 1].T, dtype=np.float64)
+    bx, by = x[_B], y[_B]
+
+    radians = np.arctan2(y[_C] - by, x[_C] - bx) - np.arctan2(y[_A] - by, x[_A] - bx)
+    angles = np.abs(radians * 180.0 / np.pi)
+    return np.where(angles > 180.0, 360 - angles, angles)
+
+
+def classify_angles(angles):
+    """Apply the pose rules to an (N, F) angle array.
+
+    Returns (label_index, confidence): int8 indices into `POSE_LABELS` and
+    float32 confidences. Earlier rules win, as in the JS classifier.
+    """
+    return RULES.evaluate(angles)
+
+def classify_landmarks(landmarks):
+    """Classify a batch of 33-point landmark frames. Returns (label_index, confidence)."""
+    return classify_angles(calculate_angles(landmarks))
+
+
+def label_names(label_index):
+    """Decode label indices to pose name strings."""
+    return np.asarray(POSE_LABELS, dtype=object)[label_index]